@@ -0,0 +1,151 @@
+"""
+Persistent, incrementally maintained chart aggregates.
+
+The scraper upserts every emitted record into an ``AggregateStore``. For
+each ``listing_id`` it keeps the facts the charts count (categories,
+main category, location, day, month, price presence and whether the
+provider shows a ``user_name``) and keeps the per-dimension counts in
+step. Upserting the same listing again only moves its counts when its
+facts changed, so re-scraped listings are never counted twice.
+``generate_charts.py --from-aggregates`` reads the counts directly,
+also while a crawl is still writing to them.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from columnar import parse_date, split_categories
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listing_facts (
+    listing_id TEXT PRIMARY KEY,
+    facts TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counts (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key)
+);
+"""
+
+
+def listing_facts(record: Dict) -> Dict[str, List[str]]:
+    """The (dimension, key) pairs a listing contributes to, per dimension"""
+    categories = split_categories(record.get('categories'))
+    day, _ = parse_date(record.get('date'))  # Also the day of a date with a time
+    return {
+        'total': ['listings'],
+        'category': categories,
+        'main_category': categories[:1],
+        'location': [record['location']] if record.get('location') else [],
+        'day': [day.isoformat()] if day else [],
+        'month': [day.strftime('%Y-%m')] if day else [],
+        'price': ['with' if record.get('price') else 'without'],
+        'identity': ['branded' if record.get('user_name') else 'anonymous'],
+    }
+
+
+class AggregateStore:
+    """SQLite store of chart counts, upserted one listing at a time"""
+
+    def __init__(self, path: Union[str, Path] = 'ustasi_aggregates.db', commit_every: int = 50):
+        self.path = Path(path)
+        self.commit_every = max(1, commit_every)
+        self._pending_writes = 0
+        self.conn = sqlite3.connect(str(self.path), timeout=30.0)
+        self.conn.execute('PRAGMA journal_mode=WAL')  # Readers see committed counts mid-crawl
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def upsert(self, record: Dict) -> bool:
+        """Count a listing, replacing its previous facts; returns True if counts changed"""
+        listing_id = record.get('listing_id')
+        if not listing_id:
+            return False
+        facts = listing_facts(record)
+        encoded = json.dumps(facts, ensure_ascii=False, sort_keys=True)
+        row = self.conn.execute(
+            'SELECT facts FROM listing_facts WHERE listing_id = ?', (listing_id,)
+        ).fetchone()
+        if row is not None and row[0] == encoded:
+            return False
+
+        if row is not None:
+            self._add(json.loads(row[0]), -1)
+        self._add(facts, 1)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO listing_facts (listing_id, facts) VALUES (?, ?)', (listing_id, encoded)
+        )
+        self._written()
+        return True
+
+    def _add(self, facts: Dict[str, List[str]], delta: int):
+        self.conn.executemany(
+            'INSERT INTO counts (dimension, key, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count',
+            [(dimension, key, delta) for dimension, keys in facts.items() for key in keys]
+        )
+
+    def _written(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Commit pending writes"""
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def counts(self, dimension: str) -> List[Tuple[str, int]]:
+        """Non-zero counts of a dimension, largest first"""
+        return self.conn.execute(
+            'SELECT key, count FROM counts WHERE dimension = ? AND count > 0 ORDER BY count DESC, key',
+            (dimension,)
+        ).fetchall()
+
+    def count(self, dimension: str, key: str) -> int:
+        row = self.conn.execute(
+            'SELECT count FROM counts WHERE dimension = ? AND key = ?', (dimension, key)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        """Commit and close the database"""
+        self.commit()
+        self.conn.close()
+
+
+def load_chart_aggregates(path: Union[str, Path] = 'ustasi_aggregates.db'):
+    """``ChartAggregates`` read from an aggregate store"""
+    # Imported here so the scraper can feed the store without pandas
+    import pandas as pd
+
+    from aggregates import ChartAggregates
+
+    store = AggregateStore(path)
+    try:
+        def series(dimension: str) -> pd.Series:
+            counts = store.counts(dimension)
+            return pd.Series([count for _, count in counts], index=[key for key, _ in counts],
+                             dtype='int64')
+
+        daily = series('day').sort_index()
+        monthly = series('month').sort_index()
+        daily.index = pd.PeriodIndex(daily.index, freq='D')
+        monthly.index = pd.PeriodIndex(monthly.index, freq='M')
+        return ChartAggregates(
+            total=store.count('total', 'listings'),
+            category_counts=series('category'),
+            main_category_counts=series('main_category'),
+            location_counts=series('location'),
+            with_price=store.count('price', 'with'),
+            daily_counts=daily,
+            monthly_counts=monthly,
+            with_identity=store.count('identity', 'branded'),
+        )
+    finally:
+        store.close()
@@ -0,0 +1,116 @@
+"""
+Aggregates behind the seven charts of ``generate_charts.py``.
+
+``compute_aggregates`` derives every count the charts plot from one
+listings DataFrame in a single vectorized pass: categories are exploded
+once (giving both the per-category and the main-category counts), dates
+are parsed once and counted per day (the monthly counts are rolled up
+from the daily ones), and presence masks are computed once. The result
+is a small ``ChartAggregates`` object, independent of the dataset size.
+"""
+
+from typing import Dict
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Only Arrow-backed (Parquet) columns need pyarrow
+    pa = None
+    pc = None
+
+
+class ChartAggregates:
+    """Counts plotted by the charts"""
+
+    def __init__(self, total: int, category_counts: pd.Series, main_category_counts: pd.Series,
+                 location_counts: pd.Series, with_price: int, daily_counts: pd.Series,
+                 monthly_counts: pd.Series, with_identity: int):
+        self.total = total  # Number of listings
+        self.category_counts = category_counts  # Every category a listing is in, descending
+        self.main_category_counts = main_category_counts  # First category of each listing
+        self.location_counts = location_counts
+        self.with_price = with_price
+        self.daily_counts = daily_counts  # Indexed by daily Period, in date order
+        self.monthly_counts = monthly_counts  # Indexed by monthly Period, in date order
+        self.with_identity = with_identity  # Listings showing a user_name
+
+    @property
+    def without_price(self) -> int:
+        return self.total - self.with_price
+
+    @property
+    def anonymous(self) -> int:
+        return self.total - self.with_identity
+
+    def to_dict(self) -> Dict:
+        """Plain-data view, e.g. for hashing or JSON"""
+        def counts(series: pd.Series) -> Dict[str, int]:
+            return {str(key): int(value) for key, value in series.items()}
+
+        return {
+            'total': self.total,
+            'category_counts': counts(self.category_counts),
+            'main_category_counts': counts(self.main_category_counts),
+            'location_counts': counts(self.location_counts),
+            'with_price': self.with_price,
+            'daily_counts': counts(self.daily_counts),
+            'monthly_counts': counts(self.monthly_counts),
+            'with_identity': self.with_identity,
+        }
+
+
+def present(column: pd.Series) -> pd.Series:
+    """Mask of non-empty values"""
+    return column.notna() & (column.astype('string') != '')
+
+
+def nonzero(counts: pd.Series) -> pd.Series:
+    """Drop the zero counts ``value_counts`` reports for unused categorical values"""
+    return counts[counts > 0]
+
+
+def explode_categories(categories: pd.Series) -> pd.Series:
+    """One row per (listing, category), indexed by listing, in listing order
+
+    Accepts list values (Parquet) or comma-separated strings (CSV).
+    Arrow-backed list columns are flattened in Arrow, without a Python
+    object per listing.
+    """
+    if isinstance(categories.dtype, pd.ArrowDtype):
+        lists = pa.array(categories.array)
+        if isinstance(lists, pa.ChunkedArray):
+            lists = lists.combine_chunks()
+        flat = pc.list_flatten(lists).to_pandas()
+        exploded = pd.Series(flat.values, index=pc.list_parent_indices(lists).to_numpy())
+        return exploded[exploded.notna()].astype('category')
+
+    values = categories.dropna()
+    if len(values) and isinstance(values.iloc[0], str):
+        categories = categories.str.split(',')
+    exploded = categories.explode().astype('string').str.strip()
+    return exploded[exploded.notna() & (exploded != '')].astype('category')
+
+
+def compute_aggregates(df: pd.DataFrame) -> ChartAggregates:
+    """Every count the charts need, from columns categories, location, price, user_name and date
+
+    ``date`` must already be a datetime column.
+    """
+    categories = explode_categories(df['categories'].reset_index(drop=True))
+    main_categories = categories[~categories.index.duplicated(keep='first')]
+
+    daily_counts = df['date'].dropna().dt.to_period('D').value_counts().sort_index()
+    monthly_counts = daily_counts.groupby(daily_counts.index.asfreq('M')).sum()
+
+    return ChartAggregates(
+        total=len(df),
+        category_counts=nonzero(categories.value_counts()),
+        main_category_counts=nonzero(main_categories.value_counts()),
+        location_counts=nonzero(df['location'].value_counts()),
+        with_price=int(present(df['price']).sum()),
+        daily_counts=daily_counts,
+        monthly_counts=monthly_counts,
+        with_identity=int(present(df['user_name']).sum()),
+    )
@@ -0,0 +1,208 @@
+"""
+Local stand-in for ustasi.az used by the benchmarks.
+
+Serves ``/homelist/`` pages, detail pages and the ``ajax.php`` telshow
+endpoint, synthesized from the records in ``ustasi_listings.json``. The
+dataset can be scaled to any size: listing ``i`` reuses template record
+``i % len(templates)`` under a new listing ID, and pages are rendered on
+demand, so 100k+ listings cost no extra memory. Latency, jitter and an
+error rate (HTTP 503) can be injected.
+
+Usage: python bench_server.py --size 100000 --latency 0.05 --jitter 0.02
+"""
+
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import multiprocessing
+import random
+import re
+import socket
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+PAGE_SIZE = 20
+FIRST_ID = 100000
+DETAIL_PATH_RE = re.compile(r'-(\d+)\.html$')
+
+
+def load_templates(path: str = 'ustasi_listings.json') -> List[Dict]:
+    """Load the scraped records used as page templates"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def telshow_hash(listing_id: str) -> str:
+    """Per-listing hash the telshow endpoint expects"""
+    return hashlib.md5(f"bench-{listing_id}".encode('utf-8')).hexdigest()
+
+
+class ListingDataset:
+    """Synthetic catalogue of ``size`` listings built from template records"""
+
+    def __init__(self, templates: List[Dict], size: int):
+        if not templates:
+            raise ValueError("At least one template record is needed")
+        self.templates = templates
+        self.size = size
+
+    def record(self, index: int) -> Dict:
+        """Record for the listing at position ``index``"""
+        template = self.templates[index % len(self.templates)]
+        listing_id = str(FIRST_ID + index)
+        slug = DETAIL_PATH_RE.sub('', template['url'].rsplit('/', 1)[-1]) or 'elan'
+        return {**template, 'listing_id': listing_id, 'path': f"/{slug}-{listing_id}.html"}
+
+    def index_of(self, listing_id: str) -> Optional[int]:
+        index = int(listing_id) - FIRST_ID
+        return index if 0 <= index < self.size else None
+
+    def render_list_page(self, start: int) -> str:
+        first = start * PAGE_SIZE
+        items = []
+        for index in range(first, min(first + PAGE_SIZE, self.size)):
+            record = self.record(index)
+            items.append(
+                f'<div class="nobj prod"><a href="{record["path"]}">'
+                f'<img src="/img/{record["listing_id"]}.jpg"></a>'
+                f'<span class="title">{html.escape(record["title"])}</span>'
+                f'<span class="price">{html.escape(record["price"])}</span></div>'
+            )
+        return f'<html><head><title>Ustasi.az</title></head><body>{"".join(items)}</body></html>'
+
+    def render_detail_page(self, index: int) -> str:
+        record = self.record(index)
+        categories = ''.join(
+            f'<a href="/{re.sub(r"[^a-z0-9]+", "-", category.lower()) or "kateqoriya"}">'
+            f'{html.escape(category)}</a> &raquo; '
+            for category in record['categories'].split(', ') if category
+        )
+        user = (
+            f'<a href="/user/{record["user_id"]}">{html.escape(record["user_name"])} (Bütün Elanları)</a><br>'
+            if record['user_id'] else ''
+        )
+        return (
+            f'<html><head><title>{html.escape(record["title"])} - Ustasi.az</title></head><body>'
+            f'<h1>{html.escape(record["title"])}</h1>'
+            f'<div id="openhalf"><div class="crumbs">{categories}</div>'
+            f'<span class="pricecolor">{html.escape(record["price"])}</span>'
+            f'<p class="infop100">{html.escape(record["description"])}</p>'
+            f'<div class="infocontact">{user}{html.escape(record["location"])}<br>'
+            f'<div id="telshow" data-h="{telshow_hash(record["listing_id"])}">Nömrəni göstər</div></div>'
+            f'<span class="viewsbb">Baxış: {index % 500} Tarix: {record["date"]}</span>'
+            f'</div></body></html>'
+        )
+
+
+class BenchServer:
+    """aiohttp application serving a ``ListingDataset``"""
+
+    def __init__(self, dataset: ListingDataset, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0, compress: bool = True):
+        self.dataset = dataset
+        self.compress = compress  # gzip HTML pages like a production server
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+
+    async def _delay(self) -> bool:
+        """Sleep for the configured latency; returns False for an injected error"""
+        self.requests += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.random.random() >= self.error_rate
+
+    def _page(self, text: str) -> web.Response:
+        response = web.Response(text=text, content_type='text/html')
+        if self.compress:
+            response.enable_compression()  # Only applied if the client accepts it
+        return response
+
+    async def homelist(self, request: web.Request) -> web.Response:
+        if not await self._delay():
+            return web.Response(status=503)
+        try:
+            start = int(request.query.get('start', 0))
+        except ValueError:
+            start = 0
+        return self._page(self.dataset.render_list_page(start))
+
+    async def detail(self, request: web.Request) -> web.Response:
+        if not await self._delay():
+            return web.Response(status=503)
+        match = DETAIL_PATH_RE.search(request.path)
+        index = self.dataset.index_of(match.group(1)) if match else None
+        if index is None:
+            return web.Response(status=404)
+        return self._page(self.dataset.render_detail_page(index))
+
+    async def ajax(self, request: web.Request) -> web.Response:
+        if not await self._delay():
+            return web.Response(status=503)
+        form = await request.post()
+        listing_id = form.get('id', '')
+        index = self.dataset.index_of(listing_id) if str(listing_id).isdigit() else None
+        if form.get('act') != 'telshow' or index is None or form.get('h') != telshow_hash(listing_id):
+            return web.json_response({'ok': 0})
+        return web.json_response({'ok': 1, 'tel': self.dataset.record(index)['phone']})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/homelist/', self.homelist)
+        app.router.add_post('/ajax.php', self.ajax)
+        app.router.add_get('/{slug}', self.detail)
+        return app
+
+
+def run_server(host: str = '127.0.0.1', port: int = 8765, size: int = 1000, latency: float = 0.0,
+               jitter: float = 0.0, error_rate: float = 0.0, templates_path: str = 'ustasi_listings.json'):
+    """Serve a synthetic dataset until the process is stopped"""
+    dataset = ListingDataset(load_templates(templates_path), size)
+    server = BenchServer(dataset, latency=latency, jitter=jitter, error_rate=error_rate)
+    web.run_app(server.app(), host=host, port=port, print=None, access_log=None)
+
+
+def start_server_process(host: str = '127.0.0.1', port: int = 8765, timeout: float = 10.0,
+                         **kwargs) -> multiprocessing.Process:
+    """Start ``run_server`` in a child process and wait until it accepts connections"""
+    process = multiprocessing.Process(target=run_server, args=(host, port), kwargs=kwargs, daemon=True)
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.2):
+                return process
+        except OSError:
+            if not process.is_alive():
+                break
+            time.sleep(0.05)
+
+    process.terminate()
+    raise RuntimeError(f"Benchmark server did not start on {host}:{port}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Local stand-in server for ustasi.az')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--size', type=int, default=1000, help='Number of listings to serve')
+    parser.add_argument('--latency', type=float, default=0.0, help='Base response latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--templates', default='ustasi_listings.json', help='Records used as page templates')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Serving {args.size} listings on http://{args.host}:{args.port}/")
+    run_server(args.host, args.port, size=args.size, latency=args.latency, jitter=args.jitter,
+               error_rate=args.error_rate, templates_path=args.templates)
@@ -0,0 +1,194 @@
+"""
+End-to-end throughput benchmark for UstasiScraperV2.
+
+Starts the local stand-in server from ``bench_server.py``, runs the full
+scraper against it once per configuration (each run in its own process,
+inside a temporary directory) and reports listings/sec, p50/p99 request
+latency per stage, peak RSS and CPU time.
+
+Usage:
+    python benchmark.py --size 5000 --latency 0.05 --jitter 0.02 --max-concurrency 8,16,32
+    python benchmark.py --transport default,tuned --loop asyncio,uvloop
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench_server import PAGE_SIZE, start_server_process
+from scraper_v2 import UstasiScraperV2
+from transport import use_uvloop
+
+
+class TimedScraper(UstasiScraperV2):
+    """Scraper that records the latency of every request by stage
+
+    Latency is measured around ``fetch``, so it includes time spent waiting
+    for a limiter slot as well as the server round trip.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: Dict[str, List[float]] = {'list': [], 'detail': [], 'phone': []}
+
+    def request_stage(self, url: str) -> str:
+        if url == self.homelist_url:
+            return 'list'
+        if url == self.ajax_url:
+            return 'phone'
+        return 'detail'
+
+    async def fetch(self, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().fetch(method, url, *args, **kwargs)
+        finally:
+            self.latencies[self.request_stage(url)].append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_config(base_url: str, size: int, options: Dict, results: multiprocessing.Queue):
+    """Run one scrape in the current process and put its measurements on ``results``
+
+    ``options`` are scraper arguments, plus ``loop`` ('asyncio' or 'uvloop').
+    """
+    workdir = tempfile.mkdtemp(prefix='ustasi_bench_')
+    os.chdir(workdir)
+    scraper_options = {key: value for key, value in options.items() if key != 'loop'}
+    if options.get('loop') == 'uvloop' and not use_uvloop():
+        options = {**options, 'loop': 'asyncio'}
+
+    max_pages = (size + PAGE_SIZE - 1) // PAGE_SIZE + 1
+    scraper = TimedScraper(max_pages=max_pages, base_url=base_url, **scraper_options)
+
+    wall_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(scraper.run())
+    wall = time.perf_counter() - wall_start
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)  # Parse pool workers
+    results.put({
+        'options': options,
+        'listings': scraper.record_count,
+        'wall_seconds': wall,
+        'listings_per_sec': scraper.record_count / wall if wall else 0.0,
+        'latency': {
+            stage: {
+                'count': len(values),
+                'p50_ms': (percentile(values, 0.50) or 0.0) * 1000,
+                'p99_ms': (percentile(values, 0.99) or 0.0) * 1000,
+            }
+            for stage, values in scraper.latencies.items()
+        },
+        'peak_rss_mb': own.ru_maxrss / 1024,  # ru_maxrss is in KiB on Linux
+        'cpu_seconds': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'retries': scraper.retries.retries,
+        'failed': scraper.failed,
+    })
+
+
+def benchmark(base_url: str, size: int, configs: List[Dict]) -> List[Dict]:
+    """Run every configuration in a fresh process"""
+    results = []
+    for options in configs:
+        queue: multiprocessing.Queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_config, args=(base_url, size, options, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        results.append(result)
+        print_result(result)
+    return results
+
+
+def print_result(result: Dict):
+    options = ', '.join(f"{key}={value}" for key, value in result['options'].items())
+    print(f"\n[{options}]")
+    print(f"  {result['listings']} listings in {result['wall_seconds']:.2f}s "
+          f"-> {result['listings_per_sec']:.1f} listings/sec "
+          f"(failed {result['failed']}, retries {result['retries']})")
+    for stage, stats in result['latency'].items():
+        if stats['count']:
+            print(f"  {stage:<7} {stats['count']:>7} requests  p50 {stats['p50_ms']:7.1f} ms  "
+                  f"p99 {stats['p99_ms']:7.1f} ms")
+    print(f"  peak RSS {result['peak_rss_mb']:.1f} MB, CPU {result['cpu_seconds']:.2f}s")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark UstasiScraperV2 against a local server')
+    parser.add_argument('--size', type=int, default=2000, help='Number of listings to serve')
+    parser.add_argument('--latency', type=float, default=0.02, help='Server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Server latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 503 responses')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--max-concurrency', default='16',
+                        help='Comma-separated limiter ceilings to compare (default: 16)')
+    parser.add_argument('--max-rps', type=float, default=0,
+                        help='Requests-per-second ceiling; 0 disables it (default: 0)')
+    parser.add_argument('--parser', default='lxml', choices=['soup', 'lxml'])
+    parser.add_argument('--page-window', type=int, default=5)
+    parser.add_argument('--batch', action='store_true', help='Use two-phase batch mode instead of streaming')
+    parser.add_argument('--parse-in-processes', action='store_true')
+    parser.add_argument('--transport', default='tuned',
+                        help='Comma-separated transport presets to compare (default: tuned)')
+    parser.add_argument('--loop', default='asyncio',
+                        help='Comma-separated event loops to compare: asyncio, uvloop (default: asyncio)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    templates = str(Path(__file__).resolve().parent / 'ustasi_listings.json')
+    server = start_server_process(port=args.port, size=args.size, latency=args.latency,
+                                  jitter=args.jitter, error_rate=args.error_rate,
+                                  templates_path=templates)
+    try:
+        configs = [
+            {
+                'max_concurrency': int(value),
+                'max_rps': args.max_rps or None,
+                'phone_max_rps': args.max_rps or None,
+                'phone_workers': max(1, int(value) // 2),
+                'parser': args.parser,
+                'page_window': args.page_window,
+                'stream': not args.batch,
+                'parse_in_processes': args.parse_in_processes,
+                'transport': transport,
+                'loop': loop,
+            }
+            for value in args.max_concurrency.split(',')
+            for transport in args.transport.split(',')
+            for loop in args.loop.split(',')
+        ]
+        print(f"Benchmarking {args.size} listings, latency {args.latency * 1000:.0f}"
+              f"±{args.jitter * 1000:.0f} ms, error rate {args.error_rate:.1%}")
+        results = benchmark(f"http://127.0.0.1:{args.port}", args.size, configs)
+    finally:
+        server.terminate()
+        server.join()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
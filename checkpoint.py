@@ -0,0 +1,97 @@
+"""
+Append-only JSONL checkpoint log for scraped listings.
+
+Each scraped record is one JSON line. Lines are buffered and written in
+batches, so checkpoint cost stays linear in the number of listings, and a
+crash can at worst lose the unflushed batch or leave one truncated last
+line, which is dropped on replay.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+
+class RecordLog:
+    """Durable append-only log of scraped records"""
+
+    FSYNC_POLICIES = ('never', 'batch', 'always')
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 50, fsync: str = 'batch'):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(self.FSYNC_POLICIES)}")
+        self.path = Path(path)
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync  # 'never', once per 'batch', or after 'always' (every record)
+        self._buffer: List[str] = []
+        self._file = None
+
+    def _open(self):
+        """Open the log for appending, cutting off a torn last line"""
+        if self._file is None:
+            if self.path.exists():
+                with open(self.path, 'rb+') as f:
+                    data = f.read()
+                    if data and not data.endswith(b'\n'):
+                        f.truncate(data.rfind(b'\n') + 1)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def append(self, record: Dict):
+        """Queue a record, writing the batch out when it is full"""
+        self._buffer.append(json.dumps(record, ensure_ascii=False))
+        if self.fsync == 'always' or len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to disk"""
+        if not self._buffer:
+            return
+        f = self._open()
+        f.write('\n'.join(self._buffer) + '\n')
+        f.flush()
+        if self.fsync != 'never':
+            os.fsync(f.fileno())
+        self._buffer.clear()
+
+    def replay(self) -> Iterator[Dict]:
+        """Yield every complete record in the log"""
+        for _, record in self.scan():
+            yield record
+
+    def scan(self) -> Iterator[Tuple[int, Dict]]:
+        """Yield ``(byte offset, record)`` for every complete record in the log"""
+        if not self.path.exists():
+            return
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.endswith(b'\n'):
+                    break  # Torn write from a crash
+                try:
+                    yield start, json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def read_at(self, offset: int) -> Dict:
+        """Record starting at a byte offset returned by ``scan``"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def close(self):
+        """Flush pending records and close the file"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Discard buffered records and delete the log"""
+        self._buffer.clear()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.path.unlink(missing_ok=True)
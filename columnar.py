@@ -0,0 +1,217 @@
+"""
+Columnar Parquet output of scraped listings.
+
+Records are converted to a typed Arrow schema: ``location``, ``user_id``,
+the price currency and the category values are dictionary-encoded,
+``date`` is a real date (with the optional time of day in ``posted_at``),
+``price`` is split into ``price_amount`` and ``price_currency`` and
+``categories`` is a list column. ``ParquetWriter`` streams records into
+row groups the same way the JSON and CSV exporters do; ``load_columns``
+reads back only the requested columns, memory-mapped.
+"""
+
+import json
+import os
+import re
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from listing import Listing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only needed for Parquet output
+    pa = None
+    pq = None
+
+
+PRICE_RE = re.compile(r'^\s*([\d\s]+(?:[.,]\d+)?)\s*(\D*?)\s*$')
+DATE_FORMAT = '%d.%m.%Y'
+DATETIME_FORMAT = '%d.%m.%Y %H:%M'
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ValueError("Parquet output needs the 'pyarrow' package")
+
+
+def listing_schema() -> 'pa.Schema':
+    """Arrow schema of the Parquet dataset"""
+    require_pyarrow()
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('listing_id', pa.string()),
+        ('url', pa.string()),
+        ('title', pa.string()),
+        ('categories', pa.list_(dictionary)),
+        ('price', pa.string()),
+        ('price_amount', pa.float64()),
+        ('price_currency', dictionary),
+        ('phone', pa.string()),
+        ('user_name', pa.string()),
+        ('user_id', dictionary),
+        ('location', dictionary),
+        ('date', pa.date32()),
+        ('posted_at', pa.timestamp('s')),
+        ('description', pa.string()),
+    ])
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """Split a price like ``'10 Azn'`` into ``(10.0, 'AZN')``"""
+    match = PRICE_RE.match(text or '')
+    if not match:
+        return None, None
+    amount = float(match.group(1).replace(' ', '').replace(',', '.'))
+    return amount, match.group(2).upper() or None
+
+
+def parse_date(text: Optional[str]) -> Tuple[Optional[date], Optional[datetime]]:
+    """Day and, when the page shows one, the full posting time of a listing"""
+    text = (text or '').strip()
+    try:
+        posted = datetime.strptime(text, DATETIME_FORMAT)
+        return posted.date(), posted
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, DATE_FORMAT).date(), None
+    except ValueError:
+        return None, None
+
+
+def split_categories(text: Optional[str]) -> List[str]:
+    return [category.strip() for category in (text or '').split(',') if category.strip()]
+
+
+def _dictionary(values: List[Optional[str]]) -> 'pa.DictionaryArray':
+    return pa.array(values, pa.string()).dictionary_encode().cast(pa.dictionary(pa.int32(), pa.string()))
+
+
+def to_batch(records: List[Dict]) -> 'pa.RecordBatch':
+    """Convert scraped records to a record batch with ``listing_schema``"""
+    require_pyarrow()
+    prices = [parse_price(record.get('price')) for record in records]
+    dates = [parse_date(record.get('date')) for record in records]
+    categories = [split_categories(record.get('categories')) for record in records]
+
+    offsets = [0]
+    for values in categories:
+        offsets.append(offsets[-1] + len(values))
+    flat = _dictionary([value for values in categories for value in values])
+
+    def text(field: str) -> 'pa.Array':
+        return pa.array([record.get(field) or None for record in records], pa.string())
+
+    columns = {
+        'listing_id': text('listing_id'),
+        'url': text('url'),
+        'title': text('title'),
+        'categories': pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), flat),
+        'price': text('price'),
+        'price_amount': pa.array([amount for amount, _ in prices], pa.float64()),
+        'price_currency': _dictionary([currency for _, currency in prices]),
+        'phone': text('phone'),
+        'user_name': text('user_name'),
+        'user_id': _dictionary([record.get('user_id') or None for record in records]),
+        'location': _dictionary([record.get('location') or None for record in records]),
+        'date': pa.array([day for day, _ in dates], pa.date32()),
+        'posted_at': pa.array([posted for _, posted in dates], pa.timestamp('s')),
+        'description': text('description'),
+    }
+    return pa.RecordBatch.from_arrays(list(columns.values()), schema=listing_schema())
+
+
+class ParquetWriter:
+    """Streams records into a Parquet file, one row group per ``row_group_size`` records
+
+    Like the JSON and CSV writers, it writes to ``<name>.part`` and renames
+    the file into place on ``commit``.
+    """
+
+    def __init__(self, path: Union[str, Path] = 'ustasi_listings.parquet', row_group_size: int = 10000,
+                 compression: str = 'zstd'):
+        require_pyarrow()
+        self.path = Path(path)
+        self.row_group_size = max(1, row_group_size)
+        self.compression = compression  # Parquet page compression
+        self.count = 0
+        self._buffer: List[Listing] = []  # Compact records, since a row group can be large
+        self._writer: Optional['pq.ParquetWriter'] = None
+
+    @property
+    def _temp_path(self) -> Path:
+        return self.path.with_name(self.path.name + '.part')
+
+    def write(self, record: Dict):
+        self._buffer.append(record if isinstance(record, Listing) else Listing(record))
+        self.count += 1
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(str(self._temp_path), listing_schema(),
+                                            compression=self.compression)
+        if self._buffer:
+            self._writer.write_batch(to_batch(self._buffer))
+            self._buffer.clear()
+
+    def commit(self, path: Optional[Union[str, Path]] = None) -> List[Path]:
+        """Write the last row group and rename the file into place"""
+        self._flush()
+        self._writer.close()
+        self._writer = None
+        destination = Path(path) if path else self.path
+        os.replace(self._temp_path, destination)
+        return [destination]
+
+    def abort(self):
+        self._buffer.clear()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._temp_path.unlink(missing_ok=True)
+
+
+def load_columns(path: Union[str, Path] = 'ustasi_listings.parquet',
+                 columns: Optional[List[str]] = None):
+    """Read only ``columns`` of the Parquet dataset into a DataFrame, memory-mapped"""
+    require_pyarrow()
+    import pandas as pd  # Only needed to read the dataset back, not by the scraper
+
+    table = pq.read_table(str(path), columns=columns, memory_map=True)
+    # Dates as datetime64, not date objects; list columns stay Arrow-backed
+    return table.to_pandas(date_as_object=False,
+                           types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_list(t) else None)
+
+
+def parquet_is_current(parquet_file: str = 'ustasi_listings.parquet',
+                       csv_file: str = 'ustasi_listings.csv') -> bool:
+    """Whether the Parquet dataset can be read and is not older than the CSV export
+
+    Only runs with ``--parquet`` write it, so a dataset left by an earlier
+    run is ignored once a later run has rewritten the CSV.
+    """
+    if pa is None or not os.path.exists(parquet_file):
+        return False
+    return not os.path.exists(csv_file) or os.path.getmtime(parquet_file) >= os.path.getmtime(csv_file)
+
+
+def convert(json_file: str = 'ustasi_listings.json', parquet_file: str = 'ustasi_listings.parquet') -> int:
+    """Write the Parquet dataset for an existing JSON export"""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    writer = ParquetWriter(parquet_file)
+    for record in records:
+        writer.write(record)
+    writer.commit()
+    print(f"Saved {writer.count} listings to {parquet_file}")
+    return writer.count
+
+
+if __name__ == "__main__":
+    convert(*sys.argv[1:3])
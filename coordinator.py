@@ -0,0 +1,503 @@
+"""
+Sharded crawl across several worker processes or machines.
+
+The work is split through a shared SQLite queue: the coordinator seeds it
+with ranges of list-page ``start`` values, workers lease ranges, fetch
+and parse those pages and add the detail URLs they find (keyed on
+``listing_id``, so each listing is queued once), then lease and scrape
+batches of detail URLs. Leases expire, so items held by a crashed worker
+are handed out again. Every worker appends its records to its own JSONL
+log; ``merge`` combines the logs into ``ustasi_listings.json``/``.csv``
+with one record per ``listing_id``.
+
+Workers on other machines need the queue database on a filesystem with
+working file locks. Their request limits apply per worker.
+
+Usage:
+    python coordinator.py run --workers 4 --max-pages 100
+    python coordinator.py seed --max-pages 100 --shard-dir /shared/ustasi
+    python coordinator.py worker --shard-dir /shared/ustasi       (on each machine)
+    python coordinator.py merge --shard-dir /shared/ustasi
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import columnar
+from aggregate_store import AggregateStore
+from checkpoint import RecordLog
+from exporters import ListingExporter
+from parsers import PARSERS
+from scraper_v2 import UstasiScraperV2
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS work_state ON work (kind, state);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class WorkQueue:
+    """SQLite work queue with expiring leases
+
+    Items are ``(kind, key, payload)`` with kind ``'list'`` (a range of
+    list pages) or ``'detail'`` (a listing URL). An item is ``pending``,
+    ``leased`` to a worker until its lease expires, then ``done``,
+    ``failed`` or ``skipped``. An item whose lease has expired, or that
+    was handed back with ``retry``, after ``max_attempts`` leases is marked
+    failed instead of being re-issued.
+    """
+
+    def __init__(self, path: Union[str, Path], max_attempts: int = 3, timeout: float = 30.0):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        # Autocommit; writes that must be atomic run in explicit transactions
+        self.conn = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def add(self, kind: str, items: List[Tuple[str, str]]) -> int:
+        """Queue ``(key, payload)`` items; returns how many were new"""
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO work (kind, key, payload) VALUES (?, ?, ?)',
+                [(kind, key, payload) for key, payload in items]
+            )
+            return self.conn.total_changes - before
+
+    def lease(self, owner: str, kind: str, limit: int = 1,
+              lease_seconds: float = 300.0) -> List[Tuple[str, str]]:
+        """Lease up to ``limit`` items of a kind, oldest first
+
+        Pending items and items whose lease has expired are eligible.
+        """
+        now = time.time()
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE work SET state = 'failed', owner = NULL "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            rows = self.conn.execute(
+                "SELECT rowid, key, payload FROM work WHERE kind = ? AND "
+                "(state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                "ORDER BY rowid LIMIT ?",
+                (kind, now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE work SET state = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE rowid = ?",
+                [(owner, now + lease_seconds, row['rowid']) for row in rows]
+            )
+        return [(row['key'], row['payload']) for row in rows]
+
+    def renew(self, owner: str, lease_seconds: float = 300.0):
+        """Extend every lease a worker holds"""
+        self.conn.execute(
+            "UPDATE work SET lease_expires = ? WHERE owner = ? AND state = 'leased'",
+            (time.time() + lease_seconds, owner)
+        )
+
+    def finish(self, owner: str, kind: str, keys: List[str], state: str = 'done'):
+        """Mark leased items as done or failed
+
+        Items whose lease was lost to another worker are left alone.
+        """
+        with self._transaction():
+            self.conn.executemany(
+                "UPDATE work SET state = ?, owner = NULL "
+                "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                [(state, kind, key, owner) for key in keys]
+            )
+
+    def retry(self, owner: str, kind: str, keys: List[str]):
+        """Hand leased items back to the queue after a failed attempt
+
+        Items that have used up ``max_attempts`` are marked failed instead.
+        """
+        with self._transaction():
+            self.conn.executemany(
+                "UPDATE work SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL "
+                "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                [(self.max_attempts, kind, key, owner) for key in keys]
+            )
+
+    def end_of_list(self, start: int):
+        """Record that list pages from ``start`` on are past the end
+
+        Pending list ranges beyond that page are skipped.
+        """
+        with self._transaction():
+            end = self.list_end()
+            if end is not None and end <= start:
+                return
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('list_end', ?)", (str(start),)
+            )
+            self.conn.execute(
+                "UPDATE work SET state = 'skipped' "
+                "WHERE kind = 'list' AND state = 'pending' AND CAST(key AS INTEGER) > ?",
+                (start,)
+            )
+
+    def list_end(self) -> Optional[int]:
+        """First list page known to be past the end, if any"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'list_end'").fetchone()
+        return int(row['value']) if row else None
+
+    def unfinished(self) -> int:
+        """Items still pending or leased"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM work WHERE state IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Number of items per kind and state"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in self.conn.execute('SELECT kind, state, COUNT(*) AS n FROM work GROUP BY kind, state'):
+            counts.setdefault(row['kind'], {})[row['state']] = row['n']
+        return counts
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT``, so concurrent workers never lease the same item"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def seed(queue: WorkQueue, max_pages: int, range_size: int = 10) -> int:
+    """Queue list-page ranges covering ``max_pages`` pages; returns how many were new"""
+    items = []
+    for start in range(0, max_pages, range_size):
+        end = min(start + range_size, max_pages)
+        items.append((str(start), json.dumps({'start': start, 'end': end})))
+    return queue.add('list', items)
+
+
+class ShardWorker:
+    """Worker draining the shared queue with one ``UstasiScraperV2``
+
+    List ranges are leased before detail URLs, so discovery runs ahead of
+    scraping. A detail batch is marked done only after its phone lookups
+    finished and its records were flushed to the worker's log; a crash
+    before that re-issues the batch once the lease expires.
+    """
+
+    def __init__(self, shard_dir: Union[str, Path], worker_id: Optional[str] = None,
+                 batch_size: int = 32, lease_seconds: float = 300.0, poll_interval: float = 2.0,
+                 **scraper_options):
+        self.shard_dir = Path(shard_dir)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.queue = WorkQueue(self.shard_dir / 'queue.db')
+        # Exports and chart aggregates are written once, by merge
+        self.scraper = UstasiScraperV2(**scraper_options)
+        self.scraper.record_log = RecordLog(self.shard_dir / f'worker-{self.worker_id}.jsonl')
+        self.scraper.exporter = None
+        self.pages = 0
+
+    async def run(self):
+        """Work until the queue has nothing left to do"""
+        scraper = self.scraper
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await scraper.create_session()
+            scraper.start_parse_pool()
+            await scraper.start_phone_stage()
+
+            while True:
+                ranges = self.queue.lease(self.worker_id, 'list', 1, self.lease_seconds)
+                if ranges:
+                    await self.crawl_range(*ranges[0])
+                    continue
+
+                batch = self.queue.lease(self.worker_id, 'detail', self.batch_size, self.lease_seconds)
+                if batch:
+                    await self.scrape_batch(batch)
+                    continue
+
+                if not self.queue.unfinished():
+                    break
+                # Other workers still hold leases; they may add URLs or crash
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            await scraper.stop_phone_stage()
+            scraper.retries.write_dead_letters(self.shard_dir / f'dead_letters-{self.worker_id}.json')
+            scraper.record_log.close()
+            await scraper.close_session()
+            scraper.stop_parse_pool()
+            self.queue.close()
+
+        print(f"[{self.worker_id}] {self.pages} pages, {scraper.progress_summary()}")
+
+    async def crawl_range(self, key: str, payload: str):
+        """Fetch a range of list pages and queue the detail URLs found
+
+        Mirrors the sequential stop rule: an empty page, or a whole range
+        without a single new listing, marks the end of the list. A page that
+        could not be fetched says nothing about the end, so a range with
+        failed pages is handed back to the queue and crawled again.
+        """
+        page_range = json.loads(payload)
+        start, end = page_range['start'], page_range['end']
+        new_in_range = 0
+        failed_pages = 0
+
+        for page in range(start, end):
+            list_end = self.queue.list_end()
+            if list_end is not None and page >= list_end:
+                break
+
+            html = await self.scraper.fetch_listings_page(page)
+            self.pages += 1
+            if html is None:
+                failed_pages += 1  # Already retried and dead-lettered
+                continue
+            urls = await self.scraper.parse_listing_page(html)
+            if not urls:
+                self.queue.end_of_list(page)
+                break
+            new_in_range += self.queue.add('detail', [
+                (self.scraper.extract_listing_id(url) or url, url) for url in urls
+            ])
+        else:
+            if new_in_range == 0 and not failed_pages:
+                self.queue.end_of_list(start)
+
+        if failed_pages:
+            print(f"[{self.worker_id}] {failed_pages} list pages failed in range {start}-{end}, requeued")
+            self.queue.retry(self.worker_id, 'list', [key])
+        else:
+            self.queue.finish(self.worker_id, 'list', [key])
+
+    async def scrape_batch(self, batch: List[Tuple[str, str]]):
+        """Scrape a batch of detail URLs and mark each item done or failed
+
+        A listing this worker had already scraped (``scrape_one`` skips it)
+        counts as done.
+        """
+        scraper = self.scraper
+        results = await asyncio.gather(*(scraper.scrape_one(url) for _, url in batch))
+        await scraper.drain_phone_stage()
+        scraper.save_intermediate_results()
+        print(f"[{self.worker_id}] {scraper.progress_summary()}")
+
+        succeeded = [bool(result) or scraper.extract_listing_id(url) in scraper.scraped_ids
+                     for (_, url), result in zip(batch, results)]
+        done = [key for (key, _), ok in zip(batch, succeeded) if ok]
+        failed = [key for (key, _), ok in zip(batch, succeeded) if not ok]
+        self.queue.finish(self.worker_id, 'detail', done)
+        if failed:
+            self.queue.finish(self.worker_id, 'detail', failed, state='failed')
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.queue.renew(self.worker_id, self.lease_seconds)
+
+
+def merge(shard_dir: Union[str, Path], json_file: str = 'ustasi_listings.json',
+          csv_file: str = 'ustasi_listings.csv', compression: Optional[str] = None,
+          max_bytes: Optional[int] = None,
+          parquet_file: Optional[str] = None,
+          aggregates_path: Optional[str] = None) -> int:
+    """Combine worker logs into the usual JSON and CSV exports
+
+    Records are deduplicated on ``listing_id`` (the URL when there is
+    none), keeping the first-seen order. A later copy of a listing
+    replaces an earlier one unless it lost the phone number. Only the
+    position of each chosen copy is kept in memory; the records are
+    streamed to the exports and, with ``aggregates_path``, counted in the
+    chart aggregate store. Returns the number of listings written.
+    """
+    chosen: Dict[str, Tuple[RecordLog, int, bool]] = {}  # key -> (log, offset, has phone)
+    duplicates = 0
+    logs = [RecordLog(path) for path in sorted(Path(shard_dir).glob('worker-*.jsonl'))]
+    for log in logs:
+        for offset, record in log.scan():
+            key = record.get('listing_id') or record.get('url')
+            has_phone = bool(record.get('phone'))
+            previous = chosen.get(key)
+            if previous is not None:
+                duplicates += 1
+                if previous[2] and not has_phone:
+                    continue
+            chosen[key] = (log, offset, has_phone)
+
+    print(f"Merging {len(chosen)} listings from {len(logs)} worker logs ({duplicates} duplicates dropped)")
+    if parquet_file and columnar.pa is None:
+        print("pyarrow is not installed, skipping the Parquet export")
+        parquet_file = None
+    exporter = ListingExporter(json_file, csv_file, compression, max_bytes, parquet_file)
+    aggregates = AggregateStore(aggregates_path) if aggregates_path else None
+    try:
+        for log, offset, _ in chosen.values():
+            record = log.read_at(offset)
+            exporter.write(record)
+            if aggregates is not None:
+                aggregates.upsert(record)
+    except BaseException:
+        exporter.abort()
+        raise
+    finally:
+        if aggregates is not None:
+            aggregates.close()
+    exporter.commit()
+    return exporter.count
+
+
+def print_status(queue: WorkQueue):
+    for kind, states in sorted(queue.counts().items()):
+        print(f"{kind:<7} " + ", ".join(f"{state} {count}" for state, count in sorted(states.items())))
+    list_end = queue.list_end()
+    if list_end is not None:
+        print(f"List ends at page {list_end}")
+
+
+def run_worker(shard_dir: str, worker_id: Optional[str], options: Dict):
+    """Process entry point for a local worker"""
+    worker = ShardWorker(shard_dir, worker_id, **options)
+    asyncio.run(worker.run())
+
+
+def scraper_options(args: argparse.Namespace, workers: int = 1) -> Dict:
+    """Worker arguments from the command line
+
+    Local workers share one IP, so the request-rate ceilings are split
+    between them.
+    """
+    return {
+        'batch_size': args.batch_size,
+        'lease_seconds': args.lease_seconds,
+        'parser': args.parser,
+        'base_url': args.base_url,
+        'cache_dir': args.cache_dir,
+        'max_concurrency': args.max_concurrency,
+        'max_rps': args.max_rps / workers if args.max_rps else None,
+        'phone_max_rps': args.phone_max_rps / workers if args.phone_max_rps else None,
+        'phone_workers': args.phone_workers,
+        'transport': args.transport,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Sharded ustasi.az crawl through a shared work queue')
+    parser.add_argument('command', choices=['run', 'seed', 'worker', 'merge', 'status'],
+                        help='run = seed, start local workers and merge; the others are the single steps')
+    parser.add_argument('--shard-dir', default='ustasi_shards',
+                        help='Directory holding queue.db and the worker logs (default: ustasi_shards)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Local worker processes for "run" (default: cores)')
+    parser.add_argument('--worker-id', default=None, help='Name of this worker (default: host-pid)')
+    parser.add_argument('--max-pages', type=int, default=100,
+                        help='Maximum number of list pages to fetch (default: 100)')
+    parser.add_argument('--range-size', type=int, default=10,
+                        help='List pages per work item (default: 10)')
+    parser.add_argument('--batch-size', type=int, default=32,
+                        help='Detail URLs leased at a time (default: 32)')
+    parser.add_argument('--lease-seconds', type=float, default=300.0,
+                        help='Seconds before an unrenewed lease is re-issued (default: 300)')
+    parser.add_argument('--base-url', default='https://ustasi.az')
+    parser.add_argument('--parser', default='lxml', choices=sorted(PARSERS),
+                        help="HTML parser backend; 'soup' is the BeautifulSoup reference (default: lxml)")
+    parser.add_argument('--cache-dir', default=None, help='Cache HTTP responses in this directory')
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                        help='Upper bound of each worker\'s request window (default: 16)')
+    parser.add_argument('--max-rps', type=float, default=25.0,
+                        help='Requests-per-second ceiling, split between local workers (default: 25)')
+    parser.add_argument('--phone-max-rps', type=float, default=10.0,
+                        help='Phone lookups per second, split between local workers (default: 10)')
+    parser.add_argument('--phone-workers', type=int, default=4)
+    parser.add_argument('--transport', default='tuned')
+    parser.add_argument('--compress', default=None, choices=['gzip', 'zstd'],
+                        help='Compress the merged JSON and CSV exports')
+    parser.add_argument('--rotate-mb', type=float, default=None,
+                        help='Split the merged exports into numbered parts of about this many MB')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Also write a typed ustasi_listings.parquet export (needs pyarrow)')
+    parser.add_argument('--aggregates-db', default='ustasi_aggregates.db',
+                        help="Chart counts built by merge; '' disables it (default: ustasi_aggregates.db)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    shard_dir = Path(args.shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.command in ('run', 'seed', 'status'):
+        queue = WorkQueue(shard_dir / 'queue.db')
+        if args.command == 'status':
+            print_status(queue)
+        else:
+            print(f"Queued {seed(queue, args.max_pages, args.range_size)} list-page ranges")
+        queue.close()
+
+    if args.command == 'worker':
+        run_worker(str(shard_dir), args.worker_id, scraper_options(args))
+
+    if args.command == 'run':
+        start_time = time.time()
+        options = scraper_options(args, args.workers)
+        processes = [
+            multiprocessing.Process(target=run_worker,
+                                    args=(str(shard_dir), f"local-{index}", options))
+            for index in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        print(f"{args.workers} workers finished in {time.time() - start_time:.2f} seconds")
+
+    if args.command in ('run', 'merge'):
+        merge(shard_dir, compression=args.compress,
+              max_bytes=int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None,
+              parquet_file='ustasi_listings.parquet' if args.parquet else None,
+              aggregates_path=args.aggregates_db or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Dedupe backends for seen and scraped listings.
+
+Every backend is a set of listing keys (``add``, ``update``, ``in``,
+``len``) that takes listing IDs or listing URLs; keys are normalized to
+the integer listing ID with ``listing_key``.
+
+``memory``  ``IdSet``, exact: integer IDs in a bitmap, other keys in a set.
+``bloom``   ``ScalableBloomFilter``, approximate: memory grows with the
+            number of keys, not their range, and a key that was never
+            added is reported as present with probability ``error_rate``.
+            For the scraper that means a listing is skipped at that rate.
+``sqlite``  ``SqliteIdSet``, exact and on disk, for catalogues whose IDs
+            do not fit in memory at all.
+
+Sets are not saved with checkpoints. A resumed run replays the record
+log to re-export what it already scraped, which rebuilds the scraped
+IDs exactly; a saved set could only be as recent as its last save.
+"""
+
+import hashlib
+import math
+import sqlite3
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, Union
+
+from listing import listing_key
+
+
+class IdSet:
+    """Set of listing keys with integer IDs held in a bitmap
+
+    Memory is one bit per possible ID up to the largest one seen; IDs
+    above ``max_bitmap_id`` and non-integer keys go to a regular set.
+    """
+
+    def __init__(self, keys: Iterable = (), max_bitmap_id: int = 1 << 27):
+        self.max_bitmap_id = max_bitmap_id  # 16 MB of bitmap at most
+        self._bits = bytearray()
+        self._count = 0
+        self._other: Set = set()
+        self.update(keys)
+
+    def _normalize(self, key) -> Union[int, str, None]:
+        return listing_key(key) if isinstance(key, str) else key
+
+    def _in_bitmap(self, key) -> bool:
+        return isinstance(key, int) and 0 <= key < self.max_bitmap_id
+
+    def add(self, key):
+        key = self._normalize(key)
+        if self._in_bitmap(key):
+            byte, bit = divmod(key, 8)
+            if byte >= len(self._bits):
+                # Grow geometrically so a rising ID sequence costs amortized O(1)
+                self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                self._count += 1
+        elif key is not None:
+            self._other.add(key)
+
+    def update(self, keys: Iterable):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key) -> bool:
+        key = self._normalize(key)
+        if self._in_bitmap(key):
+            byte, bit = divmod(key, 8)
+            return byte < len(self._bits) and bool(self._bits[byte] & (1 << bit))
+        return key is not None and key in self._other
+
+    def __len__(self) -> int:
+        return self._count + len(self._other)
+
+    def __iter__(self) -> Iterator:
+        for byte, value in enumerate(self._bits):
+            if value:
+                for bit in range(8):
+                    if value & (1 << bit):
+                        yield byte * 8 + bit
+        yield from self._other
+
+    def close(self):
+        pass
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for ``capacity`` keys at ``error_rate``"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        first, second = struct.unpack('<QQ', digest)
+        second |= 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class ScalableBloomFilter:
+    """Bloom filter that adds a larger slice whenever the current one is full
+
+    Slice ``i`` holds ``initial_capacity * growth**i`` keys at error rate
+    ``error_rate * (1 - tightening) * tightening**i``, so the overall false
+    positive rate stays below ``error_rate`` however many keys are added.
+    """
+
+    def __init__(self, keys: Iterable = (), error_rate: float = 0.001, initial_capacity: int = 100000,
+                 growth: int = 2, tightening: float = 0.5):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        if growth < 1 or not 0 < tightening < 1:
+            raise ValueError("growth must be at least 1 and tightening between 0 and 1")
+        self.error_rate = error_rate
+        self.initial_capacity = max(1, initial_capacity)
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: List[BloomFilter] = []
+        self.update(keys)
+
+    @staticmethod
+    def _digest(key) -> Optional[bytes]:
+        if isinstance(key, str):
+            key = listing_key(key)
+        if key is None:
+            return None
+        encoded = key.to_bytes(8, 'little', signed=True) if isinstance(key, int) else key.encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=16).digest()
+
+    def _new_filter(self) -> BloomFilter:
+        n = len(self.filters)
+        return BloomFilter(self.initial_capacity * self.growth ** n,
+                           self.error_rate * (1 - self.tightening) * self.tightening ** n)
+
+    def add(self, key):
+        digest = self._digest(key)
+        if digest is None or any(digest in bloom for bloom in self.filters):
+            return
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            self.filters.append(self._new_filter())
+        self.filters[-1].add(digest)
+
+    def update(self, keys: Iterable):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key) -> bool:
+        digest = self._digest(key)
+        return digest is not None and any(digest in bloom for bloom in self.filters)
+
+    def __len__(self) -> int:
+        """Keys added, less the few that were false positives when added"""
+        return sum(bloom.count for bloom in self.filters)
+
+    def close(self):
+        pass
+
+
+class SqliteIdSet:
+    """Exact set of listing keys in a SQLite table
+
+    The database at ``path`` is working state: it is emptied when the set
+    is created unless ``reset`` is False.
+    """
+
+    def __init__(self, keys: Iterable = (), path: Union[str, Path] = 'ustasi_ids.db',
+                 reset: bool = True, commit_every: int = 1000):
+        self.path = Path(path)
+        self.commit_every = max(1, commit_every)
+        self._pending_writes = 0
+        self.conn = sqlite3.connect(str(self.path), timeout=30.0)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS ids (key PRIMARY KEY) WITHOUT ROWID')
+        if reset:
+            self.conn.execute('DELETE FROM ids')
+        self.conn.commit()
+        self._count = self.conn.execute('SELECT COUNT(*) FROM ids').fetchone()[0]
+        self.update(keys)
+
+    @staticmethod
+    def _normalize(key) -> Union[int, str, None]:
+        return listing_key(key) if isinstance(key, str) else key
+
+    def add(self, key):
+        key = self._normalize(key)
+        if key is None:
+            return
+        cursor = self.conn.execute('INSERT OR IGNORE INTO ids (key) VALUES (?)', (key,))
+        self._count += cursor.rowcount
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def update(self, keys: Iterable):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key) -> bool:
+        key = self._normalize(key)
+        return key is not None and self.conn.execute(
+            'SELECT 1 FROM ids WHERE key = ?', (key,)
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator:
+        for key, in self.conn.execute('SELECT key FROM ids'):
+            yield key
+
+    def commit(self):
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def close(self):
+        """Commit and close the database"""
+        self.commit()
+        self.conn.close()
+
+
+DEDUPE_BACKENDS = {
+    'memory': IdSet,
+    'bloom': ScalableBloomFilter,
+    'sqlite': SqliteIdSet,
+}
+
+
+def new_id_set(backend: str = 'memory', path: Union[str, Path] = 'ustasi_ids.db',
+               error_rate: float = 0.001):
+    """Empty set of the given backend; ``path`` is only used by ``sqlite``"""
+    if backend == 'memory':
+        return IdSet()
+    if backend == 'bloom':
+        return ScalableBloomFilter(error_rate=error_rate)
+    if backend == 'sqlite':
+        return SqliteIdSet(path=path)
+    raise ValueError(f"Unknown dedupe backend {backend!r} (choose from {', '.join(DEDUPE_BACKENDS)})")
+
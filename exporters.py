@@ -0,0 +1,239 @@
+"""
+Streaming JSON and CSV exporters for scraped listings.
+
+Records are written one at a time as they are produced, so memory does
+not grow with the dataset. Output goes to ``<name>.part`` files that are
+renamed into place when the export is committed, so a finished file is
+never half-written. Files can be compressed (gzip, or zstd when the
+``zstandard`` package is installed) and rotated into numbered parts once
+they exceed a size. A typed Parquet file can be written alongside
+(see ``columnar``).
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import Dict, IO, Iterable, List, Optional, Union
+
+from columnar import ParquetWriter
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, only needed for 'zstd' output
+    zstandard = None
+
+
+CSV_FIELDS = ['listing_id', 'title', 'categories', 'price', 'phone',
+              'user_name', 'user_id', 'location', 'date', 'description', 'url']
+
+COMPRESSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def open_text(path: Path, compression: Optional[str] = None) -> IO[str]:
+    """Open ``path`` for writing text, through a compressor if one is given"""
+    if compression is None:
+        return open(path, 'w', encoding='utf-8', newline='')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd output needs the 'zstandard' package")
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+        return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    raise ValueError(f"Unknown compression {compression!r} (choose from gzip, zstd)")
+
+
+class StreamingWriter:
+    """Base class writing records to a file, or a series of numbered parts
+
+    Subclasses implement ``_begin``, ``_write`` and ``_end`` for one file,
+    writing through ``_put`` so ``_begin`` and ``_write`` can return the
+    UTF-8 bytes written. With ``max_bytes`` a new part is started once the
+    current one holds that many bytes (before compression); parts are named
+    ``<stem>-00001<suffix>``.
+    """
+
+    write_empty = True  # Whether an export without records still produces a file
+
+    def __init__(self, path: Union[str, Path], compression: Optional[str] = None,
+                 max_bytes: Optional[int] = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r} (choose from gzip, zstd)")
+        self.path = Path(path)  # Final name, without the compression suffix
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.count = 0  # Records written
+        self.parts = 0  # Parts started
+        self._file: Optional[IO[str]] = None
+        self._part_bytes = 0
+        self._part_count = 0
+
+    def part_path(self, number: int, path: Optional[Path] = None) -> Path:
+        """Final name of part ``number`` (1-based) of an export to ``path``"""
+        path = path or self.path
+        if self.max_bytes is not None:
+            path = path.with_name(f"{path.stem}-{number:05d}{path.suffix}")
+        return path.with_name(path.name + COMPRESSIONS[self.compression])
+
+    def write(self, record: Dict):
+        """Write one record, starting a new part if the current one is full"""
+        if self._file is not None and self.max_bytes is not None and self._part_bytes >= self.max_bytes:
+            self._close_part()
+        if self._file is None:
+            self._open_part()
+        self._part_bytes += self._write(record)
+        self._part_count += 1
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict]):
+        for record in records:
+            self.write(record)
+
+    def commit(self, path: Optional[Union[str, Path]] = None) -> List[Path]:
+        """Finish the export and rename every part into place
+
+        ``path`` exports under a different name than the one given at
+        construction, e.g. for partial results. Returns the final paths.
+        """
+        if self._file is None and not self.parts:
+            if not self.write_empty:
+                return []
+            self._open_part()  # An empty export still produces a valid file
+        if self._file is not None:
+            self._close_part()
+
+        final = []
+        for number in range(1, self.parts + 1):
+            destination = self.part_path(number, Path(path) if path else None)
+            os.replace(self._temp_path(number), destination)
+            final.append(destination)
+        self.parts = 0
+        return final
+
+    def abort(self):
+        """Close and delete the unfinished parts"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for number in range(1, self.parts + 1):
+            self._temp_path(number).unlink(missing_ok=True)
+        self.parts = 0
+
+    def _temp_path(self, number: int) -> Path:
+        path = self.part_path(number)
+        return path.with_name(path.name + '.part')
+
+    def _open_part(self):
+        self.parts += 1
+        self._file = open_text(self._temp_path(self.parts), self.compression)
+        self._part_bytes = self._begin()
+        self._part_count = 0
+
+    def _close_part(self):
+        self._end()
+        self._file.close()
+        self._file = None
+
+    def _put(self, text: str) -> int:
+        """Write ``text`` to the current part and return its size in bytes"""
+        self._file.write(text)
+        return len(text.encode('utf-8'))
+
+    def _begin(self) -> int:
+        return 0
+
+    def _write(self, record: Dict) -> int:
+        raise NotImplementedError
+
+    def _end(self):
+        pass
+
+
+class JSONArrayWriter(StreamingWriter):
+    """Writes records as a JSON array, formatted like ``json.dump(..., indent=2)``"""
+
+    def _begin(self) -> int:
+        return self._put('[')
+
+    def _write(self, record: Dict) -> int:
+        text = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        separator = ',\n  ' if self._part_count else '\n  '
+        return self._put(separator + text)
+
+    def _end(self):
+        self._file.write('\n]' if self._part_count else ']')
+
+
+class CSVWriter(StreamingWriter):
+    """Writes records as CSV rows with a header in every part
+
+    As the CSV export always did, it writes no file when there are no
+    records.
+    """
+
+    write_empty = False
+
+    def __init__(self, path: Union[str, Path], compression: Optional[str] = None,
+                 max_bytes: Optional[int] = None, fieldnames: List[str] = CSV_FIELDS):
+        super().__init__(path, compression, max_bytes)
+        self.fieldnames = fieldnames
+        self._row = io.StringIO()  # One formatted row, so its size can be counted
+        self._writer = csv.DictWriter(self._row, fieldnames=self.fieldnames)
+
+    def _put_row(self) -> int:
+        text = self._row.getvalue()
+        self._row.seek(0)
+        self._row.truncate()
+        return self._put(text)
+
+    def _begin(self) -> int:
+        self._writer.writeheader()
+        return self._put_row()
+
+    def _write(self, record: Dict) -> int:
+        self._writer.writerow({field: record.get(field, '') for field in self.fieldnames})
+        return self._put_row()
+
+
+class ListingExporter:
+    """Streams every record to the JSON, CSV and (optionally) Parquet exports at once"""
+
+    def __init__(self, json_file: str = 'ustasi_listings.json', csv_file: str = 'ustasi_listings.csv',
+                 compression: Optional[str] = None, max_bytes: Optional[int] = None,
+                 parquet_file: Optional[str] = None):
+        self.writers: List = [
+            JSONArrayWriter(json_file, compression, max_bytes),
+            CSVWriter(csv_file, compression, max_bytes),
+        ]
+        if parquet_file:
+            self.writers.append(ParquetWriter(parquet_file))
+
+    @property
+    def count(self) -> int:
+        return self.writers[0].count
+
+    def write(self, record: Dict):
+        for writer in self.writers:
+            writer.write(record)
+
+    def write_all(self, records: Iterable[Dict]):
+        for record in records:
+            self.write(record)
+
+    def commit(self, json_file: Optional[str] = None, csv_file: Optional[str] = None,
+               parquet_file: Optional[str] = None):
+        """Rename the finished exports into place, optionally under other names"""
+        for writer, name in zip(self.writers, (json_file, csv_file, parquet_file)):
+            paths = writer.commit(name)
+            if not paths:
+                print("No listings to save")
+                continue
+            where = paths[0] if len(paths) == 1 else f"{len(paths)} parts ({paths[0]} ...)"
+            print(f"Saved {writer.count} listings to {where}")
+
+    def abort(self):
+        for writer in self.writers:
+            writer.abort()
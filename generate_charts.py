@@ -1,225 +1,423 @@
 """
 Ustasi.az Data Analysis and Visualization
 This script generates insightful charts from the scraped listing data.
+
+Charts are rendered in a process pool. A chart is skipped when the
+aggregates it plots, its DPI and its format match the last render
+(recorded per output file in charts/.chart_hashes.json), so matplotlib and seaborn are
+only imported when something has to be drawn.
+
+With ``--unique`` the charts count unique offers: listings that
+near-duplicate another listing's description (see near_duplicates.py)
+are left out.
+
+Usage:
+    python generate_charts.py
+    python generate_charts.py --unique
+    python generate_charts.py --charts location_distribution,monthly_activity --dpi 120 --format svg
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import Counter
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
 
-# Set style for better-looking charts
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
-
-# Create charts directory if it doesn't exist
-os.makedirs('charts', exist_ok=True)
-
-# Load the data
-print("Loading data...")
-df = pd.read_csv('ustasi_listings.csv')
-print(f"Loaded {len(df)} listings")
-
-# Configure matplotlib for better display
-plt.rcParams['figure.figsize'] = (12, 6)
-plt.rcParams['font.size'] = 10
-
-# 1. TOP SERVICE CATEGORIES
-print("\n1. Generating service categories chart...")
-categories_all = []
-for cat in df['categories'].dropna():
-    categories_all.extend([c.strip() for c in str(cat).split(',')])
-
-category_counts = Counter(categories_all)
-top_categories = dict(sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:15])
-
-plt.figure(figsize=(14, 7))
-bars = plt.barh(list(top_categories.keys()), list(top_categories.values()), color='#3498db')
-plt.xlabel('Number of Listings', fontsize=12, fontweight='bold')
-plt.ylabel('Service Category', fontsize=12, fontweight='bold')
-plt.title('Top 15 Service Categories on Ustasi.az', fontsize=14, fontweight='bold', pad=20)
-plt.gca().invert_yaxis()
-
-# Add value labels on bars
-for i, (bar, value) in enumerate(zip(bars, top_categories.values())):
-    plt.text(value + 2, bar.get_y() + bar.get_height()/2,
-             str(value), va='center', fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('charts/top_service_categories.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/top_service_categories.png")
-plt.close()
-
-# 2. LOCATION DISTRIBUTION (BAR CHART)
-print("\n2. Generating location distribution chart...")
-location_counts = df['location'].value_counts()
-
-plt.figure(figsize=(12, 7))
-colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12'][:len(location_counts)]
-bars = plt.bar(location_counts.index, location_counts.values, color=colors, edgecolor='black', linewidth=1.5)
-plt.xlabel('Location', fontsize=12, fontweight='bold')
-plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
-plt.title('Geographic Distribution of Service Listings', fontsize=14, fontweight='bold', pad=20)
-plt.xticks(rotation=45, ha='right')
-plt.ylim(0, max(location_counts.values) * 1.1)
-
-# Add value labels on bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{int(height)}\n({height/len(df)*100:.1f}%)',
-             ha='center', va='bottom', fontweight='bold', fontsize=11)
-
-plt.tight_layout()
-plt.savefig('charts/location_distribution.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/location_distribution.png")
-plt.close()
-
-# 3. PRICE AVAILABILITY
-print("\n3. Generating price availability chart...")
-has_price = df['price'].notna() & (df['price'] != '')
-price_data = {
-    'With Price': has_price.sum(),
-    'Without Price': (~has_price).sum()
-}
+import pandas as pd
 
-plt.figure(figsize=(10, 7))
-colors_price = ['#2ecc71', '#e74c3c']
-bars = plt.bar(price_data.keys(), price_data.values(), color=colors_price, edgecolor='black', linewidth=1.5)
-plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
-plt.title('Price Information Availability', fontsize=14, fontweight='bold', pad=20)
-plt.ylim(0, max(price_data.values()) * 1.15)
-
-# Add value labels on bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{int(height)}\n({height/len(df)*100:.1f}%)',
-             ha='center', va='bottom', fontweight='bold', fontsize=11)
-
-plt.tight_layout()
-plt.savefig('charts/price_availability.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/price_availability.png")
-plt.close()
-
-# 4. LISTING ACTIVITY OVER TIME
-print("\n4. Generating activity timeline chart...")
-df['date_clean'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-date_counts = df['date_clean'].dt.to_period('D').value_counts().sort_index()
-
-plt.figure(figsize=(14, 6))
-date_counts.plot(kind='line', color='#3498db', linewidth=2, marker='o', markersize=4)
-plt.xlabel('Date', fontsize=12, fontweight='bold')
-plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
-plt.title('Daily Listing Activity on Ustasi.az', fontsize=14, fontweight='bold', pad=20)
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/listing_activity_timeline.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/listing_activity_timeline.png")
-plt.close()
-
-# 5. TOP MAIN CATEGORIES (First category only)
-print("\n5. Generating main categories distribution chart...")
-df['main_category'] = df['categories'].str.split(',').str[0].str.strip()
-main_cat_counts = df['main_category'].value_counts().head(10)
-
-plt.figure(figsize=(12, 7))
-colors_gradient = plt.cm.viridis(range(len(main_cat_counts)))
-bars = plt.bar(range(len(main_cat_counts)), main_cat_counts.values,
-               color=colors_gradient, edgecolor='black', linewidth=1.5)
-plt.xticks(range(len(main_cat_counts)), main_cat_counts.index, rotation=45, ha='right')
-plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
-plt.title('Top 10 Main Service Categories', fontsize=14, fontweight='bold', pad=20)
-
-# Add value labels on bars
-for i, (bar, value) in enumerate(zip(bars, main_cat_counts.values)):
-    plt.text(bar.get_x() + bar.get_width()/2., value,
-             str(value), ha='center', va='bottom', fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('charts/main_categories_distribution.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/main_categories_distribution.png")
-plt.close()
-
-# 6. PROVIDER BRANDING & IDENTITY
-print("\n6. Generating provider branding chart...")
-with_identity = (df['user_name'].notna() & (df['user_name'] != '')).sum()
-anonymous = (~(df['user_name'].notna() & (df['user_name'] != ''))).sum()
-
-user_data = {
-    'Branded Providers\n(Public Identity)': with_identity,
-    'Anonymous Providers\n(No Public Identity)': anonymous
+import columnar
+from aggregate_store import load_chart_aggregates
+from aggregates import ChartAggregates, compute_aggregates
+from near_duplicates import detect, is_stale, load_duplicate_ids
+from profiling import Profiler
+
+CHARTS_DIR = 'charts'
+HASH_FILE = os.path.join(CHARTS_DIR, '.chart_hashes.json')
+_pyplot = None
+
+
+def pyplot():
+    """matplotlib.pyplot, imported and styled on first use"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Files only, no display needed
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Set style for better-looking charts
+        plt.style.use('seaborn-v0_8-darkgrid')
+        sns.set_palette("husl")
+
+        # Configure matplotlib for better display
+        plt.rcParams['figure.figsize'] = (12, 6)
+        plt.rcParams['font.size'] = 10
+        _pyplot = plt
+    return _pyplot
+
+
+CHART_COLUMNS = ['categories', 'location', 'price', 'user_name', 'date']
+
+
+def load_listings(parquet_file: str = 'ustasi_listings.parquet',
+                  csv_file: str = 'ustasi_listings.csv', columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Columns the charts need, with dates parsed
+
+    Reads the typed Parquet dataset when it is current (only these
+    columns, memory-mapped); otherwise falls back to parsing the CSV
+    export, where categories stay comma-separated strings. Listings whose
+    date has a time of day are counted on that day.
+    """
+    columns = columns or CHART_COLUMNS
+    if columnar.parquet_is_current(parquet_file, csv_file):
+        print(f"Loading {parquet_file}...")
+        return columnar.load_columns(parquet_file, columns)
+
+    print(f"Loading {csv_file}...")
+    df = pd.read_csv(csv_file, usecols=columns, dtype=str)
+    df['location'] = df['location'].astype('category')
+    # The day of a '28.10.2025 08:34' posting time counts too
+    df['date'] = pd.to_datetime(df['date'].str.slice(0, 10), format=columnar.DATE_FORMAT, errors='coerce')
+    return df
+
+
+def plot_top_categories(agg: ChartAggregates, path: str, dpi: int):
+    """1. TOP SERVICE CATEGORIES"""
+    plt = pyplot()
+    top_categories = agg.category_counts.head(15)
+
+    plt.figure(figsize=(14, 7))
+    bars = plt.barh(list(top_categories.index), list(top_categories.values), color='#3498db')
+    plt.xlabel('Number of Listings', fontsize=12, fontweight='bold')
+    plt.ylabel('Service Category', fontsize=12, fontweight='bold')
+    plt.title('Top 15 Service Categories on Ustasi.az', fontsize=14, fontweight='bold', pad=20)
+    plt.gca().invert_yaxis()
+
+    # Add value labels on bars
+    for i, (bar, value) in enumerate(zip(bars, top_categories.values)):
+        plt.text(value + 2, bar.get_y() + bar.get_height()/2,
+                 str(value), va='center', fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_location_distribution(agg: ChartAggregates, path: str, dpi: int):
+    """2. LOCATION DISTRIBUTION (BAR CHART)"""
+    plt = pyplot()
+    location_counts = agg.location_counts
+
+    plt.figure(figsize=(12, 7))
+    colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12'][:len(location_counts)]
+    bars = plt.bar(location_counts.index.astype(str), location_counts.values, color=colors,
+                   edgecolor='black', linewidth=1.5)
+    plt.xlabel('Location', fontsize=12, fontweight='bold')
+    plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
+    plt.title('Geographic Distribution of Service Listings', fontsize=14, fontweight='bold', pad=20)
+    plt.xticks(rotation=45, ha='right')
+    plt.ylim(0, max(location_counts.values) * 1.1)
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 f'{int(height)}\n({height/agg.total*100:.1f}%)',
+                 ha='center', va='bottom', fontweight='bold', fontsize=11)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_price_availability(agg: ChartAggregates, path: str, dpi: int):
+    """3. PRICE AVAILABILITY"""
+    plt = pyplot()
+    price_data = {
+        'With Price': agg.with_price,
+        'Without Price': agg.without_price
+    }
+
+    plt.figure(figsize=(10, 7))
+    colors_price = ['#2ecc71', '#e74c3c']
+    bars = plt.bar(price_data.keys(), price_data.values(), color=colors_price, edgecolor='black', linewidth=1.5)
+    plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
+    plt.title('Price Information Availability', fontsize=14, fontweight='bold', pad=20)
+    plt.ylim(0, max(price_data.values()) * 1.15)
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 f'{int(height)}\n({height/agg.total*100:.1f}%)',
+                 ha='center', va='bottom', fontweight='bold', fontsize=11)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_activity_timeline(agg: ChartAggregates, path: str, dpi: int):
+    """4. LISTING ACTIVITY OVER TIME"""
+    plt = pyplot()
+    plt.figure(figsize=(14, 6))
+    agg.daily_counts.plot(kind='line', color='#3498db', linewidth=2, marker='o', markersize=4)
+    plt.xlabel('Date', fontsize=12, fontweight='bold')
+    plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
+    plt.title('Daily Listing Activity on Ustasi.az', fontsize=14, fontweight='bold', pad=20)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_main_categories(agg: ChartAggregates, path: str, dpi: int):
+    """5. TOP MAIN CATEGORIES (First category only)"""
+    plt = pyplot()
+    main_cat_counts = agg.main_category_counts.head(10)
+
+    plt.figure(figsize=(12, 7))
+    colors_gradient = plt.cm.viridis(range(len(main_cat_counts)))
+    bars = plt.bar(range(len(main_cat_counts)), main_cat_counts.values,
+                   color=colors_gradient, edgecolor='black', linewidth=1.5)
+    plt.xticks(range(len(main_cat_counts)), main_cat_counts.index, rotation=45, ha='right')
+    plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
+    plt.title('Top 10 Main Service Categories', fontsize=14, fontweight='bold', pad=20)
+
+    # Add value labels on bars
+    for i, (bar, value) in enumerate(zip(bars, main_cat_counts.values)):
+        plt.text(bar.get_x() + bar.get_width()/2., value,
+                 str(value), ha='center', va='bottom', fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_user_identity(agg: ChartAggregates, path: str, dpi: int):
+    """6. PROVIDER BRANDING & IDENTITY"""
+    plt = pyplot()
+    user_data = {
+        'Branded Providers\n(Public Identity)': agg.with_identity,
+        'Anonymous Providers\n(No Public Identity)': agg.anonymous
+    }
+
+    plt.figure(figsize=(12, 7))
+    colors_user = ['#27ae60', '#95a5a6']  # Green for branded, gray for anonymous
+    bars = plt.bar(user_data.keys(), user_data.values(), color=colors_user,
+                   edgecolor='black', linewidth=2, alpha=0.85)
+    plt.ylabel('Number of Service Providers', fontsize=13, fontweight='bold')
+    plt.title('Provider Branding Strategy: Identity vs Anonymity', fontsize=15, fontweight='bold', pad=20)
+    plt.ylim(0, max(user_data.values()) * 1.15)
+
+    # Add value labels on bars with insights
+    for i, bar in enumerate(bars):
+        height = bar.get_height()
+        percentage = height/agg.total*100
+
+        # Main count and percentage
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 f'{int(height)} providers\n({percentage:.1f}%)',
+                 ha='center', va='bottom', fontweight='bold', fontsize=12)
+
+        # Add insight label
+        if i == 0:
+            insight = "Brand Building\nOpportunity"
+        else:
+            insight = "Market\nMajority"
+        plt.text(bar.get_x() + bar.get_width()/2., height * 0.5,
+                 insight, ha='center', va='center',
+                 fontsize=10, style='italic', color='white', fontweight='bold')
+
+    # Add a subtle grid
+    plt.grid(axis='y', alpha=0.2, linestyle='--')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_monthly_activity(agg: ChartAggregates, path: str, dpi: int):
+    """7. MONTHLY ACTIVITY COMPARISON"""
+    plt = pyplot()
+    monthly_counts = agg.monthly_counts
+
+    plt.figure(figsize=(10, 7))
+    bars = plt.bar([str(m) for m in monthly_counts.index], monthly_counts.values,
+                   color=['#3498db', '#e74c3c'][:len(monthly_counts)],
+                   edgecolor='black', linewidth=1.5)
+    plt.xlabel('Month', fontsize=12, fontweight='bold')
+    plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
+    plt.title('Monthly Listing Activity', fontsize=14, fontweight='bold', pad=20)
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 str(int(height)), ha='center', va='bottom', fontweight='bold', fontsize=12)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+# name -> (description, plot function, aggregates it plots)
+CHARTS = {
+    'top_service_categories': ('service categories', plot_top_categories, ['category_counts']),
+    'location_distribution': ('location distribution', plot_location_distribution,
+                              ['location_counts', 'total']),
+    'price_availability': ('price availability', plot_price_availability, ['with_price', 'total']),
+    'listing_activity_timeline': ('activity timeline', plot_activity_timeline, ['daily_counts']),
+    'main_categories_distribution': ('main categories distribution', plot_main_categories,
+                                     ['main_category_counts']),
+    'user_info_availability': ('provider branding', plot_user_identity, ['with_identity', 'total']),
+    'monthly_activity': ('monthly activity comparison', plot_monthly_activity, ['monthly_counts']),
 }
 
-plt.figure(figsize=(12, 7))
-colors_user = ['#27ae60', '#95a5a6']  # Green for branded, gray for anonymous
-bars = plt.bar(user_data.keys(), user_data.values(), color=colors_user,
-               edgecolor='black', linewidth=2, alpha=0.85)
-plt.ylabel('Number of Service Providers', fontsize=13, fontweight='bold')
-plt.title('Provider Branding Strategy: Identity vs Anonymity', fontsize=15, fontweight='bold', pad=20)
-plt.ylim(0, max(user_data.values()) * 1.15)
-
-# Add value labels on bars with insights
-for i, bar in enumerate(bars):
-    height = bar.get_height()
-    percentage = height/len(df)*100
-
-    # Main count and percentage
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{int(height)} providers\n({percentage:.1f}%)',
-             ha='center', va='bottom', fontweight='bold', fontsize=12)
-
-    # Add insight label
-    if i == 0:
-        insight = "Brand Building\nOpportunity"
+
+def chart_hash(name: str, data: Dict, dpi: int, fmt: str) -> str:
+    """Hash of everything a chart's image depends on"""
+    inputs = {field: data[field] for field in CHARTS[name][2]}
+    key = json.dumps([name, inputs, dpi, fmt], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def load_hashes() -> Dict[str, str]:
+    try:
+        with open(HASH_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_chart(name: str, agg: ChartAggregates, path: str, dpi: int) -> str:
+    """Render one chart; runs in a pool worker"""
+    CHARTS[name][1](agg, path, dpi)
+    return path
+
+
+def generate_charts(charts: Optional[List[str]] = None, dpi: int = 300, fmt: str = 'png',
+                    jobs: Optional[int] = None, force: bool = False, aggregates_db: Optional[str] = None,
+                    unique: Optional[str] = None):
+    """Generate the selected charts (default: all) from the scraped listings into ./charts/
+
+    ``jobs`` worker processes render in parallel; 1 renders in this process.
+    Charts whose inputs are unchanged since the last render are skipped
+    unless ``force`` is set. With ``aggregates_db`` the counts are read from
+    the scraper's aggregate store instead of the listings. With ``unique``,
+    a near-duplicate cluster file (rewritten first if it is missing or
+    older than the listings export), only each cluster's canonical listing
+    is counted.
+    """
+    charts = charts or list(CHARTS)
+    # Create charts directory if it doesn't exist
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+
+    if aggregates_db and unique:
+        raise ValueError("Unique offers cannot be counted from the aggregate store")
+    if aggregates_db:
+        print(f"Loading aggregates from {aggregates_db}...")
+        agg = load_chart_aggregates(aggregates_db)
+        print(f"Loaded counts of {agg.total} listings")
+    else:
+        # Load the data
+        print("Loading data...")
+        if unique:
+            if is_stale(unique):
+                detect(unique)
+            df = load_listings(columns=CHART_COLUMNS + ['listing_id'])
+            duplicates = df['listing_id'].isin(load_duplicate_ids(unique))
+            df = df[~duplicates].drop(columns='listing_id')
+            print(f"Loaded {len(df)} unique offers ({int(duplicates.sum())} near-duplicate listings left out)")
+        else:
+            df = load_listings()
+            print(f"Loaded {len(df)} listings")
+
+        # Every count the charts plot, in one pass over the data
+        agg = compute_aggregates(df)
+        del df
+    data = agg.to_dict()
+
+    hashes = load_hashes()
+    todo = {}
+    for name in charts:
+        path = os.path.join(CHARTS_DIR, f"{name}.{fmt}")
+        digest = chart_hash(name, data, dpi, fmt)
+        if not force and hashes.get(path) == digest and os.path.exists(path):
+            print(f"   - Unchanged: {path}")
+            continue
+        todo[name] = (path, digest)
+
+    if todo:
+        print(f"\nRendering {len(todo)} charts at {dpi} dpi...")
+        jobs = min(jobs or os.cpu_count() or 1, len(todo))
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {name: pool.submit(render_chart, name, agg, path, dpi)
+                           for name, (path, _) in todo.items()}
+                for name, future in futures.items():
+                    print(f"   ✓ Saved: {future.result()}")
+                    hashes[todo[name][0]] = todo[name][1]
+        else:
+            for name, (path, digest) in todo.items():
+                print(f"   Generating {CHARTS[name][0]} chart...")
+                print(f"   ✓ Saved: {render_chart(name, agg, path, dpi)}")
+                hashes[path] = digest
+
+        with open(HASH_FILE, 'w', encoding='utf-8') as f:
+            json.dump(hashes, f, indent=2)
+
+    print("\n" + "="*60)
+    print(f"✓ {len(todo)} charts generated, {len(charts) - len(todo)} unchanged")
+    print("="*60)
+    print(f"Location: ./{CHARTS_DIR}/")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Generate charts from the scraped ustasi.az listings')
+    parser.add_argument('--charts', default=None,
+                        help=f"Comma-separated charts to render (default: all): {', '.join(CHARTS)}")
+    parser.add_argument('--dpi', type=int, default=300, help='Image resolution (default: 300)')
+    parser.add_argument('--format', default='png', choices=['png', 'svg', 'pdf', 'jpg'],
+                        help='Image format (default: png)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Charts rendered in parallel; 1 renders in this process (default: cores)')
+    parser.add_argument('--force', action='store_true', help='Render charts even if unchanged')
+    parser.add_argument('--from-aggregates', nargs='?', const='ustasi_aggregates.db', default=None,
+                        metavar='DB',
+                        help="Use the scraper's pre-aggregated counts (default DB: ustasi_aggregates.db), "
+                             "e.g. while a crawl is running")
+    parser.add_argument('--unique', nargs='?', const='ustasi_duplicates.json', default=None,
+                        metavar='CLUSTERS',
+                        help='Count unique offers, leaving out near-duplicate listings; the cluster file '
+                             '(default: ustasi_duplicates.json) is rebuilt when missing or older than '
+                             'the listings')
+    parser.add_argument('--profile', nargs='?', const='generate_charts_profile', default=None,
+                        metavar='PREFIX',
+                        help='Write a CPU profile (PREFIX.pstats) and wall-clock stack samples '
+                             '(PREFIX.collapsed); use --jobs 1 to include rendering')
+    args = parser.parse_args(argv)
+    if args.charts:
+        args.charts = [name.strip() for name in args.charts.split(',') if name.strip()]
+        unknown = [name for name in args.charts if name not in CHARTS]
+        if unknown:
+            parser.error(f"unknown charts: {', '.join(unknown)}")
+    if args.unique and args.from_aggregates:
+        parser.error("--unique needs the listings, not --from-aggregates")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = dict(charts=args.charts, dpi=args.dpi, fmt=args.format, jobs=args.jobs, force=args.force,
+                   aggregates_db=args.from_aggregates, unique=args.unique)
+    if args.profile:
+        with Profiler(args.profile):
+            generate_charts(**options)
     else:
-        insight = "Market\nMajority"
-    plt.text(bar.get_x() + bar.get_width()/2., height * 0.5,
-             insight, ha='center', va='center',
-             fontsize=10, style='italic', color='white', fontweight='bold')
-
-# Add a subtle grid
-plt.grid(axis='y', alpha=0.2, linestyle='--')
-
-plt.tight_layout()
-plt.savefig('charts/user_info_availability.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/user_info_availability.png")
-plt.close()
-
-# 7. MONTHLY ACTIVITY COMPARISON
-print("\n7. Generating monthly activity comparison chart...")
-monthly_counts = df['date_clean'].dt.to_period('M').value_counts().sort_index()
-
-plt.figure(figsize=(10, 7))
-bars = plt.bar([str(m) for m in monthly_counts.index], monthly_counts.values,
-               color=['#3498db', '#e74c3c'][:len(monthly_counts)],
-               edgecolor='black', linewidth=1.5)
-plt.xlabel('Month', fontsize=12, fontweight='bold')
-plt.ylabel('Number of Listings', fontsize=12, fontweight='bold')
-plt.title('Monthly Listing Activity', fontsize=14, fontweight='bold', pad=20)
-
-# Add value labels on bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             str(int(height)), ha='center', va='bottom', fontweight='bold', fontsize=12)
-
-plt.tight_layout()
-plt.savefig('charts/monthly_activity.png', dpi=300, bbox_inches='tight')
-print("   ✓ Saved: charts/monthly_activity.png")
-plt.close()
-
-print("\n" + "="*60)
-print("✓ All charts generated successfully!")
-print("="*60)
-print(f"\nTotal charts created: 7")
-print("Location: ./charts/")
-print("\nGenerated files:")
-print("  1. top_service_categories.png")
-print("  2. location_distribution.png")
-print("  3. price_availability.png")
-print("  4. listing_activity_timeline.png")
-print("  5. main_categories_distribution.png")
-print("  6. user_info_availability.png")
-print("  7. monthly_activity.png")
+        generate_charts(**options)
+
+
+if __name__ == "__main__":
+    main()
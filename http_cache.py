@@ -0,0 +1,144 @@
+"""
+On-disk HTTP response cache.
+
+Responses are stored gzip-compressed, one file per request, under a name
+derived from the SHA-256 digest of the request (method, URL, query and
+form body). Entries expire after ``ttl`` seconds, or after a shorter
+``max_age`` given with the lookup, and the least recently used ones are
+evicted when the cache grows past ``max_bytes``. In replay
+mode expired entries are still served, so a pipeline can be re-run
+entirely from disk.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+class CachedResponse:
+    """Minimal response object shared by the network and cache paths"""
+
+    __slots__ = ('status', 'text', 'headers')
+
+    def __init__(self, status: int, text: str, headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def request_key(method: str, url: str, params=None, data=None) -> str:
+    """Digest identifying a request"""
+    if isinstance(data, dict):
+        data = sorted((str(k), str(v)) for k, v in data.items())
+    if isinstance(params, dict):
+        params = sorted((str(k), str(v)) for k, v in params.items())
+    payload = json.dumps([method.upper(), url, params, data], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Compressed, request-addressed response cache with TTL and LRU eviction"""
+
+    KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+    def __init__(self, directory: Union[str, Path] = 'http_cache', ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = 1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl  # Seconds; None keeps entries forever
+        self.max_bytes = max_bytes  # None disables size-based eviction
+        self.hits = 0
+        self.misses = 0
+        self._size = sum(path.stat().st_size for path in self.directory.glob('*/*.gz'))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.gz"
+
+    def get(self, method: str, url: str, params=None, data=None,
+            allow_stale: bool = False, max_age: Optional[float] = None) -> Optional[CachedResponse]:
+        """Cached response for a request, or None on a miss
+
+        ``max_age`` (seconds) tightens ``ttl`` for this lookup, e.g. for pages
+        whose content changes faster than the rest.
+        """
+        path = self._path(request_key(method, url, params, data))
+        try:
+            raw = gzip.decompress(path.read_bytes())
+        except (OSError, EOFError):
+            self.misses += 1
+            return None
+
+        header_line, _, body = raw.partition(b'\n')
+        try:
+            meta = json.loads(header_line)
+        except json.JSONDecodeError:
+            self.misses += 1
+            return None
+
+        if not allow_stale:
+            age = time.time() - meta['stored_at']
+            if (self.ttl is not None and age > self.ttl) or (max_age is not None and age > max_age):
+                self.misses += 1
+                return None
+
+        # Access time drives LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return CachedResponse(meta['status'], body.decode('utf-8'), meta.get('headers'))
+
+    def put(self, method: str, url: str, response: CachedResponse, params=None, data=None):
+        """Store a response"""
+        key = request_key(method, url, params, data)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+
+        meta = {
+            'status': response.status,
+            'url': url,
+            'headers': {k: v for k, v in response.headers.items() if k in self.KEPT_HEADERS},
+            'stored_at': time.time(),
+        }
+        blob = gzip.compress(
+            json.dumps(meta, ensure_ascii=False).encode('utf-8') + b'\n' + response.text.encode('utf-8')
+        )
+
+        old_size = path.stat().st_size if path.exists() else 0
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(blob)
+        os.replace(tmp_path, path)
+        self._size += len(blob) - old_size
+
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache is at 90% of max_bytes"""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self.directory.glob('*/*.gz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+                self._size -= size
+            except OSError:
+                pass
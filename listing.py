@@ -0,0 +1,81 @@
+"""
+Compact in-memory representations for large crawls.
+
+``Listing`` is a ``__slots__`` record holding one scraped listing, with
+the fields that repeat across listings (location, categories, user
+name, price, date and the URL prefix) interned, so thousands of
+listings share one copy of each value. ``to_dict`` gives back the
+record with the exact key order of the JSON/CSV exports. The scraper
+holds records this way while they wait for their phone number and while
+they are buffered for a Parquet row group.
+``listing_key`` maps listing IDs and URLs to the integer keys the
+dedupe sets in ``dedupe.py`` track.
+"""
+
+import re
+import sys
+from typing import Dict, Optional, Union
+
+LISTING_ID_RE = re.compile(r'-(\d+)\.html$')
+
+# Key order of scraped records, as written to the JSON export
+FIELDS = ('url', 'listing_id', 'title', 'categories', 'price', 'description',
+          'user_name', 'user_id', 'location', 'date', 'phone')
+
+
+def intern_text(value):
+    """Interned copy of a string; other values are returned unchanged"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def listing_key(listing_id_or_url: Optional[str]) -> Union[int, str, None]:
+    """Integer listing ID for an ID or listing URL, else the string itself"""
+    if not listing_id_or_url:
+        return None
+    if listing_id_or_url.isdigit():
+        return int(listing_id_or_url)
+    match = LISTING_ID_RE.search(listing_id_or_url)
+    return int(match.group(1)) if match else listing_id_or_url
+
+
+class Listing:
+    """One scraped listing, stored compactly
+
+    The URL is kept as an interned prefix (everything up to the last
+    ``/``) plus the page name.
+    """
+
+    __slots__ = ('url_prefix', 'url_name', 'listing_id', 'title', 'categories', 'price',
+                 'description', 'user_name', 'user_id', 'location', 'date', 'phone', 'present')
+
+    def __init__(self, record: Dict):
+        url = record.get('url') or ''
+        prefix, _, name = url.rpartition('/')
+        self.url_prefix = sys.intern(prefix + '/') if prefix else ''
+        self.url_name = name
+        self.listing_id = record.get('listing_id')
+        self.title = record.get('title')
+        self.categories = intern_text(record.get('categories'))
+        self.price = intern_text(record.get('price'))
+        self.description = record.get('description')
+        self.user_name = intern_text(record.get('user_name'))
+        self.user_id = intern_text(record.get('user_id'))
+        self.location = intern_text(record.get('location'))
+        self.date = intern_text(record.get('date'))
+        self.phone = record.get('phone')
+        # Bit mask of the fields the record had, so to_dict round-trips exactly
+        self.present = sum(1 << i for i, field in enumerate(FIELDS) if field in record)
+
+    @property
+    def url(self) -> str:
+        return self.url_prefix + self.url_name
+
+    def get(self, field: str, default=None):
+        """Dict-style access, so a Listing can stand in for a record"""
+        if field not in FIELDS or not self.present & (1 << FIELDS.index(field)):
+            return default
+        return getattr(self, field)
+
+    def to_dict(self) -> Dict:
+        """The record as a dict, with the export key order"""
+        return {field: getattr(self, field) for i, field in enumerate(FIELDS) if self.present & (1 << i)}
@@ -0,0 +1,272 @@
+"""
+Per-stage scraper metrics with Prometheus and JSON export.
+
+Tracks request counts by status, latency histograms, bytes downloaded,
+parse and checkpoint time, queue depths and in-flight concurrency for
+each pipeline stage (``list``, ``detail``, ``phone``, ``parse``,
+``checkpoint``). Metrics can be written as a Prometheus textfile (for the
+node_exporter textfile collector), served from a small local HTTP
+endpoint, and summarized as JSON at the end of a run.
+"""
+
+import bisect
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DURATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower  # Beyond the last bucket: best lower bound
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        """(upper bound, cumulative count) pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield repr(bound), total
+        yield '+Inf', self.count
+
+    def summary(self) -> Dict:
+        result = {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 6),
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else None,
+        }
+        for name, fraction in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            value = self.quantile(fraction)
+            result[name] = round(value * 1000, 3) if value is not None else None
+        return result
+
+
+class Metrics:
+    """Metrics registry for one scraper run
+
+    Counters and histograms are keyed by stage; queue depths are read
+    through callbacks registered with ``track_queue`` whenever the queues
+    are sampled or exported.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests: Dict[Tuple[str, str], int] = {}  # (stage, status) -> count
+        self.cache_hits: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.durations: Dict[Tuple[str, str], Histogram] = {}  # (stage, operation) -> time
+        self.in_flight: Dict[str, int] = {}
+        self.peak_in_flight: Dict[str, int] = {}
+        self.queues: Dict[str, Callable[[], int]] = {}
+        self.peak_queue: Dict[str, int] = {}
+
+    def request_started(self, stage: str):
+        current = self.in_flight.get(stage, 0) + 1
+        self.in_flight[stage] = current
+        if current > self.peak_in_flight.get(stage, 0):
+            self.peak_in_flight[stage] = current
+
+    def request_finished(self, stage: str, status: Union[int, str], seconds: float, size: int = 0):
+        """Count a finished network request; ``status`` may be an error kind"""
+        self.in_flight[stage] = self.in_flight.get(stage, 1) - 1
+        key = (stage, str(status))
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.bytes[stage] = self.bytes.get(stage, 0) + size
+        if stage not in self.latency:
+            self.latency[stage] = Histogram(LATENCY_BUCKETS)
+        self.latency[stage].observe(seconds)
+
+    def cache_hit(self, stage: str):
+        self.cache_hits[stage] = self.cache_hits.get(stage, 0) + 1
+
+    def observe(self, stage: str, operation: str, seconds: float):
+        """Record the duration of a local step such as a parse or a log flush"""
+        key = (stage, operation)
+        if key not in self.durations:
+            self.durations[key] = Histogram(DURATION_BUCKETS)
+        self.durations[key].observe(seconds)
+
+    @contextmanager
+    def timed(self, stage: str, operation: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, operation, time.perf_counter() - started)
+
+    def track_queue(self, name: str, depth: Callable[[], int]):
+        """Register a callback returning the current depth of a queue"""
+        self.queues[name] = depth
+
+    def untrack_queue(self, name: str):
+        self.queues.pop(name, None)
+
+    def sample_queues(self) -> Dict[str, int]:
+        """Current depth of every tracked queue, updating the peaks"""
+        depths = {}
+        for name, depth in list(self.queues.items()):
+            try:
+                depths[name] = value = depth()
+            except Exception:
+                continue
+            if value > self.peak_queue.get(name, 0):
+                self.peak_queue[name] = value
+        return depths
+
+    def render_prometheus(self, prefix: str = 'ustasi') -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, labels: str, hist: Histogram):
+            for bound, count in hist.cumulative():
+                lines.append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{prefix}_{name}_sum{{{labels}}} {hist.sum:.6f}')
+            lines.append(f'{prefix}_{name}_count{{{labels}}} {hist.count}')
+
+        family('requests_total', 'counter', 'Network requests by stage and status or error kind')
+        for (stage, status), count in sorted(self.requests.items()):
+            lines.append(f'{prefix}_requests_total{{stage="{stage}",status="{status}"}} {count}')
+
+        family('cache_hits_total', 'counter', 'Requests served from the response cache')
+        for stage, count in sorted(self.cache_hits.items()):
+            lines.append(f'{prefix}_cache_hits_total{{stage="{stage}"}} {count}')
+
+        family('response_bytes_total', 'counter', 'Response body bytes downloaded')
+        for stage, size in sorted(self.bytes.items()):
+            lines.append(f'{prefix}_response_bytes_total{{stage="{stage}"}} {size}')
+
+        family('request_duration_seconds', 'histogram', 'Network request latency')
+        for stage, hist in sorted(self.latency.items()):
+            histogram('request_duration_seconds', f'stage="{stage}"', hist)
+
+        family('step_duration_seconds', 'histogram', 'Duration of parse and checkpoint steps')
+        for (stage, operation), hist in sorted(self.durations.items()):
+            histogram('step_duration_seconds', f'stage="{stage}",operation="{operation}"', hist)
+
+        family('in_flight_requests', 'gauge', 'Network requests currently in flight')
+        for stage, count in sorted(self.in_flight.items()):
+            lines.append(f'{prefix}_in_flight_requests{{stage="{stage}"}} {count}')
+
+        family('queue_depth', 'gauge', 'Items waiting in a pipeline queue')
+        for name, depth in sorted(self.sample_queues().items()):
+            lines.append(f'{prefix}_queue_depth{{queue="{name}"}} {depth}')
+
+        family('uptime_seconds', 'gauge', 'Seconds since the run started')
+        lines.append(f'{prefix}_uptime_seconds {time.time() - self.started:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: Union[str, Path]):
+        """Atomically write the Prometheus textfile"""
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(self.render_prometheus(), encoding='utf-8')
+        os.replace(tmp, path)
+
+    def summary(self) -> Dict:
+        """JSON-friendly summary of the run
+
+        ``busy_seconds`` is the summed time spent in each stage. For network
+        stages, dividing it by the wall time gives the average number of
+        requests in flight; for parse and checkpoint steps run on the event
+        loop it is the share of the loop they used.
+        """
+        wall = time.time() - self.started
+        stages: Dict[str, Dict] = {}
+
+        def stage(name: str) -> Dict:
+            return stages.setdefault(name, {})
+
+        for (name, status), count in self.requests.items():
+            stage(name).setdefault('requests', {})[status] = count
+        for name, hist in self.latency.items():
+            entry = stage(name)
+            entry['latency'] = hist.summary()
+            entry['bytes'] = self.bytes.get(name, 0)
+            entry['cache_hits'] = self.cache_hits.get(name, 0)
+            entry['peak_in_flight'] = self.peak_in_flight.get(name, 0)
+            entry['busy_seconds'] = round(hist.sum, 3)
+            entry['avg_in_flight'] = round(hist.sum / wall, 3) if wall else None
+        for name, count in self.cache_hits.items():
+            stage(name).setdefault('cache_hits', count)
+        for (name, operation), hist in self.durations.items():
+            entry = stage(name)
+            entry.setdefault('operations', {})[operation] = hist.summary()
+            entry['busy_seconds'] = round(entry.get('busy_seconds', 0.0) + hist.sum, 3)
+            entry['share_of_wall'] = round(entry['busy_seconds'] / wall, 4) if wall else None
+
+        return {
+            'wall_seconds': round(wall, 3),
+            'stages': stages,
+            'peak_queue_depth': dict(self.peak_queue),
+        }
+
+    def write_summary(self, path: Union[str, Path] = 'ustasi_metrics.json'):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.summary(), f, indent=2)
+            print(f"Wrote run metrics to {path}")
+        except Exception as e:
+            print(f"Warning: Could not write metrics summary: {e}")
+
+
+class MetricsServer:
+    """Local HTTP endpoint serving ``/metrics`` for Prometheus to scrape"""
+
+    def __init__(self, metrics: Metrics, port: int = 9108, host: str = '127.0.0.1'):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.metrics.render_prometheus(),
+                            content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
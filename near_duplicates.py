@@ -0,0 +1,302 @@
+"""
+Near-duplicate detection over scraped listing descriptions.
+
+Providers often post the same description under several listings. Each
+description is reduced to word shingles (``shingle_size`` consecutive
+words, lowercased, punctuation dropped) and a MinHash signature of
+``num_perm`` values, computed for all listings at once with numpy.
+LSH banding splits the signatures into bands. Only listings that agree
+on a whole band become candidates, and a candidate joins a cluster when
+the estimated Jaccard similarity of the two signatures reaches
+``threshold``. The work therefore grows with the number of listings, not
+with its square.
+
+Each cluster gets a canonical listing, the one with the lowest listing
+ID (the earliest posted). ``load_duplicate_ids`` gives the other
+members, which ``generate_charts.py --unique`` drops to count unique
+offers instead of raw listings.
+
+Usage:
+    python near_duplicates.py
+    python near_duplicates.py --threshold 0.9 --output ustasi_duplicates.json
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from listing import listing_key
+
+WORD_RE = re.compile(r'\w+')
+MAX_HASH = np.uint32(0xFFFFFFFF)
+# Shingles per numpy pass; (CHUNK_SHINGLES, num_perm) temporaries that fit
+# in the CPU cache are several times faster than large ones
+CHUNK_SHINGLES = 2048
+SHINGLE_PRIME = np.uint64(0x100000001B3)
+SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) splitting ``num_perm`` so candidates start just below ``threshold``
+
+    Pairs with similarity s become candidates with probability
+    1 - (1 - s**rows)**bands, which rises steeply around (1/bands)**(1/rows).
+    Picking that point just below the threshold favours recall; the
+    similarity check drops the extra candidates.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in options if (1 / bands) ** (1 / rows) <= threshold]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1])) if below else options[0]
+
+
+class MinHasher:
+    """MinHash signatures of word shingles
+
+    Words are hashed with CRC-32 and combined into shingle hashes with
+    numpy, so signatures are the same in every run. The permutations are h(x) = a*x + b modulo 2**32 with odd
+    ``a``, which are bijections of the 32-bit shingle hashes.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        if num_perm < 1 or shingle_size < 1:
+            raise ValueError("num_perm and shingle_size must be at least 1")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64).astype(np.uint32)
+
+    @staticmethod
+    def words(text: Optional[str]) -> List[int]:
+        """Hashes of a text's words, lowercased and without punctuation"""
+        return [zlib.crc32(word.encode('utf-8')) for word in WORD_RE.findall((text or '').lower())]
+
+    def shingles(self, words: List[int]) -> int:
+        """Number of shingles of a text with ``len(words)`` words; short texts are one shingle"""
+        return max(len(words) - self.shingle_size + 1, 1) if words else 0
+
+    def _shingle_hashes(self, words: List[int], counts: List[int], starts: List[int]) -> np.ndarray:
+        """32-bit shingle hashes of texts whose word hashes were concatenated
+
+        Each text's words are followed by ``shingle_size - 1`` zero hashes, so
+        the shingles of a short text end in padding instead of the next text.
+        ``counts`` are the texts' numbers of shingles, ``starts`` their offsets
+        in ``words``.
+        """
+        size = self.shingle_size
+        values = np.array(words, dtype=np.uint64)
+        counts = np.array(counts)
+        # Offset of each shingle's first word: its text's start plus its index in the text
+        shingle_starts = np.cumsum(counts) - counts
+        positions = np.repeat(np.array(starts) - shingle_starts, counts) + np.arange(counts.sum())
+        with np.errstate(over='ignore'):  # uint64 arithmetic wraps by design
+            hashes = values[positions]
+            for offset in range(1, size):
+                hashes = hashes * SHINGLE_PRIME + values[positions + offset]
+            return ((hashes * SHINGLE_MIX) >> np.uint64(32)).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """``(signatures, empty)``: a (len(texts), num_perm) uint32 matrix and a mask of empty texts"""
+        signatures = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint32)
+        empty = np.zeros(len(texts), dtype=bool)
+        padding = [0] * (self.shingle_size - 1)
+        words: List[int] = []
+        counts: List[int] = []
+        starts: List[int] = []
+        rows: List[int] = []
+
+        def flush():
+            hashes = self._shingle_hashes(words, counts, starts)[:, None]
+            permuted = hashes * self.a
+            permuted += self.b  # uint32 arithmetic wraps, i.e. works modulo 2**32
+            signatures[rows] = np.minimum.reduceat(permuted, np.cumsum(counts) - counts, axis=0)
+            words.clear()
+            counts.clear()
+            starts.clear()
+            rows.clear()
+
+        pending = 0
+        for i, text in enumerate(texts):
+            text_words = self.words(text)
+            if not text_words:
+                empty[i] = True
+                continue
+            starts.append(len(words))
+            words.extend(text_words)
+            words.extend(padding)
+            counts.append(self.shingles(text_words))
+            rows.append(i)
+            pending += counts[-1]
+            if pending >= CHUNK_SHINGLES:
+                flush()
+                pending = 0
+        if rows:
+            flush()
+        return signatures, empty
+
+
+class DisjointSet:
+    """Union-find over ``0..size-1``"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:  # Path compression
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first: int, second: int):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def find_clusters(signatures: np.ndarray, empty: np.ndarray, threshold: float = 0.8) -> List[List[int]]:
+    """Clusters (of two or more row indices) of near-duplicate signatures
+
+    Within an LSH bucket, the first member not yet matched becomes a root
+    and is compared with every member; roots are picked until all members
+    are matched. Every member is thus compared with each root of its
+    bucket, at a cost linear in the bucket size per root, and only two
+    members that each matched a different root are never compared
+    directly (they usually share another band).
+    """
+    bands, rows = lsh_bands(signatures.shape[1], threshold)
+    candidates = np.flatnonzero(~empty)
+    groups = DisjointSet(len(signatures))
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[candidates, band * rows:(band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = counts[inverse] > 1
+        if not shared.any():
+            continue
+        # Members of each bucket, ordered by bucket
+        members = candidates[shared][np.argsort(inverse[shared], kind='stable')]
+        bucket_sizes = counts[counts > 1]
+        for bucket in np.split(members, np.cumsum(bucket_sizes)[:-1]):
+            bucket_signatures = signatures[bucket]
+            unmatched = np.ones(len(bucket), dtype=bool)
+            while unmatched.any():
+                root = int(np.argmax(unmatched))
+                unmatched[root] = False
+                close = (bucket_signatures == bucket_signatures[root]).mean(axis=1) >= threshold
+                close[root] = False
+                for member in bucket[close]:
+                    groups.union(int(bucket[root]), int(member))
+                unmatched &= ~close
+
+    clusters: Dict[int, List[int]] = {}
+    for index in candidates:
+        clusters.setdefault(groups.find(int(index)), []).append(int(index))
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def sort_key(listing_id: str):
+    key = listing_key(listing_id)
+    return (0, key, '') if isinstance(key, int) else (1, 0, str(key))
+
+
+def find_duplicates(listing_ids: Sequence[str], texts: Sequence[Optional[str]], threshold: float = 0.8,
+                    num_perm: int = 128, shingle_size: int = 3) -> List[Dict]:
+    """Near-duplicate clusters as ``{'canonical_id', 'listing_ids'}``, largest first"""
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    signatures, empty = MinHasher(num_perm, shingle_size).signatures(texts)
+    clusters = []
+    for members in find_clusters(signatures, empty, threshold):
+        ids = sorted({listing_ids[i] for i in members}, key=sort_key)
+        if len(ids) > 1:  # The same listing twice is not a duplicate offer
+            clusters.append({'canonical_id': ids[0], 'listing_ids': ids})
+    clusters.sort(key=lambda cluster: (-len(cluster['listing_ids']), sort_key(cluster['canonical_id'])))
+    return clusters
+
+
+def listings_export(parquet_file: str = 'ustasi_listings.parquet',
+                    csv_file: str = 'ustasi_listings.csv') -> str:
+    """The export ``load_descriptions`` reads: Parquet when it can, else the CSV"""
+    return parquet_file if columnar.parquet_is_current(parquet_file, csv_file) else csv_file
+
+
+def load_descriptions(parquet_file: str = 'ustasi_listings.parquet',
+                      csv_file: str = 'ustasi_listings.csv') -> pd.DataFrame:
+    """``listing_id`` and ``description`` of the scraped listings"""
+    columns = ['listing_id', 'description']
+    path = listings_export(parquet_file, csv_file)
+    if path == parquet_file:
+        return columnar.load_columns(parquet_file, columns)
+    return pd.read_csv(csv_file, usecols=columns, dtype=str)
+
+
+def is_stale(path: str = 'ustasi_duplicates.json', parquet_file: str = 'ustasi_listings.parquet',
+             csv_file: str = 'ustasi_listings.csv') -> bool:
+    """Whether a cluster file is missing or older than the listings export"""
+    if not os.path.exists(path):
+        return True
+    export = listings_export(parquet_file, csv_file)
+    return os.path.exists(export) and os.path.getmtime(export) > os.path.getmtime(path)
+
+
+def write_duplicates(clusters: List[Dict], total: int, path: str = 'ustasi_duplicates.json',
+                     threshold: float = 0.8):
+    duplicates = sum(len(cluster['listing_ids']) - 1 for cluster in clusters)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'threshold': threshold, 'listings': total, 'unique_offers': total - duplicates,
+                   'clusters': clusters}, f, ensure_ascii=False, indent=2)
+
+
+def load_duplicate_ids(path: str = 'ustasi_duplicates.json') -> Set[str]:
+    """Listing IDs that duplicate their cluster's canonical listing"""
+    with open(path, 'r', encoding='utf-8') as f:
+        clusters = json.load(f)['clusters']
+    return {listing_id for cluster in clusters for listing_id in cluster['listing_ids']
+            if listing_id != cluster['canonical_id']}
+
+
+def detect(output: str = 'ustasi_duplicates.json', threshold: float = 0.8, num_perm: int = 128,
+           shingle_size: int = 3) -> List[Dict]:
+    """Find near-duplicate listings in the exports and write the clusters to ``output``"""
+    start = time.time()
+    df = load_descriptions()
+    clusters = find_duplicates(df['listing_id'].tolist(), df['description'].tolist(),
+                               threshold, num_perm, shingle_size)
+    write_duplicates(clusters, len(df), output, threshold)
+    duplicates = sum(len(cluster['listing_ids']) - 1 for cluster in clusters)
+    print(f"{len(df)} listings, {len(clusters)} duplicate clusters, "
+          f"{len(df) - duplicates} unique offers ({time.time() - start:.1f}s)")
+    print(f"Saved clusters to {output}")
+    return clusters
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Find near-duplicate ustasi.az listings')
+    parser.add_argument('--output', default='ustasi_duplicates.json',
+                        help='Cluster file to write (default: ustasi_duplicates.json)')
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help='Estimated Jaccard similarity of duplicate descriptions (default: 0.8)')
+    parser.add_argument('--num-perm', type=int, default=128,
+                        help='MinHash signature length (default: 128)')
+    parser.add_argument('--shingle-size', type=int, default=3,
+                        help='Words per shingle (default: 3)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    detect(args.output, args.threshold, args.num_perm, args.shingle_size)
+
+
+if __name__ == "__main__":
+    main()
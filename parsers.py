@@ -0,0 +1,504 @@
+"""
+HTML parser backends for ustasi.az list and detail pages.
+
+``SoupParser`` is the reference implementation (BeautifulSoup with the
+stdlib ``html.parser``). ``LxmlParser`` produces the same records but walks
+only the ``div.nobj.prod`` / ``div#openhalf`` subtrees of an lxml tree.
+libxml2 repairs broken markup (unclosed or misnested tags) differently
+from ``html.parser``, which nests tags exactly as written, so such pages
+are handed to ``SoupParser`` instead.
+
+Run ``python parsers.py <dir-or-files>`` to check that both backends agree
+on a set of saved pages.
+"""
+
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional, only needed for the fast backend
+    etree = None
+
+
+CATEGORY_HREF_RE = re.compile(r'^/[^/]+$')
+USER_HREF_RE = re.compile(r'/user/')
+DATE_RE = re.compile(r'Tarix:\s*(.+)')
+HASH_RE = re.compile(r'data-h="([a-f0-9]{32})"')
+
+RAW_HASH_RE = re.compile(r'data-h=["\']([a-f0-9]{32})["\']')
+
+# Markup tokens for checking that lxml built the tree html.parser would
+MARKUP_TOKEN_RE = re.compile(
+    r'<!--.*?-->|<!\[CDATA\[|<![^>]*>|<\?[^>]*>'
+    r'|<(/?)([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>',
+    re.S
+)
+# Content is text up to the end tag in both parsers
+RAW_TEXT_END_RES = {name: re.compile(f'</{name}\\s*>', re.I) for name in ('script', 'style')}
+# Tags BeautifulSoup's HTML builders treat as empty elements
+VOID_TAGS = frozenset({
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+    'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer',
+    'track', 'wbr',
+})
+# Elements whose strings BeautifulSoup's get_text/stripped_strings leave out
+NON_TEXT_TAGS = frozenset({'script', 'style', 'template', 'rt', 'rp'})
+
+
+def fallback_title(url: str) -> str:
+    """Title used when a page has neither <h1> nor <title>"""
+    return url.split('/')[-1].replace('.html', '').replace('-', ' ')
+
+
+def find_location(lines) -> str:
+    """Pick the location line out of the contact block strings"""
+    for line in lines:
+        if 'şəhəri' in line or 'rayonu' in line:
+            return line
+    return ''
+
+
+def _no_lap(name: str):
+    """Stand-in for ``StepTimer.lap`` when steps are not timed"""
+
+
+class SoupParser:
+    """Reference parser built on BeautifulSoup"""
+
+    name = 'soup'
+
+    def parse_listing_items(self, html: str, base_url: str) -> List[Tuple[str, str]]:
+        """Parse (URL, snippet text) pairs from the listings page HTML"""
+        soup = BeautifulSoup(html, 'html.parser')
+        items = []
+
+        # Find all product divs
+        products = soup.find_all('div', class_='nobj prod')
+
+        for product in products:
+            link = product.find('a', href=True)
+            if link and link['href']:
+                full_url = urljoin(base_url, link['href'])
+                items.append((full_url, product.get_text(strip=True)))
+
+        return items
+
+    def parse_listing_urls(self, html: str, base_url: str) -> List[str]:
+        """Parse listing URLs from the listings page HTML"""
+        return [url for url, _ in self.parse_listing_items(html, base_url)]
+
+    def extract_hash_from_html(self, soup: BeautifulSoup) -> Optional[str]:
+        """Extract hash value from telzona div"""
+        # Look for the telshow div with data-h attribute
+        telshow_div = soup.find('div', id='telshow')
+        if telshow_div and telshow_div.has_attr('data-h'):
+            return telshow_div['data-h']
+
+        # Fallback: look in the page source for the hash pattern
+        page_text = str(soup)
+        hash_match = HASH_RE.search(page_text)
+        if hash_match:
+            return hash_match.group(1)
+
+        return None
+
+    def parse_detail(self, html: str, url: str, listing_id: Optional[str],
+                     timer=None) -> Tuple[Optional[Dict], Optional[str]]:
+        """Parse a detail page into a record (without phone) and its telshow hash
+
+        ``timer`` (a ``profiling.StepTimer``) times each extraction step.
+        """
+        lap = timer.lap if timer is not None else _no_lap
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Find the main content div
+        content_div = soup.find('div', id='openhalf')
+        lap('tree')
+        if not content_div:
+            return None, None
+
+        data = {
+            'url': url,
+            'listing_id': listing_id
+        }
+
+        # Extract title
+        title_elem = soup.find('h1') or soup.find('title')
+        if title_elem:
+            data['title'] = title_elem.get_text(strip=True)
+        else:
+            data['title'] = fallback_title(url)
+        lap('title')
+
+        # Extract categories
+        categories = []
+        category_links = content_div.find_all('a', href=CATEGORY_HREF_RE)
+        for link in category_links[:2]:
+            categories.append(link.get_text(strip=True))
+        data['categories'] = ', '.join(categories) if categories else ''
+        lap('categories')
+
+        # Extract price
+        price_elem = content_div.find('span', class_='pricecolor')
+        data['price'] = price_elem.get_text(strip=True) if price_elem else ''
+        lap('price')
+
+        # Extract description
+        desc_elem = content_div.find('p', class_='infop100')
+        data['description'] = desc_elem.get_text(strip=True) if desc_elem else ''
+        lap('description')
+
+        # Extract contact info
+        contact_div = content_div.find('div', class_='infocontact')
+        if contact_div:
+            user_link = contact_div.find('a', href=USER_HREF_RE)
+            if user_link:
+                data['user_name'] = user_link.get_text(strip=True).replace('(Bütün Elanları)', '').strip()
+                data['user_id'] = user_link['href'].split('/')[-1]
+            else:
+                data['user_name'] = data['user_id'] = ''
+
+            data['location'] = find_location(contact_div.stripped_strings)
+        else:
+            data['user_name'] = data['user_id'] = data['location'] = ''
+        lap('contact')
+
+        # Extract date
+        date_elem = content_div.find('span', class_='viewsbb')
+        if date_elem:
+            date_text = date_elem.get_text(strip=True)
+            date_match = DATE_RE.search(date_text)
+            data['date'] = date_match.group(1) if date_match else date_text
+        else:
+            data['date'] = ''
+        lap('date')
+
+        hash_value = self.extract_hash_from_html(soup) if listing_id else None
+        lap('hash')
+        return data, hash_value
+
+
+def _stripped_strings(elem) -> Iterator[str]:
+    """lxml equivalent of BeautifulSoup's ``stripped_strings``"""
+    # Comments and processing instructions have a non-string tag; their
+    # text is skipped but the tail text after them still belongs to the parent
+    if isinstance(elem.tag, str) and elem.text:
+        text = elem.text.strip()
+        if text:
+            yield text
+    for child in elem:
+        if child.tag not in NON_TEXT_TAGS:
+            yield from _stripped_strings(child)
+        if child.tail:
+            text = child.tail.strip()
+            if text:
+                yield text
+
+
+def _get_text(elem) -> str:
+    """lxml equivalent of BeautifulSoup's ``get_text(strip=True)``"""
+    return ''.join(_stripped_strings(elem))
+
+
+def _has_class(elem, class_name: str) -> bool:
+    """Match ``class_`` the way BeautifulSoup does for multi-valued attributes"""
+    value = elem.get('class')
+    if value is None:
+        return False
+    tokens = value.split()
+    return class_name in tokens or ' '.join(tokens) == class_name
+
+
+def _find(elem, tag: str, class_name: Optional[str] = None, href_re=None):
+    """First descendant of ``elem`` matching tag, class and href pattern"""
+    for node in elem.iterdescendants(tag):
+        if class_name is not None and not _has_class(node, class_name):
+            continue
+        if href_re is not None:
+            href = node.get('href')
+            if href is None or not href_re.search(href):
+                continue
+        return node
+    return None
+
+
+def _nests_as_written(html: str) -> bool:
+    """Whether every tag of a page is closed by its own end tag, in order
+
+    ``html.parser`` nests tags exactly as written; libxml2 closes elements
+    implicitly (a ``<p>`` at the next ``<div>``, an unclosed ``<h1>`` at the
+    next block) and drops stray end tags. On pages where that never
+    happens both build the same tree. ``<html>`` and ``<body>`` may be
+    left open, non-void elements must not be self-closed (``<div/>``) and
+    CDATA sections, which only ``html.parser`` keeps as text, are not
+    allowed.
+    """
+    open_tags = []
+    pos = 0
+    while True:
+        match = MARKUP_TOKEN_RE.search(html, pos)
+        if match is None:
+            break
+        pos = match.end()
+        name = match.group(2)
+        if name is None:
+            if match.group(0) == '<![CDATA[':
+                return False
+            continue  # Comment, doctype or processing instruction
+        name = name.lower()
+        if match.group(1):
+            if not open_tags or open_tags[-1] != name:
+                return False
+            open_tags.pop()
+        elif name not in VOID_TAGS:
+            if match.group(3).rstrip().endswith('/'):
+                return False
+            if name in RAW_TEXT_END_RES:
+                end = RAW_TEXT_END_RES[name].search(html, pos)
+                if end is None:
+                    return False
+                pos = end.end()
+            else:
+                open_tags.append(name)
+    return all(name in ('html', 'body') for name in open_tags)
+
+
+class LxmlParser:
+    """Fast parser built on lxml, field-for-field compatible with SoupParser
+
+    Pages whose tree libxml2 would repair differently from ``html.parser``
+    are parsed by ``SoupParser``.
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        if etree is None:
+            raise ImportError("The 'lxml' parser backend requires the lxml package")
+        # Pages arrive already decoded; parse them as UTF-8 bytes so an XML
+        # declaration or <meta charset> naming another encoding is ignored
+        # (lxml refuses str input that declares an encoding)
+        self._html_parser = etree.HTMLParser(encoding='utf-8')
+        self._reference = SoupParser()
+        self.fallbacks = 0  # Pages handed to SoupParser
+
+    def _parse(self, html: str):
+        """lxml tree of a page, or None when SoupParser has to parse it
+
+        That is the case for empty pages and for pages that libxml2 repaired
+        (it logs every restructuring of balanced markup) or that do not nest
+        as written.
+        """
+        if not html.strip():
+            return None
+        root = etree.fromstring(html.encode('utf-8'), self._html_parser)
+        if root is None or len(self._html_parser.error_log) or not _nests_as_written(html):
+            self.fallbacks += 1
+            return None
+        return root
+
+    def parse_listing_items(self, html: str, base_url: str) -> List[Tuple[str, str]]:
+        """Parse (URL, snippet text) pairs from the listings page HTML"""
+        root = self._parse(html)
+        if root is None:
+            return self._reference.parse_listing_items(html, base_url)
+
+        items = []
+        for product in root.xpath('//div[contains(@class, "prod")]'):
+            if not _has_class(product, 'nobj prod'):
+                continue
+            for link in product.iterdescendants('a'):
+                href = link.get('href')
+                if href is not None:
+                    if href:
+                        items.append((urljoin(base_url, href), _get_text(product)))
+                    break
+
+        return items
+
+    def parse_listing_urls(self, html: str, base_url: str) -> List[str]:
+        """Parse listing URLs from the listings page HTML"""
+        return [url for url, _ in self.parse_listing_items(html, base_url)]
+
+    def extract_hash_from_html(self, root, html: str) -> Optional[str]:
+        """Extract the telshow hash from the tree, else from the raw HTML"""
+        telshow_div = next((div for div in root.iter('div') if div.get('id') == 'telshow'), None)
+        if telshow_div is not None and telshow_div.get('data-h') is not None:
+            return telshow_div.get('data-h')
+
+        hash_match = RAW_HASH_RE.search(html)
+        return hash_match.group(1) if hash_match else None
+
+    def parse_detail(self, html: str, url: str, listing_id: Optional[str],
+                     timer=None) -> Tuple[Optional[Dict], Optional[str]]:
+        """Parse a detail page into a record (without phone) and its telshow hash
+
+        ``timer`` (a ``profiling.StepTimer``) times each extraction step.
+        """
+        root = self._parse(html)
+        if root is None:
+            return self._reference.parse_detail(html, url, listing_id, timer)
+        lap = timer.lap if timer is not None else _no_lap
+
+        found = root.xpath('//div[@id="openhalf"]')
+        lap('tree')
+        if not found:
+            return None, None
+        content_div = found[0]
+
+        data = {
+            'url': url,
+            'listing_id': listing_id
+        }
+
+        title_elem = next(root.iter('h1'), None)
+        if title_elem is None:
+            title_elem = next(root.iter('title'), None)
+        data['title'] = _get_text(title_elem) if title_elem is not None else fallback_title(url)
+        lap('title')
+
+        categories = []
+        for link in content_div.iterdescendants('a'):
+            href = link.get('href')
+            if href is not None and CATEGORY_HREF_RE.search(href):
+                categories.append(_get_text(link))
+                if len(categories) == 2:
+                    break
+        data['categories'] = ', '.join(categories) if categories else ''
+        lap('categories')
+
+        price_elem = _find(content_div, 'span', 'pricecolor')
+        data['price'] = _get_text(price_elem) if price_elem is not None else ''
+        lap('price')
+
+        desc_elem = _find(content_div, 'p', 'infop100')
+        data['description'] = _get_text(desc_elem) if desc_elem is not None else ''
+        lap('description')
+
+        contact_div = _find(content_div, 'div', 'infocontact')
+        if contact_div is not None:
+            user_link = _find(contact_div, 'a', href_re=USER_HREF_RE)
+            if user_link is not None:
+                data['user_name'] = _get_text(user_link).replace('(Bütün Elanları)', '').strip()
+                data['user_id'] = user_link.get('href').split('/')[-1]
+            else:
+                data['user_name'] = data['user_id'] = ''
+
+            data['location'] = find_location(_stripped_strings(contact_div))
+        else:
+            data['user_name'] = data['user_id'] = data['location'] = ''
+        lap('contact')
+
+        date_elem = _find(content_div, 'span', 'viewsbb')
+        if date_elem is not None:
+            date_text = _get_text(date_elem)
+            date_match = DATE_RE.search(date_text)
+            data['date'] = date_match.group(1) if date_match else date_text
+        else:
+            data['date'] = ''
+        lap('date')
+
+        hash_value = self.extract_hash_from_html(root, html) if listing_id else None
+        lap('hash')
+        return data, hash_value
+
+
+PARSERS = {
+    SoupParser.name: SoupParser,
+    LxmlParser.name: LxmlParser,
+}
+
+
+def get_parser(name: str = 'soup'):
+    """Instantiate a parser backend by name"""
+    try:
+        return PARSERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown parser backend {name!r} (choose from {', '.join(PARSERS)})")
+
+
+_process_parsers: Dict[str, object] = {}
+
+
+def _process_parser(name: str):
+    """Parser instance cached per worker process"""
+    parser = _process_parsers.get(name)
+    if parser is None:
+        parser = _process_parsers[name] = get_parser(name)
+    return parser
+
+
+def parse_listing_html(parser_name: str, html: str, base_url: str) -> List[Tuple[str, str]]:
+    """Picklable entry point for parsing a list page in a worker process"""
+    return _process_parser(parser_name).parse_listing_items(html, base_url)
+
+
+def parse_detail_html(parser_name: str, html: str, url: str,
+                      listing_id: Optional[str]) -> Tuple[Optional[Dict], Optional[str]]:
+    """Picklable entry point for parsing a detail page in a worker process"""
+    return _process_parser(parser_name).parse_detail(html, url, listing_id)
+
+
+def compare_parsers(paths: List[Path], base_url: str = 'https://ustasi.az',
+                    reference: str = 'soup', candidate: str = 'lxml') -> List[str]:
+    """Parse saved pages with two backends and describe every mismatch
+
+    Each file is treated as both a list page and a detail page; the file
+    name is used as the detail page URL slug.
+    """
+    ref_parser = get_parser(reference)
+    cand_parser = get_parser(candidate)
+    mismatches = []
+
+    for path in paths:
+        html = path.read_text(encoding='utf-8', errors='replace')
+        url = f"{base_url}/{path.name}"
+        match = re.search(r'-(\d+)\.html$', url)
+        listing_id = match.group(1) if match else None
+
+        ref_items = ref_parser.parse_listing_items(html, base_url)
+        cand_items = cand_parser.parse_listing_items(html, base_url)
+        if ref_items != cand_items:
+            mismatches.append(f"{path}: listing items differ ({len(ref_items)} vs {len(cand_items)})")
+
+        ref_detail = ref_parser.parse_detail(html, url, listing_id)
+        cand_detail = cand_parser.parse_detail(html, url, listing_id)
+        if ref_detail != cand_detail:
+            ref_data, ref_hash = ref_detail
+            cand_data, cand_hash = cand_detail
+            fields = sorted(
+                key for key in set(ref_data or {}) | set(cand_data or {})
+                if (ref_data or {}).get(key) != (cand_data or {}).get(key)
+            )
+            if ref_hash != cand_hash:
+                fields.append('hash')
+            mismatches.append(f"{path}: detail fields differ: {', '.join(fields) or 'record presence'}")
+
+    return mismatches
+
+
+def main(argv: List[str]) -> int:
+    paths = []
+    for arg in argv:
+        path = Path(arg)
+        paths.extend(sorted(path.glob('*.html')) if path.is_dir() else [path])
+
+    if not paths:
+        print("Usage: python parsers.py <dir-or-html-files>...")
+        return 2
+
+    mismatches = compare_parsers(paths)
+    for line in mismatches:
+        print(line)
+    print(f"Checked {len(paths)} pages: {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+"""
+Phone-number resolution as a separate pipeline stage.
+
+Detail workers hand ``(listing_id, hash)`` jobs to a ``PhoneResolver`` and
+move on; up to ``num_workers`` lookups at a time perform the telshow AJAX
+calls and complete each record through a callback. A lookup waiting to
+retry gives its slot to the next job. With ``reuse_user_phones`` the
+number already resolved for the same ``user_id`` (in this run, or in the
+previous run's store) is reused instead of making another call.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+# (listing_id, hash, slot) -> phone; the fetcher gives ``slot`` back while it backs off
+PhoneFetcher = Callable[[str, str, Optional[asyncio.Semaphore]], Awaitable[Optional[str]]]
+StoredPhoneLookup = Callable[[str], Optional[str]]
+
+
+class PhoneResolver:
+    """Bounded pool of lookups resolving phone numbers for scraped listings"""
+
+    def __init__(self, fetch_phone: PhoneFetcher, num_workers: int = 4, queue_size: int = 500,
+                 reuse_user_phones: bool = False, lookup_stored: Optional[StoredPhoneLookup] = None):
+        self.fetch_phone = fetch_phone
+        self.num_workers = max(1, num_workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.reuse_user_phones = reuse_user_phones
+        self.lookup_stored = lookup_stored  # Previous run's phone for a user_id
+        self.user_phones: Dict[str, str] = {}
+        self.lookups = 0  # AJAX calls made
+        self.cache_hits = 0  # Phones reused for a known user_id
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._jobs: Set[asyncio.Task] = set()
+
+    def start(self):
+        """Start taking jobs off the queue"""
+        if self._dispatcher is None:
+            self._slots = asyncio.Semaphore(self.num_workers)
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def submit(self, listing_id: str, hash_value: str, user_id: str,
+                     on_resolved: Callable[[Optional[str]], None]):
+        """Queue a phone lookup; waits only if the queue is full"""
+        await self.queue.put((listing_id, hash_value, user_id, on_resolved))
+
+    async def join(self):
+        """Wait until every queued lookup has been resolved"""
+        await self.queue.join()
+
+    async def close(self):
+        """Stop the lookups, dropping any unresolved jobs"""
+        tasks = list(self._jobs)
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._jobs.clear()
+
+    def cached_phone(self, user_id: str) -> Optional[str]:
+        """Known phone for a user, if reuse is enabled"""
+        if not self.reuse_user_phones or not user_id:
+            return None
+        phone = self.user_phones.get(user_id)
+        if phone is None and self.lookup_stored is not None:
+            phone = self.lookup_stored(user_id)
+            if phone:
+                self.user_phones[user_id] = phone
+        return phone or None
+
+    async def resolve(self, listing_id: str, hash_value: str, user_id: str,
+                      slot: Optional[asyncio.Semaphore] = None) -> Optional[str]:
+        """Phone for one listing, from the cache or the AJAX endpoint"""
+        phone = self.cached_phone(user_id)
+        if phone is not None:
+            self.cache_hits += 1
+            return phone
+
+        if not self.reuse_user_phones or not user_id:
+            self.lookups += 1
+            return await self.fetch_phone(listing_id, hash_value, slot)
+
+        # Share one lookup between concurrent listings of the same user
+        pending = self._in_flight.get(user_id)
+        if pending is not None:
+            phone = await asyncio.shield(pending)
+            if phone:
+                self.cache_hits += 1
+                return phone
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[user_id] = future
+        phone = None
+        try:
+            self.lookups += 1
+            phone = await self.fetch_phone(listing_id, hash_value, slot)
+            if phone:
+                self.user_phones[user_id] = phone
+            return phone
+        finally:
+            future.set_result(phone)
+            if self._in_flight.get(user_id) is future:
+                del self._in_flight[user_id]
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            job = await self.queue.get()
+            task = asyncio.create_task(self._run(*job))
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+
+    async def _run(self, listing_id: str, hash_value: str, user_id: str,
+                   on_resolved: Callable[[Optional[str]], None]):
+        try:
+            phone = await self.resolve(listing_id, hash_value, user_id, self._slots)
+            on_resolved(phone)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"    Error resolving phone for {listing_id}: {e}")
+        finally:
+            self._slots.release()
+            self.queue.task_done()
@@ -0,0 +1,131 @@
+"""
+Profiling helpers for the scraper and the chart generator.
+
+``Profiler`` runs cProfile with a per-thread CPU clock (written as a ``.pstats``
+file) together with a wall-clock stack sampler (written as a
+``.collapsed`` file for flamegraph.pl or speedscope). The two views differ
+for async code: cProfile only charges a coroutine for the CPU it burns
+between awaits, while the sampler also sees where the event loop sits
+idle waiting on the network.
+
+``StepTimer`` times the individual extraction steps of one parse.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+IDLE_FUNCTIONS = {'select', 'poll', 'epoll', 'kqueue'}  # Event loop waiting for I/O
+
+
+class Profiler:
+    """CPU profile plus wall-clock stack samples of the calling thread
+
+    Use as a context manager, or call ``start`` and ``stop``. Only the
+    calling thread of this process is profiled; work in process pools is
+    not included.
+    """
+
+    def __init__(self, prefix: Union[str, Path] = 'profile', interval: float = 0.005):
+        self.prefix = Path(prefix)
+        self.interval = interval  # Seconds between wall-clock samples
+        self.profile = cProfile.Profile(time.thread_time)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._thread_id: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wall_start = self._cpu_start = 0.0
+        self.wall_seconds = self.cpu_seconds = 0.0
+
+    def __enter__(self) -> 'Profiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        self.write()
+        print(self.report())
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            names = []
+            leaf = frame.f_code.co_name
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+            if leaf in IDLE_FUNCTIONS:
+                self.idle_samples += 1
+
+    def write(self):
+        """Write ``<prefix>.pstats`` and ``<prefix>.collapsed``"""
+        if self.prefix.parent != Path('.'):
+            self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(f"{self.prefix}.pstats")
+        with open(f"{self.prefix}.collapsed", 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def report(self, limit: int = 15) -> str:
+        """Wall vs CPU totals and the functions with the most CPU time"""
+        idle = self.idle_samples / self.samples if self.samples else 0.0
+        cpu_share = self.cpu_seconds / self.wall_seconds if self.wall_seconds else 0.0
+        out = io.StringIO()
+        out.write(f"Profile: wall {self.wall_seconds:.2f}s, CPU {self.cpu_seconds:.2f}s "
+                  f"({cpu_share:.0%} of wall), event loop idle in {idle:.0%} of "
+                  f"{self.samples} samples\n")
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(limit)
+        out.write(f"Wrote {self.prefix}.pstats and {self.prefix}.collapsed\n")
+        return out.getvalue()
+
+
+class StepTimer:
+    """Lap timer for the extraction steps of a single parse
+
+    ``lap(name)`` charges the time since the previous lap (or since the
+    timer was created) to ``name``.
+    """
+
+    __slots__ = ('laps', '_last')
+
+    def __init__(self):
+        self.laps: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.laps[name] = self.laps.get(name, 0.0) + now - self._last
+        self._last = now
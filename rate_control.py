@@ -0,0 +1,125 @@
+"""
+Adaptive concurrency and rate control for outgoing requests.
+
+``AdaptiveLimiter`` keeps an AIMD (additive increase, multiplicative
+decrease) window of requests allowed in flight. Healthy responses grow the
+window by about one request per window's worth of completions. Timeouts,
+connection errors, 429 and 5xx responses halve it (at most once per
+latency period), and latency climbing well above the observed baseline
+shrinks it gently. A requests-per-second ceiling is enforced on top.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class Slot:
+    """One in-flight request; set ``status`` before leaving the block"""
+
+    __slots__ = ('limiter', 'status', 'started')
+
+    def __init__(self, limiter: 'AdaptiveLimiter'):
+        self.limiter = limiter
+        self.status: Optional[int] = None
+        self.started = 0.0
+
+    async def __aenter__(self) -> 'Slot':
+        await self.limiter.acquire()
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        latency = time.monotonic() - self.started
+        if exc_type is asyncio.CancelledError:
+            outcome = 'cancelled'
+        elif exc_type is not None:
+            outcome = 'overload'  # Timeouts and connection errors
+        elif self.status is not None and (self.status == 429 or self.status >= 500):
+            outcome = 'overload'
+        else:
+            outcome = 'ok'
+        await self.limiter.release(latency, outcome)
+        return False
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window with a requests-per-second ceiling"""
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 max_rps: Optional[float] = 25.0, latency_tolerance: float = 2.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.max_rps = max_rps  # None disables the rate ceiling
+        self.latency_tolerance = latency_tolerance  # Multiple of baseline latency seen as congestion
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.overloads = 0
+        self._next_start = 0.0
+        self._last_decrease = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def window(self) -> int:
+        """Current number of requests allowed in flight"""
+        return int(self.limit)
+
+    def slot(self) -> Slot:
+        """Async context manager wrapping one request"""
+        return Slot(self)
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self):
+        """Wait for room in the window and for the rate ceiling"""
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < self.window)
+            self.in_flight += 1
+
+        if self.max_rps:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + 1.0 / self.max_rps
+            if start > now:
+                try:
+                    await asyncio.sleep(start - now)
+                except asyncio.CancelledError:
+                    await self.release(0.0, 'cancelled')
+                    raise
+
+    async def release(self, latency: float, outcome: str):
+        """Return a slot and adapt the window to the request outcome"""
+        now = time.monotonic()
+
+        if outcome == 'ok':
+            if self.baseline_latency is None or latency < self.baseline_latency:
+                self.baseline_latency = latency
+            else:
+                # Let the baseline drift up slowly so it tracks the server
+                self.baseline_latency += (latency - self.baseline_latency) * 0.01
+
+            if latency > self.baseline_latency * self.latency_tolerance:
+                self._decrease(now, latency, factor=0.9)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif outcome == 'overload':
+            self.overloads += 1
+            self._decrease(now, latency, factor=0.5)
+
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    def _decrease(self, now: float, latency: float, factor: float):
+        # One decrease per latency period, so a burst of failures from the
+        # same window does not collapse it repeatedly
+        if now - self._last_decrease < max(latency, self.baseline_latency or 0.0, 0.05):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
@@ -0,0 +1,151 @@
+"""
+Freshness-driven recrawl scheduling.
+
+``RecrawlScheduler`` keeps revisit state for every listing of a
+``ListingStore``, in a ``recrawl`` table of the same database: when the
+listing was last fetched, its revisit interval, how often it was checked
+and how often it had changed, and its posting date.
+
+A new listing starts with an interval proportional to its age, so
+listings posted today are revisited within hours and old ones after
+weeks. Every fetch that finds the listing unchanged multiplies the
+interval by ``backoff``, and every change divides it. ``due`` is the
+priority queue: listings past their revisit time, most overdue first
+(time since the last fetch over the interval), weighted up by their
+observed change rate. A recrawl run spends a fixed request budget on
+new listings first and then on the listings ``due`` returns.
+"""
+
+import json
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from columnar import parse_date
+from store import ListingStore
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recrawl (
+    listing_id TEXT PRIMARY KEY,
+    url TEXT,
+    listing_day TEXT,
+    last_fetched REAL NOT NULL,
+    interval REAL NOT NULL,
+    next_due REAL NOT NULL,
+    checks INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recrawl_next_due ON recrawl (next_due);
+"""
+
+
+class RecrawlScheduler:
+    """Revisit intervals per listing and the choice of what to recrawl next"""
+
+    def __init__(self, store: ListingStore, min_interval: float = 6 * HOUR, max_interval: float = 60 * DAY,
+                 backoff: float = 2.0, age_factor: float = 0.25):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("min_interval must be positive and at most max_interval")
+        if backoff <= 1:
+            raise ValueError("backoff must be greater than 1")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.age_factor = age_factor  # First interval as a fraction of the listing's age
+        self.conn = store.conn  # Writes are committed along with the store's
+        self.conn.executescript(SCHEMA)
+        self._track_stored()
+        self.conn.commit()
+
+    def _track_stored(self):
+        """Start tracking stored listings that have no revisit state yet"""
+        rows = self.conn.execute(
+            'SELECT listing_id, url, record, last_fetched FROM listings '
+            'WHERE listing_id NOT IN (SELECT listing_id FROM recrawl)'
+        ).fetchall()
+        for row in rows:
+            record = json.loads(row['record'])
+            self._insert(row['listing_id'], row['url'], self.listing_day(record),
+                         row['last_fetched'] or time.time(), changed=True)
+
+    @staticmethod
+    def listing_day(record: Dict) -> Optional[date]:
+        day, _ = parse_date(record.get('date'))
+        return day
+
+    def initial_interval(self, listing_day: Optional[date], now: float) -> float:
+        """First revisit interval: a fraction of the listing's age"""
+        if listing_day is None:
+            return self.min_interval * 4
+        age = max(0.0, now - datetime.combine(listing_day, datetime.min.time()).timestamp())
+        return min(self.max_interval, max(self.min_interval, age * self.age_factor))
+
+    def _insert(self, listing_id: str, url: Optional[str], listing_day: Optional[date], now: float,
+                changed: bool):
+        interval = self.initial_interval(listing_day, now)
+        self.conn.execute(
+            'INSERT INTO recrawl (listing_id, url, listing_day, last_fetched, interval, next_due, checks, changes) '
+            'VALUES (?, ?, ?, ?, ?, ?, 1, ?)',
+            (listing_id, url, listing_day.isoformat() if listing_day else None, now, interval,
+             now + interval, int(changed))
+        )
+
+    def known(self, listing_id: Optional[str]) -> bool:
+        return listing_id is not None and self.conn.execute(
+            'SELECT 1 FROM recrawl WHERE listing_id = ?', (listing_id,)
+        ).fetchone() is not None
+
+    def observe(self, record: Dict, changed: bool, now: Optional[float] = None):
+        """Record a fetch of a listing and whether its content had changed"""
+        listing_id = record.get('listing_id')
+        if not listing_id:
+            return
+        now = now or time.time()
+        listing_day = self.listing_day(record)
+        row = self.conn.execute('SELECT interval FROM recrawl WHERE listing_id = ?', (listing_id,)).fetchone()
+        if row is None:
+            self._insert(listing_id, record.get('url'), listing_day, now, changed=True)
+        else:
+            interval = row['interval'] / self.backoff if changed else row['interval'] * self.backoff
+            interval = min(self.max_interval, max(self.min_interval, interval))
+            self.conn.execute(
+                'UPDATE recrawl SET url = COALESCE(?, url), listing_day = COALESCE(?, listing_day), '
+                'last_fetched = ?, interval = ?, next_due = ?, checks = checks + 1, '
+                'changes = changes + ? WHERE listing_id = ?',
+                (record.get('url'), listing_day.isoformat() if listing_day else None, now, interval,
+                 now + interval, int(changed), listing_id)
+            )
+
+    def defer(self, listing_id: Optional[str], now: Optional[float] = None):
+        """Back off a listing whose fetch failed, e.g. because it was removed"""
+        if not listing_id:
+            return
+        now = now or time.time()
+        self.conn.execute(
+            'UPDATE recrawl SET interval = MIN(?, interval * ?), next_due = ? + MIN(?, interval * ?) '
+            'WHERE listing_id = ?',
+            (self.max_interval, self.backoff, now, self.max_interval, self.backoff, listing_id)
+        )
+
+    def due(self, limit: int, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """``(listing_id, url)`` of up to ``limit`` listings past their revisit time, most urgent first"""
+        if limit <= 0:
+            return []
+        now = now or time.time()
+        return [(row['listing_id'], row['url']) for row in self.conn.execute(
+            'SELECT listing_id, url FROM recrawl WHERE next_due <= ? AND url IS NOT NULL '
+            'ORDER BY (? - last_fetched) / interval * (1.0 + CAST(changes AS REAL) / checks) DESC, '
+            'listing_day DESC LIMIT ?',
+            (now, now, limit)
+        )]
+
+    def counts(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """(listings due now, listings tracked)"""
+        now = now or time.time()
+        due, total = self.conn.execute(
+            'SELECT COALESCE(SUM(next_due <= ?), 0), COUNT(*) FROM recrawl', (now,)
+        ).fetchone()
+        return due, total
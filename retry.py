@@ -0,0 +1,121 @@
+"""
+Bounded retries with exponential backoff and jitter.
+
+Failures are raised as ``FetchError`` with a kind (``timeout``,
+``network``, ``http`` or ``parse``); each kind has its own ``RetryPolicy``.
+Items that exhaust their attempts, or fail in a way a retry cannot fix, end
+up in a dead-letter list that is written out at the end of the run.
+"""
+
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, TypeVar, Union
+
+T = TypeVar('T')
+
+
+class FetchError(Exception):
+    """A failed request or parse step, classified for the retry policy"""
+
+    def __init__(self, kind: str, message: str = '', status: Optional[int] = None):
+        super().__init__(message or kind)
+        self.kind = kind  # 'timeout', 'network', 'http' or 'parse'
+        self.status = status
+
+
+class RetryPolicy:
+    """How often and how fast to retry one class of error"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 retry_statuses: Optional[Set[int]] = None):
+        self.max_attempts = max_attempts  # Including the first try
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses  # For 'http' errors; None retries every status
+
+    def retryable(self, error: FetchError) -> bool:
+        return self.retry_statuses is None or error.status in self.retry_statuses
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before the next attempt: exponential cap with equal jitter"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+
+DEFAULT_POLICIES = {
+    'timeout': RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0),
+    'network': RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0),
+    'http': RetryPolicy(max_attempts=4, base_delay=2.0, max_delay=60.0,
+                        retry_statuses={408, 425, 429, 500, 502, 503, 504}),
+    'parse': RetryPolicy(max_attempts=2, base_delay=5.0, max_delay=30.0),
+}
+
+
+class RetryManager:
+    """Runs operations with per-error-class retries and collects dead letters
+
+    At most ``max_waiting`` operations may be sleeping before a retry at
+    once; beyond that, failures go straight to the dead-letter list so a
+    failing server cannot pile up unbounded work.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, RetryPolicy]] = None, max_waiting: int = 1000):
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.retries = 0
+        self.dead_letters: List[Dict] = []
+
+    async def run(self, stage: str, key: str, operation: Callable[[], Awaitable[T]],
+                  slot: Optional[asyncio.Semaphore] = None) -> T:
+        """Await ``operation`` until it succeeds or its retries run out
+
+        ``slot`` is the semaphore the caller holds while working on the
+        item; it is given back during each backoff, so the other items
+        go ahead while this one waits. Raises the last ``FetchError``
+        once the item is dead-lettered.
+        """
+        attempt = 1
+        while True:
+            try:
+                return await operation()
+            except FetchError as error:
+                policy = self.policies.get(error.kind)
+                if (policy is None or attempt >= policy.max_attempts or not policy.retryable(error)
+                        or self.waiting >= self.max_waiting):
+                    self.dead_letters.append({
+                        'stage': stage,
+                        'key': key,
+                        'kind': error.kind,
+                        'status': error.status,
+                        'error': str(error),
+                        'attempts': attempt,
+                        'timestamp': time.time(),
+                    })
+                    raise
+
+                self.retries += 1
+                self.waiting += 1
+                if slot is not None:
+                    slot.release()
+                try:
+                    await asyncio.sleep(policy.delay(attempt))
+                finally:
+                    self.waiting -= 1
+                    if slot is not None:
+                        await slot.acquire()
+                attempt += 1
+
+    def write_dead_letters(self, path: Union[str, Path] = 'ustasi_dead_letters.json'):
+        """Write the dead-letter list, if there is one"""
+        if not self.dead_letters:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.dead_letters, f, ensure_ascii=False, indent=2)
+            print(f"Wrote {len(self.dead_letters)} failed items to {path}")
+        except Exception as e:
+            print(f"Warning: Could not write dead letters: {e}")
@@ -1,20 +1,56 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
+import argparse
 import json
-import csv
-from urllib.parse import urljoin
+import random
 import re
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Set, Tuple, Union
 import time
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import columnar
+from aggregate_store import AggregateStore
+from checkpoint import RecordLog
+from dedupe import DEDUPE_BACKENDS, new_id_set
+from exporters import COMPRESSIONS, ListingExporter
+from http_cache import CachedResponse, ResponseCache
+from listing import Listing
+from metrics import Metrics, MetricsServer
+from parsers import PARSERS, get_parser, parse_detail_html, parse_listing_html
+from phones import PhoneResolver
+from profiling import Profiler, StepTimer
+from recrawl import RecrawlScheduler
+from rate_control import AdaptiveLimiter
+from retry import FetchError, RetryManager
+from search_index import SearchIndex
+from store import ListingStore, content_hash, text_hash
+from transport import TRANSPORTS, TransportConfig, get_transport, use_uvloop
+
 
 class UstasiScraperV2:
     """Improved scraper with crash protection and duplicate detection"""
 
-    def __init__(self, max_pages: int = 100):
-        self.base_url = "https://ustasi.az"
+    def __init__(self, max_pages: int = 100, page_window: int = 1,
+                 stream: bool = False, queue_size: int = 200, parser: str = 'soup',
+                 parse_in_processes: bool = False, parse_workers: Optional[int] = None,
+                 checkpoint_batch: int = 50, checkpoint_fsync: str = 'batch',
+                 store_path: Optional[str] = None, incremental: bool = False,
+                 cache_dir: Optional[str] = None, cache_ttl: Optional[float] = None,
+                 list_cache_ttl: Optional[float] = 600.0,
+                 cache_max_bytes: Optional[int] = 1024 * 1024 * 1024, replay: bool = False,
+                 max_concurrency: int = 16, max_rps: Optional[float] = 25.0,
+                 phone_workers: int = 4, phone_max_rps: Optional[float] = 10.0,
+                 reuse_user_phones: bool = False, base_url: str = "https://ustasi.az",
+                 metrics_file: Optional[str] = None, metrics_port: Optional[int] = None,
+                 metrics_summary: Optional[str] = None, profile_steps: float = 0.0,
+                 transport: Union[str, TransportConfig] = 'tuned',
+                 export_compression: Optional[str] = None, export_max_bytes: Optional[int] = None,
+                 parquet: bool = False, aggregates_path: Optional[str] = None,
+                 dedupe: str = 'memory', dedupe_error_rate: float = 0.001,
+                 search_index_path: Optional[str] = None, recrawl_budget: Optional[int] = None):
+        self.base_url = base_url.rstrip('/')
         self.homelist_url = f"{self.base_url}/homelist/"
         self.ajax_url = f"{self.base_url}/ajax.php"
         self.headers = {
@@ -26,33 +62,182 @@ class UstasiScraperV2:
             'Referer': f'{self.base_url}/',
             'X-Requested-With': 'XMLHttpRequest'
         }
+        # Connection pool, timeouts and encodings of the client session
+        self.transport = get_transport(transport)
         self.max_pages = max_pages  # Hard limit on pages
-        self.listings = []
+        self.page_window = max(1, page_window)  # List pages fetched in flight at once
+        self.record_count = 0  # Records produced this run, including recovered ones
         self.session = None
-        self.seen_urls: Set[str] = set()  # Track seen URLs
+        # Seen listing URLs and scraped listing IDs, in a dedupe backend of dedupe.py
+        self.seen_urls = new_id_set(dedupe, 'ustasi_seen_ids.db', dedupe_error_rate)
         self.progress_file = Path('scraper_progress.json')
-        self.scraped_ids: Set[str] = set()  # Track scraped listing IDs
+        # IDs of emitted records; on resume they are rebuilt from the record log
+        self.scraped_ids = new_id_set(dedupe, 'ustasi_scraped_ids.db', dedupe_error_rate)
+        # Append-only log of scraped records, replayed on resume
+        self.record_log = RecordLog('ustasi_listings_temp.jsonl',
+                                    batch_size=checkpoint_batch, fsync=checkpoint_fsync)
+        self.stream = stream  # Overlap discovery and detail scraping
+        self.queue_size = queue_size  # Bound on discovered-but-unscraped URLs in stream mode
+        # Persistent listing store; incremental mode only re-scrapes changed listings
+        # A recrawl run spends recrawl_budget requests on new and due listings
+        # instead of walking every list page; it needs the store
+        self.recrawl_budget = recrawl_budget
+        self.incremental = incremental or recrawl_budget is not None
+        if self.incremental and store_path is None:
+            store_path = 'ustasi_listings.db'
+        self.store: Optional[ListingStore] = ListingStore(store_path) if store_path else None
+        # Revisit intervals per listing, kept up to date on every detail fetch
+        self.scheduler: Optional[RecrawlScheduler] = RecrawlScheduler(self.store) if self.store else None
+        # JSON/CSV exports; without a store, records are streamed to them as
+        # they are produced, with a store they are written from it at the end
+        self.export_compression = export_compression
+        self.export_max_bytes = export_max_bytes
+        # Typed columnar copy of the export, when pyarrow is installed
+        self.parquet_file = 'ustasi_listings.parquet' if parquet and columnar.pa is not None else None
+        if parquet and self.parquet_file is None:
+            print("pyarrow is not installed, skipping the Parquet export")
+        self.exporter: Optional[ListingExporter] = None if self.store else self.new_exporter()
+        # Chart counts kept up to date as records are emitted
+        self.aggregates: Optional[AggregateStore] = AggregateStore(aggregates_path) if aggregates_path else None
+        # Full-text search index updated as records are emitted
+        self.search_index: Optional[SearchIndex] = SearchIndex(search_index_path) if search_index_path else None
+        self.snippet_hashes: Dict[int, str] = {}  # Integer listing ID -> hash of its list-page snippet
+        self.unchanged = 0
+        # On-disk response cache; replay mode serves every request from it, offline
+        self.replay = replay
+        if replay and cache_dir is None:
+            cache_dir = 'http_cache'
+        self.cache: Optional[ResponseCache] = (
+            ResponseCache(cache_dir, ttl=cache_ttl, max_bytes=cache_max_bytes) if cache_dir else None
+        )
+        # /homelist/ pages change with every new listing, so their cached copies
+        # expire much sooner than detail pages (unless replaying)
+        self.list_cache_ttl = list_cache_ttl
+        # Adaptive window shared by list, detail and phone requests
+        self.limiter = AdaptiveLimiter(initial=min(4, max_concurrency), max_limit=max_concurrency,
+                                       max_rps=max_rps)
+        # Phone lookups run as their own stage with a separate window and rate;
+        # phone_workers=0 resolves them inline in the detail workers instead
+        self.phone_workers = phone_workers
+        self.reuse_user_phones = reuse_user_phones
+        self.phone_limiter = AdaptiveLimiter(initial=min(4, max(1, phone_workers)),
+                                             max_limit=max(1, phone_workers), max_rps=phone_max_rps)
+        self.phones: Optional[PhoneResolver] = None
+        # Bounded retries with backoff; exhausted items are dead-lettered
+        self.retries = RetryManager()
+        self.parser = get_parser(parser)  # HTML parser backend ('soup' or 'lxml')
+        self.parse_in_processes = parse_in_processes  # Parse HTML off the event loop
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.parse_executor: Optional[ProcessPoolExecutor] = None
+        # Per-stage metrics: a Prometheus textfile refreshed with progress
+        # output, an optional /metrics endpoint and a JSON summary at the end
+        self.metrics = Metrics()
+        self.metrics_file = metrics_file
+        self.metrics_server: Optional[MetricsServer] = (
+            MetricsServer(self.metrics, port=metrics_port) if metrics_port else None
+        )
+        self.metrics_summary = metrics_summary
+        self.profile_steps = profile_steps  # Fraction of detail pages whose extraction steps are timed
+        self.successful = 0
+        self.failed = 0
+        self.completed = 0
 
     async def create_session(self):
-        """Create aiohttp session with cookies"""
-        timeout = aiohttp.ClientTimeout(total=30)
-        self.session = aiohttp.ClientSession(
-            headers=self.headers,
-            timeout=timeout
-        )
+        """Create aiohttp session with cookies
+
+        The connection pool is sized to what both limiters can have in flight.
+        """
+        if self.replay:
+            return  # No network in replay mode
+        pool_size = self.limiter.max_limit + self.phone_limiter.max_limit
+        self.session = self.transport.create_session(self.headers, pool_size)
 
     async def close_session(self):
         """Close aiohttp session"""
         if self.session:
             await self.session.close()
 
+    async def fetch(self, method: str, url: str, params: Optional[Dict] = None, data=None,
+                    headers: Optional[Dict[str, str]] = None,
+                    limiter: Optional[AdaptiveLimiter] = None,
+                    stage: str = 'detail') -> Optional[CachedResponse]:
+        """Perform an HTTP request through the response cache
+
+        Returns None when replaying and the request is not cached. Transport
+        failures are raised as ``FetchError`` for the retry policy. ``stage``
+        labels the request in the metrics. Conditional requests skip the cache
+        lookup (except when replaying) so the server can revalidate them.
+        """
+        conditional = bool(headers) and ('If-None-Match' in headers or 'If-Modified-Since' in headers)
+        if self.cache is not None and (self.replay or not conditional):
+            cached = self.cache.get(method, url, params, data, allow_stale=self.replay,
+                                    max_age=self.list_cache_ttl if stage == 'list' else None)
+            if cached is not None:
+                self.metrics.cache_hit(stage)
+                return cached
+        if self.replay:
+            return None
+
+        status = 'error'
+        size = 0
+        try:
+            async with (limiter or self.limiter).slot() as slot:
+                # Latency is measured once a slot is held, so it excludes limiter queueing
+                started = time.perf_counter()
+                self.metrics.request_started(stage)
+                try:
+                    async with self.session.request(method, url, params=params, data=data, headers=headers) as response:
+                        slot.status = status = response.status
+                        kept_headers = {name: response.headers[name] for name in ResponseCache.KEPT_HEADERS
+                                        if name in response.headers}
+                        body = await response.read()
+                        # Content-Length is the size on the wire (before decompression);
+                        # chunked responses only have the decoded size
+                        size = response.content_length if response.content_length is not None else len(body)
+                        result = CachedResponse(response.status, await response.text(), kept_headers)
+                except asyncio.TimeoutError:
+                    status = 'timeout'
+                    raise
+                except aiohttp.ClientError:
+                    status = 'network'
+                    raise
+                except asyncio.CancelledError:
+                    status = 'cancelled'  # e.g. list pages prefetched past the stop point
+                    raise
+                finally:
+                    self.metrics.request_finished(stage, status, time.perf_counter() - started, size)
+        except asyncio.TimeoutError:
+            raise FetchError('timeout', f"Timeout: {method} {url}")
+        except aiohttp.ClientError as e:
+            raise FetchError('network', f"{type(e).__name__}: {e}")
+
+        if self.cache is not None and result.status == 200:
+            self.cache.put(method, url, result, params, data)
+        return result
+
+    def start_parse_pool(self):
+        """Start the HTML parsing process pool if enabled"""
+        if self.parse_in_processes and self.parse_executor is None:
+            self.parse_executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+            print(f"Parsing HTML in {self.parse_workers} worker processes")
+
+    def stop_parse_pool(self):
+        """Shut down the HTML parsing process pool"""
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown(cancel_futures=True)
+            self.parse_executor = None
+
     def save_progress(self, urls: List[str], stage: str):
-        """Save progress to file"""
+        """Save progress to file
+
+        Scraped IDs are not saved: listings may still be waiting for their
+        phone number or in the record log's buffer, so on resume the IDs
+        are rebuilt from the records that actually reached the log.
+        """
         try:
             data = {
                 'stage': stage,
                 'urls': list(urls),
-                'scraped_ids': list(self.scraped_ids),
                 'timestamp': time.time()
             }
             with open(self.progress_file, 'w', encoding='utf-8') as f:
@@ -66,92 +251,196 @@ class UstasiScraperV2:
             if self.progress_file.exists():
                 with open(self.progress_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.scraped_ids = set(data.get('scraped_ids', []))
-                    return data
+                # IDs saved by older versions are ignored, see save_progress
+                return data
         except Exception as e:
             print(f"Warning: Could not load progress: {e}")
         return None
 
+    def load_checkpoint(self) -> int:
+        """Rebuild listings and scraped IDs from the record log"""
+        recovered = 0
+        try:
+            for record in self.record_log.replay():
+                listing_id = record.get('listing_id')
+                if listing_id and listing_id in self.scraped_ids:
+                    continue
+                self.export(record)
+                if listing_id:
+                    self.scraped_ids.add(listing_id)
+                recovered += 1
+        except Exception as e:
+            print(f"Warning: Could not replay checkpoint: {e}")
+        return recovered
+
+    def pending_urls(self, urls: List[str]) -> List[str]:
+        """Drop URLs whose listings were already scraped
+
+        In incremental mode, listings whose list-page snippet matches the
+        stored one are taken from the store instead of being scraped again.
+        """
+        pending = []
+        for url in urls:
+            listing_id = self.extract_listing_id(url)
+            if listing_id in self.scraped_ids:
+                continue
+            if self.incremental and listing_id and self.reuse_stored(listing_id):
+                continue
+            pending.append(url)
+        return pending
+
+    def reuse_stored(self, listing_id: str) -> bool:
+        """Take an unchanged listing from the store; returns False if it must be scraped"""
+        snippet_hash = self.snippet_hash(listing_id)
+        row = self.store.get(listing_id)
+        if row is None or snippet_hash is None or row['snippet_hash'] != snippet_hash:
+            return False
+
+        record = json.loads(row['record'])
+        self.store.touch(listing_id)
+        self.emit_record(record)
+        self.unchanged += 1
+        return True
+
     async def fetch_listings_page(self, start: int) -> Optional[str]:
         """Fetch a single listings page using POST request"""
         try:
-            async with self.session.post(
-                self.homelist_url,
-                params={'start': start},
-                data=f'start={start}'
-            ) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    print(f"  Warning: HTTP {response.status} for page start={start}")
-                    return None
-        except asyncio.TimeoutError:
-            print(f"  Timeout fetching page start={start}")
+            return await self.retries.run('list', str(start), lambda: self._fetch_listings_page_once(start))
+        except FetchError as e:
+            print(f"  Failed page start={start}: {e}")
             return None
         except Exception as e:
             print(f"  Error fetching page start={start}: {e}")
             return None
 
+    async def _fetch_listings_page_once(self, start: int) -> Optional[str]:
+        response = await self.fetch(
+            'POST',
+            self.homelist_url,
+            params={'start': start},
+            data=f'start={start}',
+            stage='list'
+        )
+        if response is None:
+            print(f"  Not cached: page start={start}")
+            return None
+        if response.status != 200:
+            raise FetchError('http', f"HTTP {response.status} for page start={start}", response.status)
+        return response.text
+
     def parse_listing_urls(self, html: str) -> List[str]:
         """Parse listing URLs from the listings page HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
-        urls = []
+        return self.parser.parse_listing_urls(html, self.base_url)
 
-        # Find all product divs
-        products = soup.find_all('div', class_='nobj prod')
+    async def parse_listing_page(self, html: str) -> List[str]:
+        """Parse a listings page, in the process pool when one is running
 
-        for product in products:
-            link = product.find('a', href=True)
-            if link and link['href']:
-                full_url = urljoin(self.base_url, link['href'])
-                urls.append(full_url)
-
-        return urls
+        Snippet hashes are remembered for incremental recrawls.
+        """
+        with self.metrics.timed('parse', 'list'):
+            if self.parse_executor is None:
+                items = self.parser.parse_listing_items(html, self.base_url)
+            else:
+                loop = asyncio.get_running_loop()
+                items = await loop.run_in_executor(
+                    self.parse_executor, parse_listing_html, self.parser.name, html, self.base_url
+                )
 
-    async def fetch_all_listing_urls(self) -> List[str]:
-        """Fetch all listing URLs from pages with duplicate detection"""
-        print(f"Fetching listing pages (max {self.max_pages} pages)...")
+        if self.store is not None:
+            for url, snippet in items:
+                listing_id = self.extract_listing_id(url)
+                if listing_id:
+                    self.snippet_hashes[int(listing_id)] = text_hash(snippet)
+        return [url for url, _ in items]
+
+    async def parse_detail_page(self, html: str, url: str,
+                                listing_id: Optional[str]) -> Tuple[Optional[Dict], Optional[str]]:
+        """Parse a detail page, in the process pool when one is running
+
+        Returns the record without its phone number and the telshow hash
+        needed for the phone lookup. A ``profile_steps`` fraction of pages is
+        parsed on the event loop with each extraction step timed.
+        """
+        if self.profile_steps and random.random() < self.profile_steps:
+            timer = StepTimer()
+            with self.metrics.timed('parse', 'detail'):
+                result = self.parser.parse_detail(html, url, listing_id, timer)
+            for step, seconds in timer.laps.items():
+                self.metrics.observe('parse_steps', step, seconds)
+            return result
+
+        with self.metrics.timed('parse', 'detail'):
+            if self.parse_executor is None:
+                return self.parser.parse_detail(html, url, listing_id)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.parse_executor, parse_detail_html, self.parser.name, html, url, listing_id
+            )
+
+    async def fetch_all_listing_urls(self, url_queue: Optional[asyncio.Queue] = None) -> List[str]:
+        """Fetch all listing URLs from pages with duplicate detection
+
+        Up to ``page_window`` pages are fetched concurrently. Results are
+        still processed in page order, so the stop rule behaves exactly as
+        in sequential mode and overshoots by at most ``page_window - 1``
+        pages. When ``url_queue`` is given, new URLs are also put on it as
+        soon as they are found.
+        """
+        print(f"Fetching listing pages (max {self.max_pages} pages, window {self.page_window})...")
 
         all_urls = []
         start = 0
+        next_start = 0  # Next page to schedule
+        pending: Dict[int, asyncio.Task] = {}
         consecutive_no_new = 0
         max_consecutive_no_new = 10  # Stop if 10 pages with no new URLs (increased from 5)
 
-        while start < self.max_pages and consecutive_no_new < max_consecutive_no_new:
-            print(f"Page {start+1}/{self.max_pages}...", end=' ')
-
-            try:
-                html = await asyncio.wait_for(
-                    self.fetch_listings_page(start),
-                    timeout=30
-                )
+        try:
+            while start < self.max_pages and consecutive_no_new < max_consecutive_no_new:
+                # Keep the prefetch window full
+                while next_start < self.max_pages and next_start < start + self.page_window:
+                    pending[next_start] = asyncio.create_task(self.fetch_listings_page(next_start))
+                    next_start += 1
 
-                if html:
-                    urls = self.parse_listing_urls(html)
+                print(f"Page {start+1}/{self.max_pages}...", end=' ')
 
-                    # Count new URLs
-                    new_urls = [url for url in urls if url not in self.seen_urls]
+                try:
+                    html = await pending.pop(start)
+
+                    if html:
+                        urls = await self.parse_listing_page(html)
+
+                        # Count new URLs
+                        new_urls = [url for url in urls if url not in self.seen_urls]
+
+                        if new_urls:
+                            all_urls.extend(new_urls)
+                            self.seen_urls.update(new_urls)
+                            consecutive_no_new = 0
+                            if url_queue is not None:
+                                for url in self.pending_urls(new_urls):
+                                    await url_queue.put(url)
+                            print(f"Found {len(new_urls)} new listings (total: {len(all_urls)})")
+                        else:
+                            consecutive_no_new += 1
+                            print(f"No new listings (consecutive: {consecutive_no_new}/{max_consecutive_no_new})")
 
-                    if new_urls:
-                        all_urls.extend(new_urls)
-                        self.seen_urls.update(new_urls)
-                        consecutive_no_new = 0
-                        print(f"Found {len(new_urls)} new listings (total: {len(all_urls)})")
                     else:
                         consecutive_no_new += 1
-                        print(f"No new listings (consecutive: {consecutive_no_new}/{max_consecutive_no_new})")
+                        print(f"Failed to fetch (consecutive: {consecutive_no_new}/{max_consecutive_no_new})")
 
-                else:
-                    consecutive_no_new += 1
-                    print(f"Failed to fetch (consecutive: {consecutive_no_new}/{max_consecutive_no_new})")
-
-                start += 1
-                await asyncio.sleep(0.2)  # Faster delay
+                    start += 1
 
-            except Exception as e:
-                print(f"Error: {e}")
-                consecutive_no_new += 1
-                start += 1
+                except Exception as e:
+                    print(f"Error: {e}")
+                    consecutive_no_new += 1
+                    start += 1
+        finally:
+            # Drop prefetched pages past the stop point
+            for task in pending.values():
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending.values(), return_exceptions=True)
 
         if consecutive_no_new >= max_consecutive_no_new:
             print(f"\nStopped: {max_consecutive_no_new} consecutive pages with no new listings")
@@ -166,51 +455,56 @@ class UstasiScraperV2:
         match = re.search(r'-(\d+)\.html$', url)
         return match.group(1) if match else None
 
-    def extract_hash_from_html(self, soup: BeautifulSoup) -> Optional[str]:
-        """Extract hash value from telzona div"""
-        # Look for the telshow div with data-h attribute
-        telshow_div = soup.find('div', id='telshow')
-        if telshow_div and telshow_div.has_attr('data-h'):
-            return telshow_div['data-h']
+    def snippet_hash(self, listing_id: Optional[str]) -> Optional[str]:
+        """Hash of the listing's list-page snippet, if its list page was seen"""
+        return self.snippet_hashes.get(int(listing_id)) if listing_id else None
 
-        # Fallback: look in the page source for the hash pattern
-        page_text = str(soup)
-        hash_match = re.search(r'data-h="([a-f0-9]{32})"', page_text)
-        if hash_match:
-            return hash_match.group(1)
+    async def fetch_phone_number(self, listing_id: str, hash_value: str,
+                                 slot: Optional[asyncio.Semaphore] = None) -> Optional[str]:
+        """Fetch phone number via AJAX call; ``slot`` is given back while retries back off"""
+        try:
+            return await self.retries.run(
+                'phone', listing_id, lambda: self._fetch_phone_number_once(listing_id, hash_value), slot
+            )
+        except Exception:
+            pass  # Failures are dead-lettered; the listing is kept without a phone
 
         return None
 
-    async def fetch_phone_number(self, listing_id: str, hash_value: str) -> Optional[str]:
-        """Fetch phone number via AJAX call"""
-        try:
-            data = {
-                'act': 'telshow',
-                'id': listing_id,
-                't': 'product',
-                'h': hash_value,
-                'rf': ''
-            }
-
-            async with self.session.post(
-                self.ajax_url,
-                data=data,
-                headers={
-                    **self.headers,
-                    'Accept': 'application/json, text/javascript, */*; q=0.01'
-                }
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get('ok') == 1:
-                        return result.get('tel', '')
-        except Exception:
-            pass  # Silent fail for phone numbers
+    async def _fetch_phone_number_once(self, listing_id: str, hash_value: str) -> Optional[str]:
+        data = {
+            'act': 'telshow',
+            'id': listing_id,
+            't': 'product',
+            'h': hash_value,
+            'rf': ''
+        }
 
+        response = await self.fetch(
+            'POST',
+            self.ajax_url,
+            data=data,
+            headers={
+                **self.headers,
+                'Accept': 'application/json, text/javascript, */*; q=0.01'
+            },
+            limiter=self.phone_limiter,
+            stage='phone'
+        )
+        if response is None:
+            return None
+        if response.status != 200:
+            raise FetchError('http', f"HTTP {response.status} for phone of {listing_id}", response.status)
+        try:
+            result = response.json()
+        except ValueError:
+            raise FetchError('parse', f"Invalid phone response for {listing_id}")
+        if result.get('ok') == 1:
+            return result.get('tel', '')
         return None
 
-    async def scrape_detail_page(self, url: str) -> Optional[Dict]:
-        """Scrape data from a detail page"""
+    async def scrape_detail_page(self, url: str, slot: Optional[asyncio.Semaphore] = None) -> Optional[Dict]:
+        """Scrape data from a detail page; ``slot`` is given back while retries back off"""
         listing_id = self.extract_listing_id(url)
 
         # Skip if already scraped
@@ -218,180 +512,349 @@ class UstasiScraperV2:
             return None
 
         try:
-            async with self.session.get(url) as response:
-                if response.status != 200:
-                    return None
-
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Find the main content div
-                content_div = soup.find('div', id='openhalf')
-                if not content_div:
-                    return None
-
-                data = {
-                    'url': url,
-                    'listing_id': listing_id
-                }
-
-                # Extract title
-                title_elem = soup.find('h1') or soup.find('title')
-                if title_elem:
-                    data['title'] = title_elem.get_text(strip=True)
-                else:
-                    data['title'] = url.split('/')[-1].replace('.html', '').replace('-', ' ')
-
-                # Extract categories
-                categories = []
-                category_links = content_div.find_all('a', href=re.compile(r'^/[^/]+$'))
-                for link in category_links[:2]:
-                    categories.append(link.get_text(strip=True))
-                data['categories'] = ', '.join(categories) if categories else ''
-
-                # Extract price
-                price_elem = content_div.find('span', class_='pricecolor')
-                data['price'] = price_elem.get_text(strip=True) if price_elem else ''
-
-                # Extract description
-                desc_elem = content_div.find('p', class_='infop100')
-                data['description'] = desc_elem.get_text(strip=True) if desc_elem else ''
-
-                # Extract contact info
-                contact_div = content_div.find('div', class_='infocontact')
-                if contact_div:
-                    user_link = contact_div.find('a', href=re.compile(r'/user/'))
-                    if user_link:
-                        data['user_name'] = user_link.get_text(strip=True).replace('(Bütün Elanları)', '').strip()
-                        data['user_id'] = user_link['href'].split('/')[-1]
-                    else:
-                        data['user_name'] = data['user_id'] = ''
-
-                    lines = list(contact_div.stripped_strings)
-                    location = ''
-                    for line in lines:
-                        if 'şəhəri' in line or 'rayonu' in line:
-                            location = line
-                            break
-                    data['location'] = location
-                else:
-                    data['user_name'] = data['user_id'] = data['location'] = ''
-
-                # Extract date
-                date_elem = content_div.find('span', class_='viewsbb')
-                if date_elem:
-                    date_text = date_elem.get_text(strip=True)
-                    date_match = re.search(r'Tarix:\s*(.+)', date_text)
-                    data['date'] = date_match.group(1) if date_match else date_text
-                else:
-                    data['date'] = ''
-
-                # Fetch phone number via AJAX
-                if listing_id:
-                    hash_value = self.extract_hash_from_html(soup)
-                    if hash_value:
-                        phone = await self.fetch_phone_number(listing_id, hash_value)
-                        data['phone'] = phone if phone else ''
-                    else:
-                        data['phone'] = ''
-                else:
-                    data['phone'] = ''
+            return await self.retries.run('detail', url, lambda: self._scrape_detail_once(url, listing_id, slot), slot)
+        except FetchError as e:
+            print(f"    Failed {url}: {e}")
+            if self.scheduler is not None:
+                self.scheduler.defer(listing_id)
+            return None
+        except Exception as e:
+            print(f"    Error scraping {url}: {e}")
+            return None
 
-                # Mark as scraped
-                if listing_id:
-                    self.scraped_ids.add(listing_id)
+    async def _scrape_detail_once(self, url: str, listing_id: Optional[str],
+                                  slot: Optional[asyncio.Semaphore] = None) -> Optional[Dict]:
+        stored = self.store.get(listing_id) if self.store is not None and listing_id else None
 
-                return data
+        # Conditional request when the server gave us validators last time
+        headers = {}
+        if self.incremental and stored is not None:
+            if stored['etag']:
+                headers['If-None-Match'] = stored['etag']
+            if stored['last_modified']:
+                headers['If-Modified-Since'] = stored['last_modified']
 
+        response = await self.fetch('GET', url, headers=headers or None)
+        if response is None:
+            return None
+
+        if response.status == 304 and stored is not None:
+            record = json.loads(stored['record'])
+            self.store.touch(listing_id, self.snippet_hash(listing_id))
+            self.scheduler.observe(record, changed=False)
+            self.unchanged += 1
+            self.emit_record(record)
+            return record
+
+        if response.status != 200:
+            raise FetchError('http', f"HTTP {response.status}", response.status)
+
+        html = response.text
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        data, hash_value = await self.parse_detail_page(html, url, listing_id)
+        if data is None:
+            raise FetchError('parse', "No listing content on page")
+
+        def complete(phone: Optional[str]):
+            self.complete_record(data, phone, etag, last_modified)
+
+        # Reuse the stored phone if the page is unchanged since last time,
+        # otherwise fetch it via AJAX (in the phone stage when it is running)
+        stored_phone = None
+        if self.incremental and stored is not None and stored['content_hash'] == content_hash(data):
+            stored_phone = json.loads(stored['record']).get('phone')
+
+        if stored_phone or not (listing_id and hash_value):
+            complete(stored_phone)
+        elif self.phones is not None:
+            # Held compactly while it waits for the phone stage
+            pending = Listing(data)
+            await self.phones.submit(
+                listing_id, hash_value, pending.user_id or '',
+                lambda phone: self.complete_record(pending.to_dict(), phone, etag, last_modified)
+            )
+        else:
+            complete(await self.fetch_phone_number(listing_id, hash_value, slot))
+
+        return data
+
+    def complete_record(self, data: Dict, phone: Optional[str],
+                        etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Attach the phone number to a scraped record and persist it"""
+        data['phone'] = phone if phone else ''
+        if self.store is not None and data.get('listing_id'):
+            with self.metrics.timed('checkpoint', 'store'):
+                changed = self.store.upsert(data, self.snippet_hash(data['listing_id']), etag, last_modified)
+                self.scheduler.observe(data, changed)
+        self.emit_record(data)
+
+    def emit_record(self, record: Dict):
+        """Add a finished record to the results and the checkpoint log
+
+        Only then is the listing marked as scraped, so a saved or resumed
+        state never counts a listing whose record was not logged.
+        """
+        self.export(record)
+        with self.metrics.timed('checkpoint', 'append'):
+            self.record_log.append(record)
+        if record.get('listing_id'):
+            self.scraped_ids.add(record['listing_id'])
+
+    def export(self, record: Dict):
+        """Count a record, stream it to the exports and update the chart aggregates and search index"""
+        self.record_count += 1
+        if self.exporter is not None:
+            with self.metrics.timed('checkpoint', 'export'):
+                self.exporter.write(record)
+        if self.aggregates is not None:
+            with self.metrics.timed('checkpoint', 'aggregates'):
+                self.aggregates.upsert(record)
+        if self.search_index is not None:
+            with self.metrics.timed('checkpoint', 'search_index'):
+                self.search_index.upsert(record)
+
+    async def scrape_one(self, url: str, slot: Optional[asyncio.Semaphore] = None) -> Optional[Dict]:
+        """Scrape a single detail page and update the success/failure counters"""
+        try:
+            result = await self.scrape_detail_page(url, slot)
+
+            if result:
+                self.successful += 1
+                return result
+            else:
+                self.failed += 1
+                return None
         except Exception as e:
-            print(f"    Error scraping {url}: {e}")
+            self.failed += 1
+            print(f"    Error: {e}")
             return None
 
-    async def scrape_all_listings(self, urls: List[str], max_concurrent: int = 10):
-        """Scrape all listing detail pages with concurrency control"""
+    def progress_summary(self) -> str:
+        """Counters shown in progress output"""
+        summary = f"Success: {self.successful} | Failed: {self.failed} | Retries: {self.retries.retries}"
+        if self.incremental:
+            summary += f" | Unchanged: {self.unchanged}"
+        if self.phones is not None and self.reuse_user_phones:
+            summary += f" | Phones reused: {self.phones.cache_hits}"
+        if not self.replay:
+            summary += f" | Window: {self.limiter.window}"
+        return summary
+
+    def record_result(self, result: Optional[Dict], total: Optional[int] = None):
+        """Count a finished detail result and report progress
+
+        Records themselves are emitted once their phone number is known.
+        """
+        self.completed += 1
+        self.metrics.sample_queues()
+        if self.completed % 50 == 0 or self.completed == total:
+            print(f"Progress: {self.completed}/{total if total is not None else len(self.seen_urls)} "
+                  f"| {self.progress_summary()}")
+            # Save intermediate progress
+            self.save_intermediate_results()
+            self.write_metrics_file()
+
+    async def start_phone_stage(self):
+        """Start the phone worker pool if enabled"""
+        if self.phone_workers > 0 and self.phones is None:
+            self.phones = PhoneResolver(
+                self.fetch_phone_number,
+                num_workers=self.phone_workers,
+                reuse_user_phones=self.reuse_user_phones,
+                lookup_stored=self.store.user_phone if self.store is not None else None
+            )
+            self.phones.start()
+            self.metrics.track_queue('phone', self.phones.queue.qsize)
+
+    async def drain_phone_stage(self):
+        """Wait for queued phone lookups to finish"""
+        if self.phones is not None:
+            await self.phones.join()
+
+    async def stop_phone_stage(self):
+        """Stop the phone worker pool"""
+        if self.phones is not None:
+            await self.phones.close()
+            self.phones = None
+            self.metrics.untrack_queue('phone')
+
+    async def scrape_all_listings(self, urls: List[str], max_concurrent: Optional[int] = None):
+        """Scrape all listing detail pages with concurrency control
+
+        Requests in flight are governed by the adaptive limiter; the
+        semaphore only caps how many listings are being worked on at once,
+        and a listing waiting to retry does not count.
+        """
+        max_concurrent = max_concurrent or self.limiter.max_limit
         total = len(urls)
-        print(f"\nScraping {total} listings (max {max_concurrent} concurrent)...")
+        print(f"\nScraping {total} listings (adaptive window, max {max_concurrent} concurrent)...")
 
         semaphore = asyncio.Semaphore(max_concurrent)
-        successful = 0
-        failed = 0
 
-        async def scrape_with_semaphore(url, index):
-            nonlocal successful, failed
+        async def scrape_with_semaphore(url):
             async with semaphore:
-                try:
-                    result = await asyncio.wait_for(
-                        self.scrape_detail_page(url),
-                        timeout=30
-                    )
-                    await asyncio.sleep(0.1)  # Small delay
-
-                    if result:
-                        successful += 1
-                        return result
-                    else:
-                        failed += 1
-                        return None
-                except asyncio.TimeoutError:
-                    failed += 1
-                    print(f"    Timeout: {url}")
-                    return None
-                except Exception as e:
-                    failed += 1
-                    print(f"    Error: {e}")
-                    return None
+                return await self.scrape_one(url, semaphore)
 
         # Create tasks
-        tasks = [scrape_with_semaphore(url, i) for i, url in enumerate(urls)]
+        tasks = [scrape_with_semaphore(url) for url in urls]
 
         # Process with progress
-        completed = 0
         for coro in asyncio.as_completed(tasks):
-            result = await coro
-            if result:
-                self.listings.append(result)
+            self.record_result(await coro, total)
 
-            completed += 1
-            if completed % 50 == 0 or completed == total:
-                print(f"Progress: {completed}/{total} | Success: {successful} | Failed: {failed}")
-                # Save intermediate progress
-                self.save_intermediate_results()
+        await self.drain_phone_stage()
 
-        print(f"\nCompleted! Success: {successful} | Failed: {failed}")
+        print(f"\nCompleted! {self.progress_summary()}")
 
-    def save_intermediate_results(self):
-        """Save intermediate results during scraping"""
-        if self.listings:
+    async def scrape_listing_stream(self, url_queue: asyncio.Queue, num_workers: int = 10):
+        """Scrape detail pages from a queue, ``num_workers`` at a time
+
+        A URL is only taken off the queue once a slot is free, and a listing
+        waiting to retry gives its slot back meanwhile. Stops at a ``None``
+        sentinel, which the producer puts once it is done.
+        """
+        print(f"Streaming detail pages ({num_workers} workers)...")
+
+        slots = asyncio.Semaphore(num_workers)
+        tasks: Set[asyncio.Task] = set()
+
+        async def scrape(url: str):
             try:
-                with open('ustasi_listings_temp.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.listings, f, ensure_ascii=False, indent=2)
-            except Exception:
-                pass  # Silent fail
-
-    def save_to_json(self, filename: str = 'ustasi_listings.json'):
-        """Save listings to JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.listings, f, ensure_ascii=False, indent=2)
-        print(f"Saved {len(self.listings)} listings to {filename}")
-
-    def save_to_csv(self, filename: str = 'ustasi_listings.csv'):
-        """Save listings to CSV file"""
-        if not self.listings:
-            print("No listings to save")
-            return
+                self.record_result(await self.scrape_one(url, slots))
+            finally:
+                slots.release()
 
-        fieldnames = ['listing_id', 'title', 'categories', 'price', 'phone',
-                     'user_name', 'user_id', 'location', 'date', 'description', 'url']
+        try:
+            while True:
+                await slots.acquire()
+                url = await url_queue.get()
+                url_queue.task_done()
+                if url is None:
+                    break
+                task = asyncio.create_task(scrape(url))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        await self.drain_phone_stage()
+
+        print(f"\nCompleted! {self.progress_summary()}")
+
+    async def run_recrawl(self):
+        """Spend ``recrawl_budget`` requests on new listings, then on the most urgent due ones
+
+        List pages are read from the front, where new listings appear,
+        until a page has no listing the scheduler does not know yet. The
+        rest of the budget goes to detail pages: new listings first, then
+        stored listings in the scheduler's priority order. Phone lookups of
+        changed listings come on top of the budget.
+        """
+        budget = self.recrawl_budget
+        due_now, tracked = self.scheduler.counts()
+        print(f"Recrawl budget {budget} requests; {due_now} of {tracked} tracked listings are due")
+
+        new_urls: List[str] = []
+        page = 0
+        while page < self.max_pages and budget > 0:
+            html = await self.fetch_listings_page(page)
+            budget -= 1
+            page += 1
+            if not html:
+                break
+            urls = [url for url in await self.parse_listing_page(html) if url not in self.seen_urls]
+            self.seen_urls.update(urls)
+            fresh = [url for url in urls if not self.scheduler.known(self.extract_listing_id(url))]
+            new_urls.extend(fresh)
+            if not fresh:
+                break
+
+        new_urls = new_urls[:budget]
+        budget -= len(new_urls)
+        due = [url for _, url in self.scheduler.due(budget)]
+        print(f"Read {page} list pages: {len(new_urls)} new listings, recrawling {len(due)} due ones")
+        await self.scrape_all_listings(new_urls + due)
+
+    async def run_stream(self, urls: Optional[List[str]] = None,
+                         max_concurrent: Optional[int] = None) -> List[str]:
+        """Run discovery and detail scraping concurrently through a bounded queue
+
+        If ``urls`` is given (resumed progress) they are fed to the workers
+        instead of running discovery. Returns the list of discovered URLs.
+        """
+        max_concurrent = max_concurrent or self.limiter.max_limit
+        url_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.metrics.track_queue('detail', url_queue.qsize)
+
+        async def produce() -> List[str]:
+            try:
+                if urls is not None:
+                    for url in self.pending_urls(urls):
+                        await url_queue.put(url)
+                    return urls
+                found = await self.fetch_all_listing_urls(url_queue)
+                if found:
+                    # Lets a restart skip discovery while detail workers finish
+                    self.save_progress(found, 'urls_collected')
+                return found
+            finally:
+                await url_queue.put(None)
 
-        with open(filename, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
+        try:
+            found, _ = await asyncio.gather(
+                produce(),
+                self.scrape_listing_stream(url_queue, num_workers=max_concurrent)
+            )
+        finally:
+            self.metrics.untrack_queue('detail')
+        return found
 
-            for listing in self.listings:
-                row = {field: listing.get(field, '') for field in fieldnames}
-                writer.writerow(row)
+    def save_intermediate_results(self):
+        """Flush buffered records to the checkpoint log"""
+        try:
+            with self.metrics.timed('checkpoint', 'flush'):
+                self.record_log.flush()
+                if self.store is not None:
+                    self.store.commit()
+                if self.aggregates is not None:
+                    self.aggregates.commit()
+                if self.search_index is not None:
+                    self.search_index.commit()
+        except Exception as e:
+            print(f"Warning: Could not write checkpoint: {e}")
 
-        print(f"Saved {len(self.listings)} listings to {filename}")
+    def write_metrics_file(self):
+        """Refresh the Prometheus textfile, if one is configured"""
+        if self.metrics_file is None:
+            return
+        try:
+            self.metrics.write_textfile(self.metrics_file)
+        except Exception as e:
+            print(f"Warning: Could not write metrics file: {e}")
+
+    def new_exporter(self) -> ListingExporter:
+        return ListingExporter(compression=self.export_compression, max_bytes=self.export_max_bytes,
+                               parquet_file=self.parquet_file)
+
+    def save_exports(self, json_file: Optional[str] = None, csv_file: Optional[str] = None,
+                     parquet_file: Optional[str] = None):
+        """Commit the JSON, CSV and Parquet exports, optionally under other names
+
+        The streamed files are renamed into place. With a store, the whole
+        store is streamed out instead, so earlier runs' listings are kept.
+        """
+        if self.store is not None:
+            self.store.commit()
+            exporter = self.new_exporter()
+            exporter.write_all(self.store.iter_records())
+        else:
+            exporter, self.exporter = self.exporter, None
+        if exporter is not None:
+            with self.metrics.timed('checkpoint', 'export'):
+                exporter.commit(json_file, csv_file, parquet_file)
 
     async def run(self):
         """Main scraping workflow"""
@@ -399,66 +862,257 @@ class UstasiScraperV2:
 
         try:
             await self.create_session()
+            if self.metrics_server is not None:
+                await self.metrics_server.start()
+            self.start_parse_pool()
+            await self.start_phone_stage()
 
             # Check for existing progress
             progress = self.load_progress()
+            urls = None
+
+            recovered = self.load_checkpoint()
+            if recovered:
+                print(f"Recovered {recovered} scraped listings from checkpoint")
 
             if progress and progress.get('stage') == 'urls_collected':
                 print("Found saved progress! Resuming...")
                 urls = progress['urls']
-            else:
-                # Step 1: Fetch all listing URLs
-                urls = await self.fetch_all_listing_urls()
 
-                if not urls:
+            if self.recrawl_budget is not None:
+                # Steps 1+2 within the request budget, chosen by the scheduler
+                await self.run_recrawl()
+            elif self.stream:
+                # Steps 1+2 overlapped: discovery feeds the detail workers
+                found = await self.run_stream(urls)
+                if not found:
                     print("No listings found!")
                     return
+            else:
+                if urls is None:
+                    # Step 1: Fetch all listing URLs
+                    urls = await self.fetch_all_listing_urls()
+
+                    if not urls:
+                        print("No listings found!")
+                        return
 
-                # Save progress
-                self.save_progress(urls, 'urls_collected')
+                    # Save progress
+                    self.save_progress(urls, 'urls_collected')
 
-            # Step 2: Scrape all detail pages
-            await self.scrape_all_listings(urls, max_concurrent=10)
+                # Step 2: Scrape all detail pages (skipping checkpointed ones)
+                await self.scrape_all_listings(self.pending_urls(urls))
 
             # Step 3: Save final results
-            self.save_to_json()
-            self.save_to_csv()
+            self.save_exports()
 
             # Clean up temp files
             try:
-                Path('ustasi_listings_temp.json').unlink(missing_ok=True)
+                self.record_log.remove()
                 self.progress_file.unlink(missing_ok=True)
             except:
                 pass
 
         except KeyboardInterrupt:
             print("\n\nInterrupted by user!")
-            print(f"Scraped {len(self.listings)} listings so far")
-            if self.listings:
-                self.save_to_json('ustasi_listings_partial.json')
-                self.save_to_csv('ustasi_listings_partial.csv')
+            print(f"Scraped {self.record_count} listings so far")
+            if self.record_count:
+                self.save_exports('ustasi_listings_partial.json', 'ustasi_listings_partial.csv',
+                                  'ustasi_listings_partial.parquet')
                 print("Saved partial results")
         except Exception as e:
             print(f"\nError: {e}")
-            if self.listings:
-                self.save_to_json('ustasi_listings_partial.json')
-                self.save_to_csv('ustasi_listings_partial.csv')
+            if self.record_count:
+                self.save_exports('ustasi_listings_partial.json', 'ustasi_listings_partial.csv',
+                                  'ustasi_listings_partial.parquet')
                 print("Saved partial results")
         finally:
+            await self.stop_phone_stage()
+            if self.exporter is not None:
+                self.exporter.abort()  # Nothing was saved; the checkpoint log has the records
+            self.retries.write_dead_letters()
+            self.record_log.close()
+            if self.store is not None:
+                self.store.close()
+            if self.aggregates is not None:
+                self.aggregates.close()
+            if self.search_index is not None:
+                self.search_index.close()
+            self.seen_urls.close()
+            self.scraped_ids.close()
             await self.close_session()
+            self.stop_parse_pool()
+            self.write_metrics_file()
+            if self.metrics_summary:
+                self.metrics.write_summary(self.metrics_summary)
+            if self.metrics_server is not None:
+                await self.metrics_server.stop()
 
         elapsed = time.time() - start_time
         print(f"\nTotal time: {elapsed:.2f} seconds ({elapsed/60:.1f} minutes)")
-        print(f"Total listings scraped: {len(self.listings)}")
-
-
-async def main():
+        print(f"Total listings scraped: {self.record_count}")
+        if self.cache is not None:
+            print(f"Response cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        print(self.time_breakdown())
+        if self.profile_steps:
+            print(self.step_report())
+
+    def time_breakdown(self) -> str:
+        """One-line view of where the run spent its time"""
+        summary = self.metrics.summary()
+        parts = []
+        for stage in ('list', 'detail', 'phone'):
+            latency = summary['stages'].get(stage, {}).get('latency')
+            if latency:
+                parts.append(f"{stage} {latency['count']} req, p50 {latency['p50_ms']:.0f} ms, "
+                             f"avg in flight {summary['stages'][stage]['avg_in_flight']:.2f}")
+        for stage in ('parse', 'checkpoint'):
+            if stage in summary['stages']:
+                parts.append(f"{stage} {summary['stages'][stage]['busy_seconds']:.2f}s")
+        for name, depth in summary['peak_queue_depth'].items():
+            parts.append(f"peak {name} queue {depth}")
+        return "Time breakdown: " + ("; ".join(parts) if parts else "no requests made")
+
+    def step_report(self) -> str:
+        """Mean time of each detail-page extraction step, slowest first"""
+        steps = [(operation, hist) for (stage, operation), hist in self.metrics.durations.items()
+                 if stage == 'parse_steps']
+        if not steps:
+            return "No detail pages were step-timed"
+        total = sum(hist.sum / hist.count for _, hist in steps)
+        lines = [f"Extraction steps ({self.parser.name}, {steps[0][1].count} pages sampled):"]
+        for operation, hist in sorted(steps, key=lambda item: item[1].sum / item[1].count, reverse=True):
+            mean = hist.sum / hist.count
+            lines.append(f"  {operation:<12} {mean * 1000:8.3f} ms  {mean / total:6.1%}")
+        return "\n".join(lines)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Scrape service listings from ustasi.az')
+    parser.add_argument('--max-pages', type=int, default=100,
+                        help='Maximum number of list pages to fetch (default: 100)')
+    parser.add_argument('--page-window', type=int, default=5,
+                        help='List pages fetched concurrently; 1 is sequential (default: 5)')
+    parser.add_argument('--no-stream', action='store_true',
+                        help='Collect all listing URLs before scraping detail pages')
+    parser.add_argument('--parser', default='lxml', choices=sorted(PARSERS),
+                        help="HTML parser backend; 'soup' is the BeautifulSoup reference (default: lxml)")
+    parser.add_argument('--no-parse-processes', action='store_true',
+                        help='Parse pages in the event loop instead of a process pool')
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help='Parse worker processes (default: number of cores)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Keep a listing store and only re-scrape listings that changed')
+    parser.add_argument('--store', default=None, metavar='DB',
+                        help='Listing store database (default: ustasi_listings.db with --incremental '
+                             'or --recrawl, none otherwise)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Cache HTTP responses in this directory')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help='Seconds before a cached response is refetched (default: never)')
+    parser.add_argument('--list-cache-ttl', type=float, default=600.0,
+                        help='Seconds before a cached list page is refetched; --replay still '
+                             'serves it (default: 600)')
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                        help='Upper bound of the adaptive in-flight request window (default: 16)')
+    parser.add_argument('--max-rps', type=float, default=25.0,
+                        help='Requests-per-second ceiling; 0 disables it (default: 25)')
+    parser.add_argument('--phone-workers', type=int, default=4,
+                        help='Workers resolving phone numbers; 0 resolves them inline (default: 4)')
+    parser.add_argument('--reuse-user-phones', action='store_true',
+                        help="Reuse a user's already resolved phone instead of another AJAX call")
+    parser.add_argument('--transport', default='tuned', choices=sorted(TRANSPORTS),
+                        help='Connection pool and timeout preset (default: tuned)')
+    parser.add_argument('--uvloop', action='store_true',
+                        help='Run on the uvloop event loop if it is installed')
+    parser.add_argument('--compress', default=None, choices=[name for name in COMPRESSIONS if name],
+                        help='Compress the JSON and CSV exports')
+    parser.add_argument('--rotate-mb', type=float, default=None,
+                        help='Split the exports into numbered parts of about this many MB')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Also write a typed ustasi_listings.parquet export (needs pyarrow)')
+    parser.add_argument('--aggregates-db', default='ustasi_aggregates.db',
+                        help="Chart counts updated as listings are scraped; '' disables it "
+                             "(default: ustasi_aggregates.db)")
+    parser.add_argument('--recrawl', type=int, default=None, metavar='BUDGET',
+                        help='Recrawl within a budget of list and detail page requests: new listings '
+                             'first, then the stored ones most likely to have changed (keeps ustasi_listings.db)')
+    parser.add_argument('--search-index', nargs='?', const='ustasi_search.db', default=None, metavar='DB',
+                        help='Keep a full-text search index of the listings up to date while scraping '
+                             '(default DB: ustasi_search.db); query it with search_index.py')
+    parser.add_argument('--dedupe', default='memory', choices=sorted(DEDUPE_BACKENDS),
+                        help='Seen/scraped listing tracking: exact in-memory bitmap, scalable Bloom '
+                             'filter or exact SQLite table on disk (default: memory)')
+    parser.add_argument('--dedupe-error-rate', type=float, default=0.001,
+                        help='False positive rate of the bloom backend; a false positive skips '
+                             'a listing (default: 0.001)')
+    parser.add_argument('--replay', action='store_true',
+                        help='Run the whole pipeline from the response cache without network access')
+    parser.add_argument('--metrics-file', default=None,
+                        help='Write Prometheus metrics to this textfile during the run')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on this local port')
+    parser.add_argument('--metrics-summary', default='ustasi_metrics.json',
+                        help="JSON summary of the run's metrics written at the end; '' disables it "
+                             "(default: ustasi_metrics.json)")
+    parser.add_argument('--profile', nargs='?', const='ustasi_scraper_profile', default=None,
+                        metavar='PREFIX',
+                        help='Write a CPU profile (PREFIX.pstats) and wall-clock stack samples '
+                             '(PREFIX.collapsed); parse worker processes are not included')
+    parser.add_argument('--profile-steps', type=float, default=0.0, metavar='FRACTION',
+                        help='Time each extraction step on this fraction of detail pages')
+    return parser.parse_args(argv)
+
+
+async def main(args: Optional[argparse.Namespace] = None):
+    args = args or parse_args()
     # You can adjust max_pages here
     # Recommended: 100-200 pages for full dataset
     # The scraper will stop automatically if no new listings are found
-    scraper = UstasiScraperV2(max_pages=100)  # Limit to 100 pages (adjust as needed)
-    await scraper.run()
+    # --page-window sets how many list pages are fetched concurrently (1 = sequential)
+    # streaming scrapes detail pages while discovery is still running (--no-stream disables it)
+    # --parser lxml uses the fast backend, soup the BeautifulSoup reference
+    # pages are parsed in a process pool (--parse-workers, default = cores) unless
+    # --no-parse-processes is given
+    # --incremental keeps ustasi_listings.db (or --store DB) and only re-scrapes changed listings
+    # --cache-dir stores responses on disk, --replay re-runs from them offline;
+    # cached list pages are refetched after --list-cache-ttl seconds
+    # --max-concurrency / --max-rps bound the adaptive request window
+    # --transport picks the connection pool preset, --uvloop the faster event loop
+    # --metrics-file / --metrics-port export per-stage metrics; a JSON summary
+    # is written to ustasi_metrics.json (--metrics-summary) at the end of the run
+    # --profile writes pstats + collapsed stacks, --profile-steps times parse steps
+    # --compress gzip|zstd and --rotate-mb shape the streamed JSON/CSV exports
+    # --dedupe memory|bloom|sqlite picks how seen and scraped listings are tracked
+    # --search-index maintains ustasi_search.db for search_index.py queries
+    # --recrawl BUDGET refreshes new and due listings instead of a full crawl
+    scraper = UstasiScraperV2(max_pages=args.max_pages, page_window=args.page_window,
+                             stream=not args.no_stream, parser=args.parser,
+                             parse_in_processes=not args.no_parse_processes,
+                             parse_workers=args.parse_workers,
+                             store_path=args.store, incremental=args.incremental,
+                             cache_dir=args.cache_dir, cache_ttl=args.cache_ttl,
+                             list_cache_ttl=args.list_cache_ttl,
+                             replay=args.replay, max_concurrency=args.max_concurrency,
+                             max_rps=args.max_rps or None, phone_workers=args.phone_workers,
+                             reuse_user_phones=args.reuse_user_phones,
+                             metrics_file=args.metrics_file, metrics_port=args.metrics_port,
+                             metrics_summary=args.metrics_summary or None,
+                             profile_steps=args.profile_steps, transport=args.transport,
+                             export_compression=args.compress, parquet=args.parquet,
+                             aggregates_path=args.aggregates_db or None,
+                             dedupe=args.dedupe, dedupe_error_rate=args.dedupe_error_rate,
+                             search_index_path=args.search_index, recrawl_budget=args.recrawl,
+                             export_max_bytes=int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None)
+    if args.profile:
+        with Profiler(args.profile):
+            await scraper.run()
+    else:
+        await scraper.run()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    cli_args = parse_args()
+    if cli_args.uvloop:
+        use_uvloop()
+    asyncio.run(main(cli_args))
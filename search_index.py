@@ -0,0 +1,301 @@
+"""
+Local full-text search over scraped listings.
+
+``SearchIndex`` keeps a SQLite FTS5 index of the listings' title,
+description, categories and location, ranked with BM25 (title and
+categories weigh more than the description). Text is folded before it
+is indexed and before it is queried. Azerbaijani letters fold to ASCII
+(ə/e, ı/i, ş/s, ç/c, ğ/g, ö/o, ü/u), and Cyrillic is transliterated the
+way Azerbaijani writes Russian words, so "remont" finds "ремонт" and
+"baki" finds "Bakı".
+
+The folded text is stored once, in the ``documents`` table the index is
+built over (an external-content FTS5 table). Raw descriptions stay in
+the exports. Listings are upserted one at a time, either by the scraper
+as they are scraped (``--search-index``) or from an export with
+``python search_index.py index``. Queries can be filtered by category,
+location and posting date, and the database is memory-mapped for
+reading.
+
+Usage:
+    python search_index.py index ustasi_listings.json
+    python search_index.py query "kondisioner temiri" --location baki --since 2025-10-01
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from columnar import parse_date, split_categories
+
+# Azerbaijani letters, then Cyrillic as Azerbaijani spells Russian words
+FOLD = str.maketrans({
+    'ə': 'e', 'ı': 'i', 'ş': 's', 'ç': 'c', 'ğ': 'g', 'ö': 'o', 'ü': 'u',
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 's',
+    'ч': 'c', 'ш': 's', 'щ': 's', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'ә': 'e', 'ғ': 'g', 'ҝ': 'g', 'һ': 'h', 'ҳ': 'h', 'ј': 'y', 'ө': 'o',
+    'ү': 'u', 'ҹ': 'c',
+})
+QUERY_TERM_RE = re.compile(r'(\w+)(\*?)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    listing_id TEXT NOT NULL UNIQUE,
+    url TEXT,
+    raw_title TEXT,
+    raw_location TEXT,
+    price TEXT,
+    day TEXT,
+    location_key TEXT,
+    title TEXT,
+    description TEXT,
+    categories TEXT,
+    location TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_location ON documents (location_key);
+CREATE INDEX IF NOT EXISTS documents_day ON documents (day);
+CREATE TABLE IF NOT EXISTS document_categories (
+    category TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (category, id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    title, description, categories, location,
+    content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+INDEXED = ('title', 'description', 'categories', 'location')
+# BM25 weights of the indexed columns, in INDEXED order
+WEIGHTS = (3.0, 1.0, 2.0, 1.0)
+
+
+def fold(text: Optional[str]) -> str:
+    """Lowercased text with Azerbaijani letters folded and Cyrillic transliterated"""
+    # 'İ'.lower() is 'i' plus a combining dot, which NFKD would leave behind
+    text = (text or '').replace('İ', 'i').replace('I', 'i').lower().translate(FOLD)
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def match_expression(query: str) -> str:
+    """FTS5 query matching every term of ``query``; a trailing ``*`` matches a prefix"""
+    terms = [f'"{term}"{star}' for term, star in QUERY_TERM_RE.findall(fold(query))]
+    if not terms:
+        raise ValueError("The query has no searchable terms")
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """Full-text index of listings in SQLite, upserted one listing at a time"""
+
+    def __init__(self, path: Union[str, Path] = 'ustasi_search.db', commit_every: int = 200,
+                 mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.commit_every = max(1, commit_every)
+        self._pending_writes = 0
+        self.conn = sqlite3.connect(str(self.path), timeout=30.0)
+        self.conn.execute('PRAGMA journal_mode=WAL')  # Queries run while a crawl adds listings
+        self.conn.execute(f'PRAGMA mmap_size={int(mmap_bytes)}')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def upsert(self, record: Dict) -> bool:
+        """Index a listing, replacing its previous version; returns False if it is unchanged"""
+        listing_id = record.get('listing_id')
+        if not listing_id:
+            return False
+        categories = split_categories(record.get('categories'))
+        day, _ = parse_date(record.get('date'))
+        document = {
+            'listing_id': listing_id,
+            'url': record.get('url'),
+            'raw_title': record.get('title'),
+            'raw_location': record.get('location'),
+            'price': record.get('price'),
+            'day': day.isoformat() if day else None,
+            'location_key': fold(record.get('location')) or None,
+            'title': fold(record.get('title')),
+            'description': fold(record.get('description')),
+            'categories': fold(', '.join(categories)),
+            'location': fold(record.get('location')),
+        }
+        columns = list(document)
+        row = self.conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM documents WHERE listing_id = ?", (listing_id,)
+        ).fetchone()
+        if row is not None and list(row[1:]) == list(document.values()):
+            return False
+
+        if row is not None:
+            doc_id = row[0]
+            old = dict(zip(columns, row[1:]))
+            # External-content tables are told which old values to drop from the index
+            self.conn.execute(
+                f"INSERT INTO search (search, rowid, {', '.join(INDEXED)}) VALUES ('delete', ?, ?, ?, ?, ?)",
+                (doc_id, *(old[column] for column in INDEXED))
+            )
+            self.conn.execute(
+                f"UPDATE documents SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                (*document.values(), doc_id)
+            )
+            self.conn.execute('DELETE FROM document_categories WHERE id = ?', (doc_id,))
+        else:
+            doc_id = self.conn.execute(
+                f"INSERT INTO documents ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                tuple(document.values())
+            ).lastrowid
+        self.conn.execute(
+            f"INSERT INTO search (rowid, {', '.join(INDEXED)}) VALUES (?, ?, ?, ?, ?)",
+            (doc_id, *(document[column] for column in INDEXED))
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO document_categories (category, id) VALUES (?, ?)',
+            [(fold(category), doc_id) for category in categories]
+        )
+        self._written()
+        return True
+
+    def _written(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Commit pending writes"""
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def optimize(self):
+        """Merge the index into one segment, after a bulk load"""
+        self.conn.execute("INSERT INTO search (search) VALUES ('optimize')")
+        self.commit()
+
+    def search(self, query: str, category: Optional[str] = None, location: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Best BM25 matches of ``query``, optionally filtered
+
+        ``category`` and ``location`` are matched after folding, so 'Bakı
+        şəhəri' and 'baki seheri' are the same; ``since`` and ``until`` are
+        inclusive ISO dates.
+        """
+        filters = []
+        params: List = []
+        if category:
+            filters.append('d.id IN (SELECT id FROM document_categories WHERE category = ?)')
+            params.append(fold(category))
+        if location:
+            filters.append('d.location_key = ?')
+            params.append(fold(location))
+        if since:
+            filters.append('d.day >= ?')
+            params.append(since)
+        if until:
+            filters.append('d.day <= ?')
+            params.append(until)
+        bm25 = f"bm25(search, {', '.join(map(str, WEIGHTS))})"
+        columns = 'd.listing_id, d.raw_title, d.url, d.raw_location, d.price, d.day'
+        if filters:
+            sql = (f"SELECT {columns}, {bm25} AS rank FROM search JOIN documents d ON d.id = search.rowid "
+                   f"WHERE search MATCH ? AND {' AND '.join(filters)} ORDER BY rank LIMIT ?")
+        else:
+            # Rank inside the index and join only the best matches to their documents
+            sql = (f"SELECT {columns}, best.rank FROM (SELECT rowid, {bm25} AS rank FROM search "
+                   f"WHERE search MATCH ? ORDER BY rank LIMIT ?) AS best "
+                   f"JOIN documents d ON d.id = best.rowid ORDER BY best.rank")
+        rows = self.conn.execute(sql, (match_expression(query), *params, limit) if filters
+                                 else (match_expression(query), limit)).fetchall()
+        return [{'listing_id': listing_id, 'title': title, 'url': url, 'location': location,
+                 'price': price, 'date': day, 'score': -rank}
+                for listing_id, title, url, location, price, day, rank in rows]
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def close(self):
+        """Commit and close the database"""
+        self.commit()
+        self.conn.close()
+
+
+def read_records(path: Union[str, Path]) -> Iterator[Dict]:
+    """Records of a JSON export or a JSONL record log"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def index_file(source: str = 'ustasi_listings.json', path: str = 'ustasi_search.db') -> int:
+    """Upsert every listing of an export into the index; returns how many changed"""
+    start = time.time()
+    index = SearchIndex(path)
+    changed = seen = 0
+    try:
+        for record in read_records(source):
+            seen += 1
+            changed += index.upsert(record)
+        if changed:
+            index.optimize()
+        print(f"Indexed {changed} new or changed of {seen} listings from {source} "
+              f"({len(index)} in {path}, {time.time() - start:.1f}s)")
+    finally:
+        index.close()
+    return changed
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Full-text search over the scraped ustasi.az listings')
+    parser.add_argument('--db', default='ustasi_search.db', help='Index database (default: ustasi_search.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index = commands.add_parser('index', help='Add or update the listings of an export')
+    index.add_argument('source', nargs='?', default='ustasi_listings.json',
+                       help='JSON export or JSONL record log (default: ustasi_listings.json)')
+
+    query = commands.add_parser('query', help='Search the index')
+    query.add_argument('text', help='Words that must all match; end a word with * to match a prefix')
+    query.add_argument('--category', default=None, help='Only listings in this category')
+    query.add_argument('--location', default=None, help='Only listings in this location')
+    query.add_argument('--since', default=None, help='Posted on or after this date (YYYY-MM-DD)')
+    query.add_argument('--until', default=None, help='Posted on or before this date (YYYY-MM-DD)')
+    query.add_argument('--limit', type=int, default=20, help='Results to show (default: 20)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'index':
+        index_file(args.source, args.db)
+        return
+
+    index = SearchIndex(args.db)
+    try:
+        start = time.perf_counter()
+        try:
+            results = index.search(args.text, args.category, args.location, args.since, args.until, args.limit)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        elapsed = (time.perf_counter() - start) * 1000
+        for result in results:
+            print(f"{result['score']:7.2f}  {result['listing_id']}  {result['title']}")
+            print(f"         {result['location'] or '-'}, {result['date'] or '-'}, "
+                  f"{result['price'] or 'no price'}  {result['url']}")
+        print(f"{len(results)} results in {elapsed:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Persistent SQLite store of scraped listings.
+
+Keeps the last-seen record for every ``listing_id`` together with a hash
+of its page content, a hash of its list-page snippet, the HTTP validators
+(ETag / Last-Modified) of the detail page and fetch timestamps. Incremental
+recrawls use it to skip unchanged listings.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT PRIMARY KEY,
+    url TEXT,
+    record TEXT NOT NULL,
+    content_hash TEXT,
+    snippet_hash TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    first_seen REAL,
+    last_fetched REAL,
+    last_changed REAL
+);
+CREATE TABLE IF NOT EXISTS user_phones (
+    user_id TEXT PRIMARY KEY,
+    phone TEXT NOT NULL,
+    updated REAL
+);
+"""
+
+
+def text_hash(text: str) -> str:
+    """Short stable hash of a text value"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def content_hash(record: Dict) -> str:
+    """Hash of the fields that come from the detail page itself
+
+    The phone number is excluded because it comes from a separate AJAX
+    call, so an unchanged hash means the stored phone can be reused.
+    """
+    content = {key: value for key, value in record.items() if key != 'phone'}
+    return text_hash(json.dumps(content, ensure_ascii=False, sort_keys=True))
+
+
+class ListingStore:
+    """SQLite-backed store of listings keyed by listing_id"""
+
+    def __init__(self, path: Union[str, Path] = 'ustasi_listings.db', commit_every: int = 50):
+        self.path = Path(path)
+        self.commit_every = max(1, commit_every)
+        self._pending_writes = 0
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def get(self, listing_id: str) -> Optional[sqlite3.Row]:
+        """Stored row for a listing, or None"""
+        return self.conn.execute(
+            'SELECT * FROM listings WHERE listing_id = ?', (listing_id,)
+        ).fetchone()
+
+    def get_record(self, listing_id: str) -> Optional[Dict]:
+        """Stored record for a listing, or None"""
+        row = self.get(listing_id)
+        return json.loads(row['record']) if row else None
+
+    def upsert(self, record: Dict, snippet_hash: Optional[str] = None,
+               etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+        """Insert or update a freshly fetched record; returns True if its content changed"""
+        listing_id = record['listing_id']
+        now = time.time()
+        new_hash = content_hash(record)
+        row = self.get(listing_id)
+
+        if row is None:
+            self.conn.execute(
+                'INSERT INTO listings (listing_id, url, record, content_hash, snippet_hash, etag, '
+                'last_modified, first_seen, last_fetched, last_changed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (listing_id, record.get('url'), json.dumps(record, ensure_ascii=False), new_hash,
+                 snippet_hash, etag, last_modified, now, now, now)
+            )
+            changed = True
+        else:
+            changed = row['content_hash'] != new_hash or json.loads(row['record']) != record
+            self.conn.execute(
+                'UPDATE listings SET url = ?, record = ?, content_hash = ?, '
+                'snippet_hash = COALESCE(?, snippet_hash), etag = ?, last_modified = ?, '
+                'last_fetched = ?, last_changed = ? WHERE listing_id = ?',
+                (record.get('url'), json.dumps(record, ensure_ascii=False), new_hash, snippet_hash,
+                 etag, last_modified, now, now if changed else row['last_changed'], listing_id)
+            )
+
+        if record.get('user_id') and record.get('phone'):
+            self.conn.execute(
+                'INSERT OR REPLACE INTO user_phones (user_id, phone, updated) VALUES (?, ?, ?)',
+                (record['user_id'], record['phone'], now)
+            )
+
+        self._written()
+        return changed
+
+    def user_phone(self, user_id: str) -> Optional[str]:
+        """Last phone number seen for a user, or None"""
+        row = self.conn.execute(
+            'SELECT phone FROM user_phones WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        return row['phone'] if row else None
+
+    def touch(self, listing_id: str, snippet_hash: Optional[str] = None):
+        """Record that a listing was seen unchanged"""
+        self.conn.execute(
+            'UPDATE listings SET last_fetched = ?, snippet_hash = COALESCE(?, snippet_hash) '
+            'WHERE listing_id = ?',
+            (time.time(), snippet_hash, listing_id)
+        )
+        self._written()
+
+    def _written(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Commit pending writes"""
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def count(self) -> int:
+        """Number of stored listings"""
+        return self.conn.execute('SELECT COUNT(*) FROM listings').fetchone()[0]
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield stored records in first-seen order"""
+        for row in self.conn.execute('SELECT record FROM listings ORDER BY first_seen, rowid'):
+            yield json.loads(row['record'])
+
+    def close(self):
+        """Commit and close the database"""
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,84 @@
+"""AggregateStore upserts are idempotent and match a full recount"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from aggregate_store import AggregateStore, listing_facts, load_chart_aggregates
+from aggregates import compute_aggregates
+from generate_charts import load_listings
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def listing(listing_id='1', **fields):
+    return {'listing_id': listing_id, 'categories': 'Təmir, Santexnik', 'location': 'Bakı',
+            'price': '50 Azn', 'user_name': 'Usta', 'date': '28.10.2025', **fields}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AggregateStore(tmp_path / 'aggregates.db')
+    yield store
+    store.close()
+
+
+def test_facts_of_a_listing():
+    facts = listing_facts(listing(price='', user_name='', date='28.10.2025 08:34'))
+    assert facts['category'] == ['Təmir', 'Santexnik']
+    assert facts['main_category'] == ['Təmir']
+    assert facts['day'] == ['2025-10-28'] and facts['month'] == ['2025-10']
+    assert facts['price'] == ['without'] and facts['identity'] == ['anonymous']
+
+
+def test_upserting_the_same_listing_twice_counts_it_once(store):
+    assert store.upsert(listing()) is True
+    assert store.upsert(listing()) is False
+    assert store.count('total', 'listings') == 1
+    assert store.count('category', 'Təmir') == 1
+
+
+def test_changed_listing_moves_its_counts(store):
+    store.upsert(listing(location='Bakı'))
+    store.upsert(listing('2', location='Bakı'))
+    assert store.upsert(listing(location='Sumqayıt', price='')) is True
+    assert store.counts('location') == [('Bakı', 1), ('Sumqayıt', 1)]
+    assert store.count('price', 'with') == 1 and store.count('price', 'without') == 1
+    assert store.count('total', 'listings') == 2
+
+
+def test_dropped_category_disappears_from_counts(store):
+    store.upsert(listing(categories='Təmir, Santexnik'))
+    store.upsert(listing(categories='Santexnik'))
+    assert store.counts('category') == [('Santexnik', 1)]
+    assert store.counts('main_category') == [('Santexnik', 1)]
+
+
+def test_record_without_listing_id_is_ignored(store):
+    assert store.upsert(listing(listing_id='')) is False
+    assert store.counts('total') == []
+
+
+def test_counts_survive_reopening(tmp_path):
+    path = tmp_path / 'aggregates.db'
+    store = AggregateStore(path, commit_every=1000)
+    store.upsert(listing())
+    store.close()
+    reopened = AggregateStore(path)
+    assert reopened.upsert(listing()) is False
+    assert reopened.count('total', 'listings') == 1
+    reopened.close()
+
+
+def test_store_matches_a_full_recount_of_the_export(tmp_path):
+    records = json.loads((REPO / 'ustasi_listings.json').read_text(encoding='utf-8'))
+    path = tmp_path / 'aggregates.db'
+    store = AggregateStore(path)
+    for record in records + records[:50]:  # Re-scraped listings must not count twice
+        store.upsert(record)
+    store.close()
+
+    incremental = load_chart_aggregates(path).to_dict()
+    recount = compute_aggregates(load_listings('missing.parquet', str(REPO / 'ustasi_listings.csv'))).to_dict()
+    assert incremental == recount
@@ -0,0 +1,74 @@
+"""compute_aggregates must count what the per-chart code counted, from CSV or Parquet"""
+
+import json
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import columnar
+from aggregates import compute_aggregates, explode_categories
+from exporters import ListingExporter
+from generate_charts import load_listings
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def frame(rows):
+    df = pd.DataFrame(rows, columns=['categories', 'location', 'price', 'user_name', 'date'])
+    df['date'] = pd.to_datetime(df['date'], format=columnar.DATE_FORMAT, errors='coerce')
+    return df
+
+
+def test_counts_of_a_small_frame():
+    agg = compute_aggregates(frame([
+        ['Təmir, Santexnik', 'Bakı', '50 Azn', 'Usta', '28.10.2025'],
+        ['Santexnik', 'Bakı', '', '', '28.10.2025'],
+        ['Elektrik, Təmir', 'Sumqayıt', None, 'Elektrik', '01.09.2025'],
+        [None, 'Bakı', '10 Azn', None, None],
+    ]))
+    assert agg.total == 4
+    assert agg.category_counts.to_dict() == {'Təmir': 2, 'Santexnik': 2, 'Elektrik': 1}
+    assert agg.main_category_counts.to_dict() == {'Təmir': 1, 'Santexnik': 1, 'Elektrik': 1}
+    assert agg.location_counts.to_dict() == {'Bakı': 3, 'Sumqayıt': 1}
+    assert (agg.with_price, agg.without_price) == (2, 2)
+    assert (agg.with_identity, agg.anonymous) == (2, 2)
+    assert agg.to_dict()['daily_counts'] == {'2025-09-01': 1, '2025-10-28': 2}
+    assert agg.to_dict()['monthly_counts'] == {'2025-09': 1, '2025-10': 2}
+
+
+def test_list_and_string_categories_explode_alike():
+    strings = explode_categories(pd.Series(['a, b', None, 'c']))
+    lists = explode_categories(pd.Series([['a', 'b'], [], ['c']]))
+    assert list(strings) == list(lists) == ['a', 'b', 'c']
+    assert list(strings.index) == list(lists.index) == [0, 0, 2]
+
+
+def test_matches_the_per_chart_counts_on_the_export():
+    csv_file = REPO / 'ustasi_listings.csv'
+    agg = compute_aggregates(load_listings(parquet_file='missing.parquet', csv_file=str(csv_file)))
+    raw = pd.read_csv(csv_file)
+
+    categories = Counter(category.strip() for value in raw['categories'].dropna()
+                         for category in str(value).split(','))
+    assert agg.category_counts.to_dict() == dict(categories)
+    main = Counter(str(value).split(',')[0].strip() for value in raw['categories'].dropna())
+    assert agg.main_category_counts.to_dict() == dict(main)
+    assert agg.location_counts.to_dict() == raw['location'].value_counts().to_dict()
+    assert agg.with_price == int((raw['price'].notna() & (raw['price'] != '')).sum())
+    assert agg.with_identity == int((raw['user_name'].notna() & (raw['user_name'] != '')).sum())
+
+
+@pytest.mark.skipif(columnar.pa is None, reason='needs pyarrow')
+def test_parquet_and_csv_give_the_same_aggregates(tmp_path):
+    records = json.loads((REPO / 'ustasi_listings.json').read_text(encoding='utf-8'))
+    json_file, csv_file, parquet_file = (str(tmp_path / name) for name in
+                                         ('l.json', 'l.csv', 'l.parquet'))
+    exporter = ListingExporter(json_file, csv_file, parquet_file=parquet_file)
+    exporter.write_all(records)
+    exporter.commit()
+
+    from_parquet = compute_aggregates(load_listings(parquet_file, csv_file))
+    from_csv = compute_aggregates(load_listings('missing.parquet', csv_file))
+    assert from_parquet.to_dict() == from_csv.to_dict()
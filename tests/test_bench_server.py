@@ -0,0 +1,75 @@
+"""The stand-in server's pages parse like the site's, and a full scrape of it is complete"""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+from bench_server import PAGE_SIZE, BenchServer, ListingDataset, load_templates, telshow_hash
+from parsers import PARSERS
+from scraper_v2 import UstasiScraperV2
+
+TEMPLATES = Path(__file__).resolve().parent.parent / 'ustasi_listings.json'
+BASE_URL = 'http://127.0.0.1'
+
+
+@pytest.fixture(scope='module')
+def dataset() -> ListingDataset:
+    return ListingDataset(load_templates(str(TEMPLATES))[:10], 45)
+
+
+def test_dataset_scales_past_its_templates(dataset):
+    first, repeat = dataset.record(0), dataset.record(10)
+    assert first['listing_id'] != repeat['listing_id']
+    assert first['title'] == repeat['title']
+    assert dataset.index_of(repeat['listing_id']) == 10
+    assert dataset.index_of(dataset.record(44)['listing_id']) == 44
+    assert dataset.index_of(str(int(dataset.record(44)['listing_id']) + 1)) is None
+
+
+@pytest.mark.parametrize('name', sorted(PARSERS))
+def test_list_pages_parse_into_every_listing(dataset, name):
+    parser = PARSERS[name]()
+    urls = []
+    for start in range(4):
+        urls += parser.parse_listing_urls(dataset.render_list_page(start), BASE_URL)
+    assert urls == [f"{BASE_URL}{dataset.record(i)['path']}" for i in range(45)]
+    assert len(parser.parse_listing_urls(dataset.render_list_page(0), BASE_URL)) == PAGE_SIZE
+
+
+@pytest.mark.parametrize('name', sorted(PARSERS))
+def test_detail_pages_parse_back_to_the_template(dataset, name):
+    parser = PARSERS[name]()
+    for index in (0, 7, 23):
+        record = dataset.record(index)
+        url = f"{BASE_URL}{record['path']}"
+        data, hash_value = parser.parse_detail(dataset.render_detail_page(index), url, record['listing_id'])
+        assert hash_value == telshow_hash(record['listing_id'])
+        for field in ('title', 'price', 'location', 'description', 'user_id', 'date'):
+            assert data[field] == record[field], field
+
+
+def test_scrape_of_the_stand_in_server_is_complete(dataset, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def main():
+        runner = web.AppRunner(BenchServer(dataset).app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            scraper = UstasiScraperV2(max_pages=5, base_url=f"{BASE_URL}:{port}", parser='lxml',
+                                      stream=True, page_window=2, max_rps=None, phone_max_rps=None)
+            await scraper.run()
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+    records = json.loads((tmp_path / 'ustasi_listings.json').read_text(encoding='utf-8'))
+    assert sorted(record['listing_id'] for record in records) == sorted(
+        dataset.record(i)['listing_id'] for i in range(45))
+    phones = {record['listing_id']: record['phone'] for record in records}
+    assert all(phones[dataset.record(i)['listing_id']] == dataset.record(i)['phone'] for i in range(45))
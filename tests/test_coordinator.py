@@ -0,0 +1,138 @@
+"""WorkQueue leases, expiry and requeue, and merging of worker logs"""
+
+import asyncio
+import json
+
+import pytest
+
+from checkpoint import RecordLog
+from coordinator import ShardWorker, WorkQueue, merge, seed
+
+EXPIRED = -1.0  # A lease that has already run out
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.db', max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def details(*keys):
+    return [(key, f'https://ustasi.az/x-{key}.html') for key in keys]
+
+
+def test_add_queues_each_key_once(queue):
+    assert queue.add('detail', details('1', '2')) == 2
+    assert queue.add('detail', details('2', '3')) == 1
+    assert queue.counts() == {'detail': {'pending': 3}}
+
+
+def test_lease_hands_out_items_oldest_first_and_only_once(queue):
+    queue.add('detail', details('3', '1', '2'))
+    assert [key for key, _ in queue.lease('a', 'detail', 2)] == ['3', '1']
+    assert [key for key, _ in queue.lease('b', 'detail', 5)] == ['2']
+    assert queue.lease('c', 'detail', 5) == []
+    assert queue.lease('a', 'list', 5) == []
+
+
+def test_expired_lease_is_handed_to_another_worker(queue):
+    queue.add('detail', details('1'))
+    queue.lease('crashed', 'detail', 1, lease_seconds=EXPIRED)
+    assert queue.lease('b', 'detail', 1) == details('1')
+    # The crashed worker can no longer finish the item
+    queue.finish('crashed', 'detail', ['1'])
+    assert queue.counts()['detail'] == {'leased': 1}
+    queue.finish('b', 'detail', ['1'])
+    assert queue.counts()['detail'] == {'done': 1}
+
+
+def test_renewed_lease_does_not_expire(queue):
+    queue.add('detail', details('1'))
+    queue.lease('a', 'detail', 1, lease_seconds=EXPIRED)
+    queue.renew('a', lease_seconds=300)
+    assert queue.lease('b', 'detail', 1) == []
+
+
+def test_item_fails_after_max_attempts_expired_leases(queue):
+    queue.add('detail', details('1'))
+    queue.lease('a', 'detail', 1, lease_seconds=EXPIRED)
+    queue.lease('b', 'detail', 1, lease_seconds=EXPIRED)
+    assert queue.lease('c', 'detail', 1) == []
+    assert queue.counts()['detail'] == {'failed': 1}
+    assert queue.unfinished() == 0
+
+
+def test_retry_requeues_until_attempts_run_out(queue):
+    queue.add('list', [('0', '{}')])
+    queue.lease('a', 'list', 1)
+    queue.retry('a', 'list', ['0'])
+    assert queue.counts()['list'] == {'pending': 1}
+    queue.lease('b', 'list', 1)
+    queue.retry('b', 'list', ['0'])
+    assert queue.counts()['list'] == {'failed': 1}
+
+
+def test_finish_marks_failed_items(queue):
+    queue.add('detail', details('1', '2'))
+    queue.lease('a', 'detail', 2)
+    queue.finish('a', 'detail', ['1'])
+    queue.finish('a', 'detail', ['2'], state='failed')
+    assert queue.counts()['detail'] == {'done': 1, 'failed': 1}
+
+
+def test_end_of_list_skips_later_ranges(queue):
+    assert seed(queue, max_pages=35, range_size=10) == 4
+    queue.lease('a', 'list', 1)
+    queue.end_of_list(14)
+    assert queue.list_end() == 14
+    assert queue.counts()['list'] == {'leased': 1, 'pending': 1, 'skipped': 2}
+    queue.end_of_list(20)  # A later end does not move it back
+    assert queue.list_end() == 14
+
+
+def test_seed_covers_every_page_once(queue):
+    seed(queue, max_pages=25, range_size=10)
+    ranges = [json.loads(payload) for _, payload in queue.lease('a', 'list', 10)]
+    assert ranges == [{'start': 0, 'end': 10}, {'start': 10, 'end': 20}, {'start': 20, 'end': 25}]
+    assert seed(queue, max_pages=25, range_size=10) == 0
+
+
+def test_queue_is_shared_between_connections(tmp_path):
+    first, second = WorkQueue(tmp_path / 'queue.db'), WorkQueue(tmp_path / 'queue.db')
+    first.add('detail', details('1', '2', '3'))
+    leased = [key for key, _ in first.lease('a', 'detail', 2)] + [key for key, _ in second.lease('b', 'detail', 2)]
+    assert sorted(leased) == ['1', '2', '3']
+    first.close()
+    second.close()
+
+
+def test_already_scraped_listing_counts_as_done(tmp_path):
+    worker = ShardWorker(tmp_path / 'shards', 'w1', base_url='http://127.0.0.1:9', phone_workers=0)
+    worker.queue.add('detail', details('5'))
+    batch = worker.queue.lease('w1', 'detail', 10)
+    worker.scraper.scraped_ids.add('5')
+    asyncio.run(worker.scrape_batch(batch))
+    assert worker.queue.counts() == {'detail': {'done': 1}}
+    worker.scraper.record_log.close()
+    worker.queue.close()
+
+
+def test_merge_keeps_one_record_per_listing_preferring_a_phone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shards = tmp_path / 'shards'
+    shards.mkdir()
+    first, second = RecordLog(shards / 'worker-a.jsonl'), RecordLog(shards / 'worker-b.jsonl')
+    first.append({'listing_id': '1', 'title': 'A', 'phone': '050'})
+    first.append({'listing_id': '2', 'title': 'B', 'phone': ''})
+    second.append({'listing_id': '1', 'title': 'A again', 'phone': ''})
+    second.append({'listing_id': '2', 'title': 'B again', 'phone': '055'})
+    second.append({'listing_id': '3', 'title': 'C', 'phone': '070'})
+    first.close()
+    second.close()
+
+    assert merge(shards) == 3
+    records = json.loads((tmp_path / 'ustasi_listings.json').read_text(encoding='utf-8'))
+    assert [(r['listing_id'], r['title'], r['phone']) for r in records] == [
+        ('1', 'A', '050'), ('2', 'B again', '055'), ('3', 'C', '070')]
+    assert not (tmp_path / 'ustasi_aggregates.db').exists()
@@ -0,0 +1,87 @@
+"""Membership of every dedupe backend, and the Bloom filter's false positive rate"""
+
+import pytest
+
+from dedupe import DEDUPE_BACKENDS, IdSet, ScalableBloomFilter, SqliteIdSet, new_id_set
+
+
+@pytest.fixture(params=sorted(DEDUPE_BACKENDS))
+def id_set(request, tmp_path):
+    id_set = new_id_set(request.param, path=tmp_path / 'ids.db')
+    yield id_set
+    id_set.close()
+
+
+def test_ids_and_urls_are_the_same_key(id_set):
+    id_set.add('103')
+    id_set.add('https://ustasi.az/elektrik-ustasi-2041.html')
+    assert '103' in id_set and 103 in id_set
+    assert 'https://ustasi.az/kondisionerlere-qaz-vurulmasi-103.html' in id_set
+    assert '2041' in id_set
+    assert '104' not in id_set and 'https://ustasi.az/x-104.html' not in id_set
+    assert len(id_set) == 2
+
+
+def test_adding_a_key_twice_counts_it_once(id_set):
+    id_set.update(['5', '5', 'https://ustasi.az/x-5.html', '6'])
+    assert len(id_set) == 2
+
+
+def test_empty_and_missing_keys_are_ignored(id_set):
+    id_set.add('')
+    id_set.add(None)
+    assert len(id_set) == 0
+    assert None not in id_set and '' not in id_set
+
+
+def test_non_listing_keys_are_kept_as_text(id_set):
+    id_set.add('https://ustasi.az/about')
+    assert 'https://ustasi.az/about' in id_set
+    assert 'https://ustasi.az/contact' not in id_set
+
+
+def test_id_set_spills_large_ids_out_of_the_bitmap():
+    id_set = IdSet(['7', '1000', str(1 << 40)], max_bitmap_id=1024)
+    assert str(1 << 40) in id_set and '1000' in id_set
+    assert len(id_set._bits) <= 128
+    assert sorted(id_set) == [7, 1000, 1 << 40]
+
+
+def test_bloom_filter_has_no_false_negatives_across_slices():
+    bloom = ScalableBloomFilter(range(5000), initial_capacity=500)
+    assert len(bloom.filters) > 1
+    assert all(key in bloom for key in range(5000))
+
+
+@pytest.mark.parametrize('error_rate', [0.01, 0.001])
+def test_bloom_false_positive_rate_stays_below_error_rate(error_rate):
+    bloom = ScalableBloomFilter(range(20000), error_rate=error_rate, initial_capacity=1000)
+    assert len(bloom.filters) == 5
+    trials = 100000
+    false_positives = sum(key in bloom for key in range(1 << 32, (1 << 32) + trials))
+    # Four full slices expect 97% of error_rate; allow for sampling noise
+    assert false_positives / trials <= error_rate * 1.25
+
+
+def test_bloom_rejects_bad_parameters():
+    with pytest.raises(ValueError):
+        ScalableBloomFilter(error_rate=1.5)
+    with pytest.raises(ValueError):
+        ScalableBloomFilter(tightening=1)
+
+
+def test_sqlite_set_is_emptied_unless_kept(tmp_path):
+    path = tmp_path / 'ids.db'
+    first = SqliteIdSet(['1', '2'], path=path)
+    first.close()
+    kept = SqliteIdSet(path=path, reset=False)
+    assert len(kept) == 2 and '1' in kept
+    kept.close()
+    emptied = SqliteIdSet(path=path)
+    assert len(emptied) == 0 and '1' not in emptied
+    emptied.close()
+
+
+def test_unknown_backend_is_an_error():
+    with pytest.raises(ValueError, match='memory, bloom, sqlite'):
+        new_id_set('redis')
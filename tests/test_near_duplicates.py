@@ -0,0 +1,107 @@
+"""MinHash signatures, LSH clustering and the cluster file"""
+
+import json
+import os
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from near_duplicates import (MinHasher, find_duplicates, is_stale, load_duplicate_ids, lsh_bands,
+                             write_duplicates)
+
+REPO = Path(__file__).resolve().parent.parent
+TEXT = ('Kondisionerlərin təmiri və qaz vurulması, evə gəlişlə. Bütün markalar üçün '
+        'zəmanətli xidmət göstəririk, qiymətlər sərfəlidir, zəng edin')
+
+
+def jaccard(first: str, second: str, size: int = 3) -> float:
+    hasher = MinHasher(shingle_size=size)
+    shingles = []
+    for text in (first, second):
+        words = hasher.words(text)
+        shingles.append({tuple(words[i:i + size]) for i in range(hasher.shingles(words))})
+    return len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+
+
+def test_signatures_are_deterministic_and_ignore_case_and_punctuation():
+    hasher = MinHasher(num_perm=64)
+    shouted = TEXT.replace('Bütün', 'BÜTÜN').replace(',', ' -')
+    signatures, empty = hasher.signatures([TEXT, shouted, '', None])
+    assert signatures.shape == (4, 64) and signatures.dtype == np.uint32
+    assert (signatures[0] == signatures[1]).all()
+    assert empty.tolist() == [False, False, True, True]
+    again, _ = MinHasher(num_perm=64).signatures([TEXT])
+    assert (again[0] == signatures[0]).all()
+
+
+def test_signatures_do_not_depend_on_chunking(monkeypatch):
+    texts = [f"{TEXT} {i}" for i in range(40)] + ['qısa']
+    whole, _ = MinHasher().signatures(texts)
+    monkeypatch.setattr('near_duplicates.CHUNK_SHINGLES', 7)
+    chunked, _ = MinHasher().signatures(texts)
+    assert (whole == chunked).all()
+
+
+def test_signature_agreement_estimates_jaccard_similarity():
+    edited = TEXT.replace('sərfəlidir', 'münasibdir')
+    signatures, _ = MinHasher(num_perm=512).signatures([TEXT, edited])
+    estimate = (signatures[0] == signatures[1]).mean()
+    assert estimate == pytest.approx(jaccard(TEXT, edited), abs=0.08)
+
+
+@pytest.mark.parametrize('threshold', [0.5, 0.8, 0.9])
+def test_bands_start_candidates_just_below_the_threshold(threshold):
+    bands, rows = lsh_bands(128, threshold)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_near_copies_cluster_under_the_lowest_id():
+    ids = ['205', '17', '98', '300']
+    texts = [TEXT, TEXT + ' indi', 'Elektrik işləri, işıqlandırma və rozetka quraşdırılması', TEXT]
+    assert find_duplicates(ids, texts, threshold=0.8) == [
+        {'canonical_id': '17', 'listing_ids': ['17', '205', '300']}]
+
+
+def test_same_listing_twice_and_empty_texts_are_not_duplicates():
+    assert find_duplicates(['1', '1', '2', '3'], [TEXT, TEXT, '', None]) == []
+
+
+def test_threshold_must_be_a_similarity():
+    with pytest.raises(ValueError):
+        find_duplicates(['1'], [TEXT], threshold=0)
+
+
+def test_clusters_hold_every_near_identical_pair_of_the_export():
+    records = json.loads((REPO / 'ustasi_listings.json').read_text(encoding='utf-8'))
+    ids = [record['listing_id'] for record in records]
+    texts = [record['description'] for record in records]
+    cluster_of = {listing_id: i for i, cluster in enumerate(find_duplicates(ids, texts, threshold=0.8))
+                  for listing_id in cluster['listing_ids']}
+
+    hasher = MinHasher()
+    words = [hasher.words(text) for text in texts]
+    shingles = [{tuple(w[i:i + 3]) for i in range(hasher.shingles(w))} for w in words]
+    pairs = [(ids[i], ids[j]) for i, j in combinations(range(len(ids)), 2)
+             if ids[i] != ids[j] and shingles[i] and shingles[j]
+             and len(shingles[i] & shingles[j]) / len(shingles[i] | shingles[j]) >= 0.95]
+    assert pairs
+    assert all(first in cluster_of and cluster_of.get(first) == cluster_of.get(second)
+               for first, second in pairs)
+
+
+def test_cluster_file_round_trip_and_staleness(tmp_path):
+    path, csv_file = str(tmp_path / 'duplicates.json'), str(tmp_path / 'listings.csv')
+    assert is_stale(path, csv_file=csv_file)
+    clusters = [{'canonical_id': '1', 'listing_ids': ['1', '4', '9']}]
+    write_duplicates(clusters, total=10, path=path)
+    assert load_duplicate_ids(path) == {'4', '9'}
+    assert json.loads(Path(path).read_text(encoding='utf-8'))['unique_offers'] == 8
+
+    Path(csv_file).write_text('listing_id,description\n', encoding='utf-8')
+    os.utime(csv_file, (0, os.path.getmtime(path) - 10))
+    assert not is_stale(path, parquet_file=str(tmp_path / 'missing.parquet'), csv_file=csv_file)
+    os.utime(csv_file, (0, os.path.getmtime(path) + 10))
+    assert is_stale(path, parquet_file=str(tmp_path / 'missing.parquet'), csv_file=csv_file)
@@ -0,0 +1,50 @@
+"""SoupParser and LxmlParser must produce identical records for saved pages"""
+
+from pathlib import Path
+
+import pytest
+
+from parsers import LxmlParser, SoupParser, compare_parsers
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+BASE_URL = 'https://ustasi.az'
+LIST_PAGES = sorted(FIXTURES.glob('homelist-*.html'))
+DETAIL_PAGES = sorted(path for path in FIXTURES.glob('*.html') if path not in LIST_PAGES)
+# Broken markup that libxml2 repairs differently from html.parser
+REPAIRED_PAGES = ['homelist-page-2.html', 'pitiminutka-temiri-290.html', 'qabyuyan-masin-temiri-124.html']
+
+
+def read(path: Path) -> str:
+    return path.read_text(encoding='utf-8')
+
+
+def listing_id(path: Path) -> str:
+    return path.stem.rsplit('-', 1)[-1]
+
+
+@pytest.mark.parametrize('path', LIST_PAGES, ids=lambda path: path.name)
+def test_list_page_parity(path):
+    html = read(path)
+    soup_items = SoupParser().parse_listing_items(html, BASE_URL)
+    assert soup_items, "fixture should contain listings"
+    assert LxmlParser().parse_listing_items(html, BASE_URL) == soup_items
+
+
+@pytest.mark.parametrize('path', DETAIL_PAGES, ids=lambda path: path.name)
+def test_detail_page_parity(path):
+    html = read(path)
+    url = f"{BASE_URL}/{path.name}"
+    soup_record, soup_hash = SoupParser().parse_detail(html, url, listing_id(path))
+    assert soup_record is not None and soup_record['description'] and soup_hash
+    assert LxmlParser().parse_detail(html, url, listing_id(path)) == (soup_record, soup_hash)
+
+
+def test_compare_parsers_reports_no_mismatches():
+    assert compare_parsers(sorted(FIXTURES.glob('*.html')), BASE_URL) == []
+
+
+@pytest.mark.parametrize('path', sorted(FIXTURES.glob('*.html')), ids=lambda path: path.name)
+def test_only_repaired_pages_fall_back_to_soup(path):
+    parser = LxmlParser()
+    parser.parse_detail(read(path), f"{BASE_URL}/{path.name}", listing_id(path))
+    assert parser.fallbacks == (1 if path.name in REPAIRED_PAGES else 0)
@@ -0,0 +1,76 @@
+"""Profiler output files and per-step parse timing"""
+
+import asyncio
+import pstats
+import time
+from pathlib import Path
+
+import pytest
+
+from parsers import PARSERS
+from profiling import Profiler, StepTimer
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'kondisionerlere-qaz-vurulmasi-103.html'
+
+
+def busy(seconds: float) -> int:
+    """Burn CPU for ``seconds``"""
+    total = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+async def waiting_and_working():
+    await asyncio.sleep(0.1)
+    busy(0.1)
+
+
+def test_profiler_writes_pstats_and_collapsed_stacks(tmp_path, capsys):
+    prefix = tmp_path / 'out' / 'run'
+    with Profiler(prefix, interval=0.002) as profiler:
+        asyncio.run(waiting_and_working())
+
+    stats = pstats.Stats(f"{prefix}.pstats")
+    assert any(name == 'busy' for _, _, name in stats.stats)
+
+    lines = Path(f"{prefix}.collapsed").read_text(encoding='utf-8').splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == profiler.samples
+    assert any('busy (test_profiling.py' in line for line in lines)
+
+    assert 'Profile: wall' in capsys.readouterr().out
+
+
+def test_profiler_sees_the_idle_event_loop(tmp_path):
+    profiler = Profiler(tmp_path / 'run', interval=0.002)
+    profiler.start()
+    asyncio.run(waiting_and_working())
+    profiler.stop()
+
+    # About half the wall time sleeps in the selector and burns no CPU
+    assert 0 < profiler.idle_samples < profiler.samples
+    assert profiler.cpu_seconds < profiler.wall_seconds
+
+
+def test_step_timer_accumulates_laps():
+    timer = StepTimer()
+    busy(0.01)
+    timer.lap('first')
+    timer.lap('second')
+    busy(0.01)
+    timer.lap('first')
+    assert set(timer.laps) == {'first', 'second'}
+    assert timer.laps['first'] >= 0.02
+    assert timer.laps['second'] < timer.laps['first']
+
+
+@pytest.mark.parametrize('name', sorted(PARSERS))
+def test_timed_parse_matches_untimed_parse(name):
+    parser = PARSERS[name]()
+    html = FIXTURE.read_text(encoding='utf-8')
+    url = 'https://ustasi.az/kondisionerlere-qaz-vurulmasi-103.html'
+    timer = StepTimer()
+    assert parser.parse_detail(html, url, '103', timer) == parser.parse_detail(html, url, '103')
+    assert timer.laps and all(seconds >= 0 for seconds in timer.laps.values())
@@ -0,0 +1,109 @@
+"""AdaptiveLimiter window growth, backoff and in-flight bound"""
+
+import asyncio
+import time
+from typing import Optional
+
+from rate_control import AdaptiveLimiter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def finish(limiter: AdaptiveLimiter, status: int = 200, error: Optional[Exception] = None):
+    """One request through the limiter, ending with ``status`` or raising ``error``"""
+    try:
+        async with limiter.slot() as slot:
+            if error is not None:
+                raise error
+            slot.status = status
+    except Exception as raised:
+        if raised is not error:
+            raise
+
+
+def test_initial_window_is_clamped():
+    assert AdaptiveLimiter(initial=100, max_limit=8).window == 8
+    assert AdaptiveLimiter(initial=0, min_limit=2).window == 2
+
+
+def test_successes_grow_the_window_up_to_the_maximum():
+    limiter = AdaptiveLimiter(initial=2, max_limit=6, max_rps=None)
+
+    async def main():
+        for _ in range(200):
+            await finish(limiter)
+
+    run(main())
+    assert limiter.window == 6
+    assert limiter.in_flight == 0
+
+
+def test_overload_statuses_halve_the_window():
+    for status in (429, 503):
+        limiter = AdaptiveLimiter(initial=8, max_limit=16, max_rps=None)
+        run(finish(limiter, status=status))
+        assert limiter.window == 4
+        assert limiter.overloads == 1
+
+
+def test_client_errors_do_not_shrink_the_window():
+    limiter = AdaptiveLimiter(initial=8, max_limit=16, max_rps=None)
+    run(finish(limiter, status=404))
+    assert limiter.window >= 8
+    assert limiter.overloads == 0
+
+
+def test_timeouts_count_as_overload():
+    limiter = AdaptiveLimiter(initial=8, max_limit=16, max_rps=None)
+    run(finish(limiter, error=asyncio.TimeoutError()))
+    assert limiter.window == 4
+    assert limiter.in_flight == 0
+
+
+def test_a_burst_of_failures_halves_the_window_once():
+    limiter = AdaptiveLimiter(initial=16, max_limit=16, max_rps=None)
+
+    async def main():
+        await asyncio.gather(*(finish(limiter, status=503) for _ in range(8)))
+
+    run(main())
+    assert limiter.window == 8
+    assert limiter.overloads == 8
+
+
+def test_window_never_drops_below_the_minimum():
+    limiter = AdaptiveLimiter(initial=2, min_limit=2, max_rps=None)
+    run(finish(limiter, status=503))
+    assert limiter.window == 2
+
+
+def test_in_flight_never_exceeds_the_window():
+    limiter = AdaptiveLimiter(initial=3, max_limit=3, max_rps=None)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limiter.slot() as slot:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+            slot.status = 200
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(12)))
+
+    run(main())
+    assert peak == 3
+
+
+def test_rate_ceiling_spaces_out_request_starts():
+    limiter = AdaptiveLimiter(initial=16, max_limit=16, max_rps=50.0)
+
+    async def main():
+        started = time.monotonic()
+        await asyncio.gather(*(finish(limiter) for _ in range(11)))
+        return time.monotonic() - started
+
+    # 11 starts at 50/s need at least 10 intervals of 20 ms
+    assert run(main()) >= 0.18
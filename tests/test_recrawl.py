@@ -0,0 +1,116 @@
+"""Revisit intervals and the order RecrawlScheduler hands out due listings"""
+
+from datetime import datetime
+
+import pytest
+
+from recrawl import DAY, HOUR, RecrawlScheduler
+from store import ListingStore
+
+NOW = datetime(2025, 10, 28, 12).timestamp()
+
+
+def listing(listing_id, posted='28.10.2025'):
+    return {'listing_id': listing_id, 'url': f'https://ustasi.az/x-{listing_id}.html', 'date': posted}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(tmp_path / 'listings.db')
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def scheduler(store):
+    return RecrawlScheduler(store)
+
+
+def interval(scheduler, listing_id):
+    return scheduler.conn.execute('SELECT interval FROM recrawl WHERE listing_id = ?',
+                                  (listing_id,)).fetchone()['interval']
+
+
+def test_first_interval_grows_with_the_listing_age(scheduler):
+    scheduler.observe(listing('1', '28.10.2025'), changed=True, now=NOW)
+    scheduler.observe(listing('2', '18.10.2025'), changed=True, now=NOW)
+    scheduler.observe(listing('3', '01.01.2024'), changed=True, now=NOW)
+    scheduler.observe(listing('4', ''), changed=True, now=NOW)
+    assert interval(scheduler, '1') == 6 * HOUR  # Half a day old: the minimum
+    assert interval(scheduler, '2') == pytest.approx((10 * DAY + 12 * HOUR) * 0.25)
+    assert interval(scheduler, '3') == 60 * DAY  # The maximum
+    assert interval(scheduler, '4') == 24 * HOUR
+
+
+def test_unchanged_fetches_back_off_and_changes_speed_up(scheduler):
+    scheduler.observe(listing('1', '18.10.2025'), changed=True, now=NOW)
+    first = interval(scheduler, '1')
+    scheduler.observe(listing('1', '18.10.2025'), changed=False, now=NOW + first)
+    assert interval(scheduler, '1') == 2 * first
+    scheduler.observe(listing('1', '18.10.2025'), changed=True, now=NOW + 3 * first)
+    assert interval(scheduler, '1') == first
+    for _ in range(10):
+        scheduler.observe(listing('1', '18.10.2025'), changed=True, now=NOW + 4 * first)
+    assert interval(scheduler, '1') == 6 * HOUR
+
+
+def test_nothing_is_due_before_its_revisit_time(scheduler):
+    scheduler.observe(listing('1'), changed=True, now=NOW)
+    assert scheduler.due(10, now=NOW + 5 * HOUR) == []
+    assert scheduler.due(10, now=NOW + 6 * HOUR) == [('1', 'https://ustasi.az/x-1.html')]
+    assert scheduler.due(0, now=NOW + 6 * HOUR) == []
+    assert scheduler.counts(now=NOW + 6 * HOUR) == (1, 1)
+
+
+def test_most_overdue_listings_come_first(scheduler):
+    # Same interval, fetched at different times
+    scheduler.observe(listing('1'), changed=True, now=NOW)
+    scheduler.observe(listing('2'), changed=True, now=NOW - 12 * HOUR)
+    scheduler.observe(listing('3'), changed=True, now=NOW - 6 * HOUR)
+    later = NOW + 6 * HOUR
+    assert [key for key, _ in scheduler.due(10, now=later)] == ['2', '3', '1']
+    assert [key for key, _ in scheduler.due(2, now=later)] == ['2', '3']
+
+
+def test_listings_that_change_often_are_weighted_up(scheduler):
+    # Both end at the minimum interval: busy changed 4 times in 4 checks, steady 2 in 3
+    for changed in (True, True, True, True):
+        scheduler.observe(listing('busy'), changed=changed, now=NOW)
+    for changed in (True, False, True):
+        scheduler.observe(listing('steady'), changed=changed, now=NOW)
+    assert interval(scheduler, 'steady') == interval(scheduler, 'busy') == 6 * HOUR
+    assert [key for key, _ in scheduler.due(10, now=NOW + DAY)] == ['busy', 'steady']
+
+
+def test_newer_listing_breaks_ties(scheduler):
+    scheduler.observe(listing('old', '01.01.2024'), changed=True, now=NOW)
+    scheduler.observe(listing('new', '28.10.2025'), changed=True, now=NOW)
+    for _ in range(8):  # Backs off to 60 days, like the old listing
+        scheduler.defer('new', now=NOW)
+    assert interval(scheduler, 'new') == interval(scheduler, 'old') == 60 * DAY
+    assert [key for key, _ in scheduler.due(10, now=NOW + 60 * DAY)] == ['new', 'old']
+
+
+def test_failed_fetch_defers_the_listing(scheduler):
+    scheduler.observe(listing('1'), changed=True, now=NOW)
+    scheduler.defer('1', now=NOW + 6 * HOUR)
+    assert interval(scheduler, '1') == 12 * HOUR
+    assert scheduler.due(10, now=NOW + 17 * HOUR) == []
+    assert scheduler.due(10, now=NOW + 18 * HOUR) == [('1', 'https://ustasi.az/x-1.html')]
+
+
+def test_stored_listings_are_tracked_when_the_scheduler_starts(store):
+    store.upsert(listing('1'))
+    store.upsert(listing('2', '01.10.2025'))
+    scheduler = RecrawlScheduler(store)
+    assert scheduler.known('1') and scheduler.known('2') and not scheduler.known('3')
+    assert scheduler.counts()[1] == 2
+    RecrawlScheduler(store)  # Starting again does not track them twice
+    assert scheduler.counts()[1] == 2
+
+
+def test_bad_intervals_are_rejected(store):
+    with pytest.raises(ValueError):
+        RecrawlScheduler(store, min_interval=DAY, max_interval=HOUR)
+    with pytest.raises(ValueError):
+        RecrawlScheduler(store, backoff=1)
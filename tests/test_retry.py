@@ -0,0 +1,133 @@
+"""RetryPolicy classification and delays, RetryManager retries and dead letters"""
+
+import asyncio
+import json
+
+import pytest
+
+from retry import DEFAULT_POLICIES, FetchError, RetryManager, RetryPolicy
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Make every backoff a zero-length sleep"""
+    monkeypatch.setattr(RetryPolicy, 'delay', lambda self, attempt: 0.0)
+
+
+def failing(errors, result='ok'):
+    """Operation raising ``errors`` in turn, then returning ``result``"""
+    calls = []
+
+    async def operation():
+        calls.append(len(calls) + 1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return operation, calls
+
+
+def test_http_policy_retries_only_transient_statuses():
+    policy = DEFAULT_POLICIES['http']
+    for status in (429, 500, 502, 503, 504):
+        assert policy.retryable(FetchError('http', status=status))
+    for status in (400, 403, 404, 410):
+        assert not policy.retryable(FetchError('http', status=status))
+    assert DEFAULT_POLICIES['timeout'].retryable(FetchError('timeout'))
+
+
+def test_delay_is_capped_exponential_with_jitter(monkeypatch):
+    monkeypatch.undo()  # Use the real delay
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0)
+    for attempt, cap in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)]:
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert all(cap / 2 <= delay <= cap for delay in delays)
+        assert max(delays) - min(delays) > 0
+
+
+def test_transient_failure_is_retried_until_it_succeeds():
+    manager = RetryManager()
+    operation, calls = failing([FetchError('timeout'), FetchError('http', status=503)])
+    assert asyncio.run(manager.run('detail', 'a', operation)) == 'ok'
+    assert calls == [1, 2, 3]
+    assert manager.retries == 2
+    assert manager.dead_letters == []
+
+
+def test_permanent_failure_is_dead_lettered_at_once():
+    manager = RetryManager()
+    operation, calls = failing([FetchError('http', status=404)])
+    with pytest.raises(FetchError):
+        asyncio.run(manager.run('detail', 'a', operation))
+    assert calls == [1]
+    assert manager.dead_letters[0]['status'] == 404
+    assert manager.dead_letters[0]['attempts'] == 1
+
+
+def test_exhausted_attempts_are_dead_lettered():
+    manager = RetryManager(policies={'network': RetryPolicy(max_attempts=3)})
+    operation, calls = failing([FetchError('network')] * 5)
+    with pytest.raises(FetchError):
+        asyncio.run(manager.run('phone', '42', operation))
+    assert calls == [1, 2, 3]
+    letter = manager.dead_letters[0]
+    assert (letter['stage'], letter['key'], letter['kind'], letter['attempts']) == ('phone', '42', 'network', 3)
+
+
+def test_unclassified_kind_is_not_retried():
+    manager = RetryManager()
+    operation, calls = failing([FetchError('unknown')])
+    with pytest.raises(FetchError):
+        asyncio.run(manager.run('list', '0', operation))
+    assert calls == [1]
+
+
+def test_too_many_waiting_items_go_straight_to_dead_letters():
+    manager = RetryManager(max_waiting=0)
+    operation, calls = failing([FetchError('timeout')])
+    with pytest.raises(FetchError):
+        asyncio.run(manager.run('detail', 'a', operation))
+    assert calls == [1]
+
+
+def test_slot_is_released_during_backoff(monkeypatch):
+    monkeypatch.undo()  # A real, short backoff
+    manager = RetryManager(policies={'timeout': RetryPolicy(base_delay=0.05, max_delay=0.05)})
+    order = []
+
+    async def main():
+        slot = asyncio.Semaphore(1)
+        flaky, _ = failing([FetchError('timeout')], 'flaky')
+
+        async def work(name, operation):
+            async with slot:
+                result = await manager.run('detail', name, operation, slot)
+                order.append(result)
+
+        async def healthy():
+            return 'healthy'
+
+        await asyncio.gather(work('a', flaky), work('b', healthy))
+        return slot.locked()
+
+    assert asyncio.run(main()) is False
+    # The healthy item ran while the flaky one was backing off
+    assert order == ['healthy', 'flaky']
+
+
+def test_write_dead_letters(tmp_path, capsys):
+    manager = RetryManager()
+    path = tmp_path / 'dead.json'
+    manager.write_dead_letters(path)
+    assert not path.exists()
+
+    operation, _ = failing([FetchError('http', status=404)])
+    with pytest.raises(FetchError):
+        asyncio.run(manager.run('detail', 'https://ustasi.az/x-1.html', operation))
+    manager.write_dead_letters(path)
+    assert json.loads(path.read_text(encoding='utf-8'))[0]['key'] == 'https://ustasi.az/x-1.html'
+    assert 'Wrote 1 failed items' in capsys.readouterr().out
+
+
+def test_fetch_error_message_defaults_to_kind():
+    assert str(FetchError('parse')) == 'parse'
@@ -0,0 +1,109 @@
+"""Azerbaijani and Cyrillic folding, incremental re-indexing and filtered search"""
+
+import json
+
+import pytest
+
+from search_index import SearchIndex, fold, index_file, match_expression
+
+
+def listing(listing_id='1', **fields):
+    return {'listing_id': listing_id, 'url': f'https://ustasi.az/x-{listing_id}.html',
+            'title': 'Kondisioner təmiri', 'description': 'Bütün markaların təmiri və qaz vurulması',
+            'categories': 'Təmir, Kondisioner', 'location': 'Bakı', 'price': '30 Azn',
+            'date': '28.10.2025', **fields}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(tmp_path / 'search.db')
+    yield index
+    index.close()
+
+
+def ids(results):
+    return [result['listing_id'] for result in results]
+
+
+@pytest.mark.parametrize('text, folded', [
+    ('Bakı şəhəri', 'baki seheri'),
+    ('İSTİLİK SİSTEMİ', 'istilik sistemi'),
+    ('Gəncə, Çöl', 'gence, col'),
+    ('ağ ÜZLÜK', 'ag uzluk'),
+    ('ремонт квартир', 'remont kvartir'),
+    ('Электрик, щётка', 'elektrik, syotka'),
+    ('Һәјәт', 'heyet'),
+    ('café', 'cafe'),
+    (None, ''),
+])
+def test_fold(text, folded):
+    assert fold(text) == folded
+
+
+def test_match_expression_quotes_terms_and_keeps_prefixes():
+    assert match_expression('Kondisioner təmir*') == '"kondisioner" "temir"*'
+    with pytest.raises(ValueError):
+        match_expression(' -- ')
+
+
+def test_latin_and_cyrillic_queries_find_each_other(index):
+    index.upsert(listing('1', title='Ремонт кондиционеров'))
+    index.upsert(listing('2', title='Santexnik', description='Su xətləri', categories='Santexnika'))
+    assert ids(index.search('remont')) == ['1']
+    assert ids(index.search('ремонт')) == ['1']
+    assert sorted(ids(index.search('baki'))) == ['1', '2']
+    assert ids(index.search('su xetleri')) == ['2']
+    assert ids(index.search('santex*')) == ['2']
+
+
+def test_unchanged_listing_is_not_reindexed(index):
+    assert index.upsert(listing()) is True
+    assert index.upsert(listing()) is False
+    assert len(index) == 1
+
+
+def test_changed_listing_replaces_its_old_terms(index):
+    index.upsert(listing(description='Kondisioner qaz vurulması'))
+    assert index.upsert(listing(description='Soyuducu təmiri')) is True
+    assert ids(index.search('qaz')) == []
+    assert ids(index.search('soyuducu')) == ['1']
+    assert len(index) == 1
+    # The index and its content table still agree
+    index.conn.execute("INSERT INTO search (search) VALUES ('integrity-check')")
+
+
+def test_record_without_listing_id_is_ignored(index):
+    assert index.upsert(listing(listing_id='')) is False
+    assert len(index) == 0
+
+
+def test_filters_fold_and_combine(index):
+    index.upsert(listing('1'))
+    index.upsert(listing('2', location='Sumqayıt', date='01.09.2025'))
+    index.upsert(listing('3', categories='Elektrik', date='15.10.2025 09:30'))
+    assert sorted(ids(index.search('temiri', location='BAKI'))) == ['1', '3']
+    assert ids(index.search('temiri', category='kondisioner', location='bakı')) == ['1']
+    assert sorted(ids(index.search('temiri', since='2025-10-01'))) == ['1', '3']
+    assert ids(index.search('temiri', until='2025-09-30')) == ['2']
+    assert index.search('temiri', location='Bakı', until='2025-09-30') == []
+
+
+def test_title_matches_rank_above_description_matches(index):
+    index.upsert(listing('1', title='Elektrik', description='Soyuducu təmiri də edirik'))
+    index.upsert(listing('2', title='Soyuducu təmiri', description='Evə gəlişlə'))
+    results = index.search('soyuducu')
+    assert ids(results) == ['2', '1']
+    assert results[0]['score'] > results[1]['score'] > 0
+    assert results[0]['title'] == 'Soyuducu təmiri' and results[0]['date'] == '2025-10-28'
+
+
+def test_index_file_only_counts_new_or_changed_listings(tmp_path, capsys):
+    source, db = tmp_path / 'listings.json', str(tmp_path / 'search.db')
+    source.write_text(json.dumps([listing('1'), listing('2')]), encoding='utf-8')
+    assert index_file(str(source), db) == 2
+    log = tmp_path / 'listings.jsonl'
+    log.write_text('\n'.join(json.dumps(record) for record in
+                             [listing('2', price=''), listing('3')]) + '\n', encoding='utf-8')
+    assert index_file(str(log), db) == 2
+    assert index_file(str(log), db) == 0
+    assert 'Indexed 0 new or changed of 2 listings' in capsys.readouterr().out
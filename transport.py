@@ -0,0 +1,122 @@
+"""
+HTTP transport configuration for the scraper.
+
+Builds the ``aiohttp.ClientSession`` used for every request: a shared
+``TCPConnector`` whose connection limits are sized to the request
+limiters, a DNS cache, keep-alive, compressed responses (gzip, plus
+brotli when the ``brotli`` package is installed) and separate connect
+and read timeouts. ``use_uvloop`` switches asyncio to uvloop when it is
+available.
+"""
+
+import asyncio
+from typing import Dict, Optional, Union
+
+import aiohttp
+
+try:
+    import brotli  # noqa: F401  aiohttp decodes 'br' responses when it is importable
+    HAVE_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAVE_BROTLI = True
+    except ImportError:
+        HAVE_BROTLI = False
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional
+    uvloop = None
+
+
+class TransportConfig:
+    """Connection pool and timeout settings for the client session"""
+
+    def __init__(self, name: str = 'tuned', pool_size: Optional[int] = None,
+                 dns_cache_ttl: Optional[int] = 300, keepalive_timeout: float = 30.0,
+                 connect_timeout: Optional[float] = 5.0, read_timeout: Optional[float] = 20.0,
+                 total_timeout: Optional[float] = 60.0, compress: bool = True,
+                 default_connector: bool = False):
+        self.name = name
+        self.pool_size = pool_size  # None sizes the pool to the limiters
+        self.dns_cache_ttl = dns_cache_ttl  # Seconds; None caches forever
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout  # Establishing the TCP/TLS connection
+        self.read_timeout = read_timeout  # Between reads of the response
+        self.total_timeout = total_timeout  # Whole request, a last-resort bound
+        self.compress = compress  # Ask for compressed responses
+        self.default_connector = default_connector  # Leave the connector to aiohttp
+
+    def __repr__(self) -> str:
+        return self.name
+
+    def accept_encoding(self) -> Optional[str]:
+        if not self.compress:
+            return None
+        return 'gzip, deflate, br' if HAVE_BROTLI else 'gzip, deflate'
+
+    def timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=self.total_timeout, sock_connect=self.connect_timeout,
+                                     sock_read=self.read_timeout)
+
+    def connector(self, pool_size: int) -> aiohttp.TCPConnector:
+        """Connector shared by every request of the session
+
+        The scraper talks to a single host, so the per-host limit is the
+        pool size itself.
+        """
+        size = self.pool_size or pool_size
+        return aiohttp.TCPConnector(
+            limit=size,
+            limit_per_host=size,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True,
+        )
+
+    def create_session(self, headers: Dict[str, str], pool_size: int) -> aiohttp.ClientSession:
+        """Client session with this transport's connector, timeouts and encodings"""
+        if self.default_connector:
+            return aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=30))
+
+        encoding = self.accept_encoding()
+        if encoding:
+            headers = {**headers, 'Accept-Encoding': encoding}
+        return aiohttp.ClientSession(
+            headers=headers,
+            timeout=self.timeout(),
+            connector=self.connector(pool_size),
+            auto_decompress=True,
+        )
+
+
+# benchmark.py against bench_server (1000 listings, 50±20 ms latency) measured
+# tuned at 130 vs 129 listings/sec with --max-concurrency 16 and 236 vs 223 with 64;
+# loopback has no DNS lookups or TLS handshakes for the DNS cache and keep-alive to save
+TRANSPORTS = {
+    # Explicit pool sized to the limiters, DNS cache, keep-alive, compression
+    'tuned': TransportConfig('tuned'),
+    # aiohttp's defaults with a single 30s total timeout, as the scraper used before
+    'default': TransportConfig('default', default_connector=True),
+}
+
+
+def get_transport(transport: Union[str, TransportConfig] = 'tuned') -> TransportConfig:
+    """Look up a transport preset by name, or pass a config through"""
+    if isinstance(transport, TransportConfig):
+        return transport
+    try:
+        return TRANSPORTS[transport]
+    except KeyError:
+        raise ValueError(f"Unknown transport {transport!r} (choose from {', '.join(TRANSPORTS)})")
+
+
+def use_uvloop() -> bool:
+    """Make new event loops use uvloop; returns False if it is not installed"""
+    if uvloop is None:
+        print("uvloop is not installed, using the default asyncio event loop")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True